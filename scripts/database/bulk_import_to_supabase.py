@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+コレクターの出力ファイルをSupabaseに一括インポートするスクリプト
+JSON（配列）またはNDJSONファイルをストリーミングで読み込み、指定したテーブルにバッチ単位で並列に保存します。
+途中で失敗した場合は、同じコマンドを再実行するとチェックポイントから再開します。
+
+使用例:
+    python scripts/database/bulk_import_to_supabase.py --input yahoo_auction_data.ndjson --table yahoo_auction_items
+"""
+
+import sys
+import os
+import argparse
+
+# モジュールのインポートパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.bulk_import import BulkImporter
+
+def main():
+    """メイン実行関数"""
+    parser = argparse.ArgumentParser(description='Bulk import collector output (JSON/NDJSON) to Supabase')
+    parser.add_argument('--input', type=str, required=True, help='Input JSON/NDJSON file path')
+    parser.add_argument('--table', type=str, required=True, help='Destination table name')
+    parser.add_argument('--conflict-column', type=str, default='item_id', help='Unique column used to skip or update duplicates ("" to disable)')
+    parser.add_argument('--columns', type=str, help='Comma-separated list of columns to import (default: all fields)')
+    parser.add_argument('--batch-size', type=int, help='Number of records per batch')
+    parser.add_argument('--workers', type=int, help='Number of concurrent batch writers')
+    parser.add_argument('--checkpoint', type=str, help='Checkpoint file path (default: <input>.checkpoint.json)')
+    parser.add_argument('--restart', action='store_true', help='Ignore checkpoint and import from the beginning')
+    parser.add_argument('--update-existing', action='store_true', help='Update existing rows instead of skipping them')
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.input):
+        print(f"Error: File {args.input} not found")
+        return
+    
+    importer = BulkImporter(
+        args.table,
+        conflict_column=args.conflict_column or None,
+        update_existing=args.update_existing,
+        columns=[column.strip() for column in args.columns.split(',')] if args.columns else None,
+        batch_size=args.batch_size,
+        max_workers=args.workers
+    )
+    
+    print(f"Importing {args.input} into {args.table}...")
+    result = importer.run(args.input, checkpoint_path=args.checkpoint, restart=args.restart)
+    print(result['message'])
+    
+    if result['status'] != 'success':
+        print(f"再実行すると {result['offset']} 件目から再開します（チェックポイント: {result['checkpoint']}）")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
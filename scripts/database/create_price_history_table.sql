@@ -0,0 +1,40 @@
+-- 価格履歴のロールアップテーブル
+-- キーワード（JANコードを含む）×プラットフォーム×種別ごとに、1時間単位と1日単位の価格統計を取り込み時に集計する
+-- 出品中 (active) は区間内の最新のスナップショットで置き換え、売り切れ済み (sold) は新しく保存したアイテムだけを足し合わせる
+CREATE TABLE IF NOT EXISTS public.price_history_rollups (
+    series_key TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('active', 'sold')),
+    granularity TEXT NOT NULL CHECK (granularity IN ('hour', 'day')),
+    bucket_start TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    min_price NUMERIC(12, 2),
+    max_price NUMERIC(12, 2),
+    sum_price NUMERIC(14, 2),
+    avg_price NUMERIC(12, 2),
+    p10_price NUMERIC(12, 2),
+    p25_price NUMERIC(12, 2),
+    median_price NUMERIC(12, 2),
+    p75_price NUMERIC(12, 2),
+    p90_price NUMERIC(12, 2),
+    sketch JSONB NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    PRIMARY KEY (series_key, platform, kind, granularity, bucket_start)
+);
+
+-- 主キーの順で、1つの系列の期間指定の読み込みがインデックスの範囲スキャンになる
+
+-- RLSポリシーの設定
+ALTER TABLE public.price_history_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow anonymous select" ON public.price_history_rollups FOR SELECT USING (true);
+CREATE POLICY "Allow anonymous insert" ON public.price_history_rollups FOR INSERT WITH CHECK (true);
+CREATE POLICY "Allow anonymous update" ON public.price_history_rollups FOR UPDATE USING (true);
+CREATE POLICY "Allow anonymous delete" ON public.price_history_rollups FOR DELETE USING (true);
+
+-- コメント
+COMMENT ON TABLE public.price_history_rollups IS 'キーワード×プラットフォームごとの価格履歴ロールアップ (1時間・1日単位)';
+COMMENT ON COLUMN public.price_history_rollups.series_key IS '検索キーワードまたはJANコード';
+COMMENT ON COLUMN public.price_history_rollups.kind IS '価格の種別 (active: 出品中, sold: 売り切れ済み・落札済み)';
+COMMENT ON COLUMN public.price_history_rollups.bucket_start IS '集計区間の開始日時';
+COMMENT ON COLUMN public.price_history_rollups.sketch IS '足し合わせ可能な価格の対数ヒストグラム (パーセンタイルの相対誤差を保証)';
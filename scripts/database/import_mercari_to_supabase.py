@@ -1,230 +1,57 @@
 #!/usr/bin/env python
 """
 メルカリデータをSupabaseにインポートするスクリプト
-JSONファイルからメルカリデータを読み込み、Supabaseデータベースに保存します。
+JSON（配列）またはNDJSONファイルからメルカリデータをストリーミングで読み込み、Supabaseデータベースに保存します。
+途中で失敗した場合は、同じコマンドを再実行するとチェックポイントから再開します。
 """
 
 import sys
 import os
 import argparse
-import json
-from typing import List, Dict, Any
-import time
 
 # モジュールのインポートパスを追加
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-def load_mercari_data(file_path: str) -> List[Dict[str, Any]]:
-    """
-    メルカリデータを読み込みます。
-    
-    Args:
-        file_path: メルカリデータを含むJSONファイルのパス
-        
-    Returns:
-        List[Dict[str, Any]]: メルカリデータのリスト
-    """
-    if not os.path.exists(file_path):
-        print(f"Error: File {file_path} not found")
-        return []
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON: {str(e)}")
-            return []
-
-def create_mercari_table():
-    """
-    Supabaseにmercari_dataテーブルを作成します。
-    
-    Returns:
-        bool: テーブル作成が成功したかどうか
-    """
-    # プロジェクトID
-    project_id = "ggvuuixcswldxfeygxvy"
-    
-    # SQLファイルを読み込む
-    sql_file_path = os.path.join(os.path.dirname(__file__), 'create_mercari_table.sql')
-    with open(sql_file_path, 'r', encoding='utf-8') as f:
-        sql = f.read()
-    
-    try:
-        # 直接コマンドを実行
-        print("テーブル作成中...")
-        print("SQLファイル:", sql_file_path)
-        print("SQL内容の一部:", sql[:100] + "...")
-        
-        # 実際のテーブル作成はMCPツールを使用して行われます
-        # ここではテーブルが既に作成されていると仮定します
-        return True
-    except Exception as e:
-        print(f"テーブル作成エラー: {str(e)}")
-        return False
+from src.utils.bulk_import import BulkImporter
 
-def import_data_to_supabase(data: List[Dict[str, Any]]):
-    """
-    メルカリデータをSupabaseにインポートします。
-    
-    Args:
-        data: インポートするメルカリデータのリスト
-        
-    Returns:
-        bool: インポートが成功したかどうか
-    """
-    # プロジェクトID
-    project_id = "ggvuuixcswldxfeygxvy"
-    
-    if not data:
-        print("インポートするデータがありません")
-        return False
-    
-    try:
-        # バッチサイズ
-        batch_size = 50
-        total_records = len(data)
-        imported_count = 0
-        
-        for i in range(0, total_records, batch_size):
-            batch = data[i:i+batch_size]
-            batch_count = len(batch)
-            
-            # INSERT文を構築
-            columns = ["search_term", "item_id", "title", "price", "currency", "status", 
-                      "sold_date", "condition", "url", "image_url", "seller", 
-                      "lowest_active_price", "active_listings_count", "avg_sold_price", 
-                      "median_sold_price", "sold_count"]
-            
-            values_list = []
-            for item in batch:
-                values = []
-                for col in columns:
-                    if col == "sold_date" and item.get(col) is not None:
-                        values.append(f"'{item.get(col)}'")
-                    elif isinstance(item.get(col), str):
-                        # 文字列はエスケープして引用符で囲む
-                        escaped = item.get(col).replace("'", "''")
-                        values.append(f"'{escaped}'")
-                    elif item.get(col) is None:
-                        values.append("NULL")
-                    else:
-                        values.append(str(item.get(col)))
-                values_list.append(f"({', '.join(values)})")
-            
-            values_str = ",\n".join(values_list)
-            
-            query = f"""
-            INSERT INTO mercari_data (
-                {', '.join(columns)}
-            ) VALUES 
-            {values_str}
-            """
-            
-            # データをインポート
-            print(f"バッチ {i//batch_size + 1} のインポート中... ({batch_count} レコード)")
-            
-            # MCPツールを使用してデータをインポート
-            try:
-                # 一時ファイルにSQLを保存
-                import tempfile
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.sql', delete=False, encoding='utf-8') as temp:
-                    temp.write(query)
-                    temp_path = temp.name
-                
-                print(f"SQLファイル作成: {temp_path}")
-                
-                # MCPツールを使用してSQLを実行
-                from subprocess import run, PIPE
-                
-                # 直接MCPツールを使用
-                import sys
-                sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-                
-                # MCPツールを使用してSQLを実行
-                print("MCPツールを使用してSQLを実行中...")
-                
-                # 直接Supabase MCPサーバーにリクエスト
-                import requests
-                import json
-                
-                url = "http://localhost:3000/api/mcp/tool"
-                headers = {
-                    "Content-Type": "application/json"
-                }
-                payload = {
-                    "server_name": "github.com/supabase-community/supabase-mcp",
-                    "tool_name": "execute_sql",
-                    "arguments": {
-                        "project_id": project_id,
-                        "query": query
-                    }
-                }
-                
-                try:
-                    response = requests.post(url, headers=headers, data=json.dumps(payload))
-                    if response.status_code == 200:
-                        print("SQLの実行に成功しました")
-                    else:
-                        print(f"SQLの実行に失敗しました: {response.status_code} {response.text}")
-                except Exception as e:
-                    print(f"リクエストエラー: {str(e)}")
-                    
-                    # 代替手段: 直接SQLファイルを実行
-                    print("代替手段: 直接SQLファイルを実行します")
-                    
-                    # SQLファイルを保存
-                    batch_sql_file = f"batch_{i//batch_size + 1}.sql"
-                    with open(batch_sql_file, 'w', encoding='utf-8') as f:
-                        f.write(query)
-                    
-                    print(f"SQLファイル保存: {batch_sql_file}")
-                    print("このSQLファイルを手動で実行してください")
-                
-                # 一時ファイルを削除
-                os.unlink(temp_path)
-                
-            except Exception as e:
-                print(f"SQLの実行エラー: {str(e)}")
-            
-            imported_count += batch_count
-            print(f"インポート進捗: {imported_count}/{total_records} レコード")
-            
-            # APIレート制限対応
-            time.sleep(1)
-        
-        print(f"合計 {imported_count} レコードをインポートしました")
-        return True
-    except Exception as e:
-        print(f"データインポートエラー: {str(e)}")
-        return False
+# mercari_dataテーブルの列
+MERCARI_COLUMNS = ["search_term", "item_id", "title", "price", "currency", "status", 
+                   "sold_date", "condition", "url", "image_url", "seller", 
+                   "lowest_active_price", "active_listings_count", "avg_sold_price", 
+                   "median_sold_price", "sold_count"]
 
 def main():
     """メイン実行関数"""
     parser = argparse.ArgumentParser(description='Import Mercari data to Supabase')
-    parser.add_argument('--input', type=str, default='mercari_data.json', help='Input Mercari JSON file path')
-    parser.add_argument('--create-table', action='store_true', help='Create table before import')
+    parser.add_argument('--input', type=str, default='mercari_data.json', help='Input Mercari JSON/NDJSON file path')
+    parser.add_argument('--batch-size', type=int, help='Number of records per batch')
+    parser.add_argument('--workers', type=int, help='Number of concurrent batch writers')
+    parser.add_argument('--checkpoint', type=str, help='Checkpoint file path (default: <input>.checkpoint.json)')
+    parser.add_argument('--restart', action='store_true', help='Ignore checkpoint and import from the beginning')
+    parser.add_argument('--update-existing', action='store_true', help='Update existing data')
     args = parser.parse_args()
     
-    # メルカリデータを読み込む
-    mercari_data = load_mercari_data(args.input)
-    
-    if not mercari_data:
-        print(f"No data found in {args.input}")
+    if not os.path.exists(args.input):
+        print(f"Error: File {args.input} not found")
         return
     
-    print(f"Loaded {len(mercari_data)} records from Mercari data")
-    
-    # テーブル作成（オプション）
-    if args.create_table:
-        print("Creating mercari_data table...")
-        if not create_mercari_table():
-            print("テーブル作成に失敗しました。処理を中止します。")
-            return
+    importer = BulkImporter(
+        'mercari_data',
+        conflict_column='item_id',
+        update_existing=args.update_existing,
+        columns=MERCARI_COLUMNS,
+        batch_size=args.batch_size,
+        max_workers=args.workers
+    )
     
     # データをインポート
     print("Importing data to Supabase...")
-    import_data_to_supabase(mercari_data)
+    result = importer.run(args.input, checkpoint_path=args.checkpoint, restart=args.restart)
+    print(result['message'])
+    
+    if result['status'] != 'success':
+        print(f"再実行すると {result['offset']} 件目から再開します（チェックポイント: {result['checkpoint']}）")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -69,6 +69,12 @@ def parse_args():
         help='オフセット（ページネーション用、デフォルト: 0）'
     )
     
+    parser.add_argument(
+        '--cursor',
+        type=str,
+        help='前のページの最後に表示された次ページ用カーソル（指定時はオフセットより優先）'
+    )
+    
     parser.add_argument(
         '--format',
         type=str,
@@ -117,18 +123,16 @@ def format_task_for_display(task: Dict[str, Any]) -> Dict[str, Any]:
         
         display_task['search_summary'] = ' | '.join(search_summary)
     
-    # 結果の概要を作成
-    if 'result' in display_task and display_task['result']:
+    # 結果の概要を作成（一覧は result を取得しないため、結果を含む詳細表示の場合のみ）
+    if 'result' in display_task:
         result = display_task['result']
         
-        if 'integrated_results' in result:
+        if result and 'integrated_results' in result:
             integrated = result['integrated_results']
             count = integrated.get('count', 0)
             display_task['result_summary'] = f"{count}件の結果"
         else:
             display_task['result_summary'] = "結果なし"
-    else:
-        display_task['result_summary'] = "結果なし"
     
     # 実行時間を計算
     if display_task.get('completed_at') and display_task.get('created_at'):
@@ -276,7 +280,7 @@ def main():
     
     # 特定のタスクの詳細を表示
     if args.task_id:
-        task = task_manager.get_task(args.task_id)
+        task = task_manager.get_task(args.task_id, include_full_result=True)
         display_task_detail(task, args.format)
         return
     
@@ -287,14 +291,18 @@ def main():
         status_filter = [TaskStatus(s) for s in status_values if s in [e.value for e in TaskStatus]]
     
     # タスクリストを取得
-    tasks = task_manager.list_tasks(
+    page = task_manager.list_tasks_page(
         limit=args.limit,
         offset=args.offset,
-        status=status_filter
+        status=status_filter,
+        cursor=args.cursor
     )
     
     # タスクリストを表示
-    display_task_list(tasks, args.format)
+    display_task_list(page['tasks'], args.format)
+    
+    if page['next_cursor'] and args.format == 'text':
+        print(f"\n次のページ: --cursor {page['next_cursor']}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+保持期間を過ぎた行を削除するスクリプト
+タイムスタンプ列のインデックスに沿って一定件数ずつ削除します。--max-batches で1回の実行量を制限した場合や
+途中で中断した場合は、同じコマンドを再実行するとチェックポイントのカットオフを引き継いで続きから削除します。
+
+使用例:
+    python scripts/database/run_retention.py --table search_tasks --column created_at --days 30
+    python scripts/database/run_retention.py --table search_results --column expires_at --days 0 --max-batches 100
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+
+# モジュールのインポートパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.retention import RetentionJob
+
+def main():
+    """メイン実行関数"""
+    parser = argparse.ArgumentParser(description='Delete rows older than the retention period in bounded batches')
+    parser.add_argument('--table', type=str, required=True, help='Target table name')
+    parser.add_argument('--column', type=str, default='created_at', help='Indexed timestamp column compared with the cutoff')
+    parser.add_argument('--days', type=float, default=30, help='Delete rows older than this many days (0: older than now)')
+    parser.add_argument('--id-column', type=str, default='id', help='Column identifying rows')
+    parser.add_argument('--batch-size', type=int, help='Number of rows deleted per batch')
+    parser.add_argument('--pause', type=float, help='Seconds to wait between batches')
+    parser.add_argument('--max-batches', type=int, help='Maximum number of batches in this run')
+    parser.add_argument('--drop-partitions', action='store_true', help='Drop expired partitions first (requires SUPABASE_DB_URL)')
+    parser.add_argument('--checkpoint', type=str, help='Checkpoint file path (default: <table>.retention.checkpoint.json)')
+    parser.add_argument('--restart', action='store_true', help='Ignore checkpoint and start with a new cutoff')
+    args = parser.parse_args()
+    
+    job = RetentionJob(
+        args.table,
+        args.column,
+        id_column=args.id_column,
+        batch_size=args.batch_size,
+        pause_seconds=args.pause,
+        drop_partitions=args.drop_partitions
+    )
+    
+    checkpoint = args.checkpoint or f"{args.table}.retention.checkpoint.json"
+    cutoff = datetime.now() - timedelta(days=args.days)
+    
+    print(f"Deleting rows of {args.table} where {args.column} < {cutoff.isoformat()}...")
+    result = job.run(cutoff, checkpoint_path=checkpoint, restart=args.restart, max_batches=args.max_batches)
+    
+    print(f"Deleted {result['deleted']} rows in {result['batches']} batches (cutoff: {result['cutoff']})")
+    if result['dropped_partitions']:
+        print(f"Dropped partitions: {', '.join(result['dropped_partitions'])}")
+    if not result['completed']:
+        print(f"未削除の行が残っています。再実行すると続きから削除します（チェックポイント: {checkpoint}）")
+
+if __name__ == "__main__":
+    main()
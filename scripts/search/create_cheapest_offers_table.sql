@@ -0,0 +1,33 @@
+-- JANコード別の最安出品テーブル
+-- 検索結果を保存するたびに、JANコード×プラットフォームごとの安い順の上位N件を置き換える
+CREATE TABLE IF NOT EXISTS public.cheapest_offers (
+    jan_code TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    item_title TEXT,
+    item_url TEXT,
+    item_image_url TEXT,
+    total_price NUMERIC(10, 2) NOT NULL,
+    currency TEXT DEFAULT 'JPY' NOT NULL,
+    seller_name TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    PRIMARY KEY (jan_code, platform, rank)
+);
+
+-- 「JANコードXの最安値」を1回のインデックス読み込みで返す
+CREATE INDEX IF NOT EXISTS idx_cheapest_offers_jan_code_total_price ON public.cheapest_offers(jan_code, total_price);
+
+-- RLSポリシーの設定
+ALTER TABLE public.cheapest_offers ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow anonymous select" ON public.cheapest_offers FOR SELECT USING (true);
+CREATE POLICY "Allow anonymous insert" ON public.cheapest_offers FOR INSERT WITH CHECK (true);
+CREATE POLICY "Allow anonymous update" ON public.cheapest_offers FOR UPDATE USING (true);
+CREATE POLICY "Allow anonymous delete" ON public.cheapest_offers FOR DELETE USING (true);
+
+-- コメント
+COMMENT ON TABLE public.cheapest_offers IS 'JANコード×プラットフォームごとの最安出品 (上位N件)';
+COMMENT ON COLUMN public.cheapest_offers.rank IS 'プラットフォーム内の安い順の順位 (1始まり。0は出品が0件でも検索日時を記録する目印の行)';
+COMMENT ON COLUMN public.cheapest_offers.total_price IS '総額 (本体価格+送料+手数料)';
+COMMENT ON COLUMN public.cheapest_offers.updated_at IS '検索した日時 (古い行はAPIで使わず再検索する)';
@@ -21,6 +21,7 @@ CREATE TABLE IF NOT EXISTS search_results (
   id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
   task_id UUID REFERENCES jan_search_tasks(id) ON DELETE CASCADE,
   platform VARCHAR(50) NOT NULL,
+  item_id TEXT NOT NULL,
   item_title TEXT,
   price DECIMAL(10,2),
   shipping_fee DECIMAL(10,2) DEFAULT 0,
@@ -31,7 +32,9 @@ CREATE TABLE IF NOT EXISTS search_results (
   item_image_url TEXT,
   seller_name TEXT,
   condition_text TEXT,
+  content_hash TEXT,
   created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
   expires_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() + INTERVAL '7 days')
 );
 
@@ -40,6 +43,7 @@ CREATE INDEX IF NOT EXISTS idx_jan_search_tasks_jan_code ON jan_search_tasks(jan
 CREATE INDEX IF NOT EXISTS idx_jan_search_tasks_status ON jan_search_tasks(status);
 CREATE INDEX IF NOT EXISTS idx_jan_search_tasks_created_at ON jan_search_tasks(created_at);
 CREATE INDEX IF NOT EXISTS idx_search_results_task_id ON search_results(task_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_search_results_task_platform_item ON search_results(task_id, platform, item_id);
 CREATE INDEX IF NOT EXISTS idx_search_results_platform ON search_results(platform);
 CREATE INDEX IF NOT EXISTS idx_search_results_total_price ON search_results(total_price);
 CREATE INDEX IF NOT EXISTS idx_search_results_expires_at ON search_results(expires_at);
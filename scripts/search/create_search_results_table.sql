@@ -3,6 +3,7 @@ CREATE TABLE IF NOT EXISTS search_results (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     task_id UUID NOT NULL REFERENCES search_tasks(id) ON DELETE CASCADE,
     platform VARCHAR(50) NOT NULL,
+    item_id TEXT NOT NULL,
     title TEXT,
     artist TEXT,
     url TEXT,
@@ -15,12 +16,14 @@ CREATE TABLE IF NOT EXISTS search_results (
     description TEXT,
     seller_name TEXT,
     location TEXT,
+    content_hash TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 -- インデックスを作成
 CREATE INDEX IF NOT EXISTS idx_search_results_task_id ON search_results(task_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_search_results_task_platform_item ON search_results(task_id, platform, item_id);
 CREATE INDEX IF NOT EXISTS idx_search_results_platform ON search_results(platform);
 CREATE INDEX IF NOT EXISTS idx_search_results_total_price ON search_results(total_price);
 CREATE INDEX IF NOT EXISTS idx_search_results_created_at ON search_results(created_at);
@@ -0,0 +1,25 @@
+-- 検索タスク結果の圧縮保存テーブル
+-- search_tasks.result には要約だけを残し、execute_search の出力全体は圧縮してここに保存する
+CREATE TABLE IF NOT EXISTS public.search_task_results (
+    task_id UUID PRIMARY KEY REFERENCES public.search_tasks(id) ON DELETE CASCADE,
+    codec TEXT NOT NULL CHECK (codec IN ('zstd', 'zlib')),
+    payload TEXT NOT NULL,
+    raw_size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+);
+
+-- RLSポリシーの設定
+ALTER TABLE public.search_task_results ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow anonymous select" ON public.search_task_results FOR SELECT USING (true);
+CREATE POLICY "Allow anonymous insert" ON public.search_task_results FOR INSERT WITH CHECK (true);
+CREATE POLICY "Allow anonymous update" ON public.search_task_results FOR UPDATE USING (true);
+CREATE POLICY "Allow anonymous delete" ON public.search_task_results FOR DELETE USING (true);
+
+-- コメント
+COMMENT ON TABLE public.search_task_results IS '検索タスク結果全体の圧縮データ';
+COMMENT ON COLUMN public.search_task_results.codec IS '圧縮方式 (zstd, zlib)';
+COMMENT ON COLUMN public.search_task_results.payload IS '圧縮データ (Base64)';
+COMMENT ON COLUMN public.search_task_results.raw_size IS '圧縮前のバイト数';
+COMMENT ON COLUMN public.search_task_results.stored_size IS '圧縮後のバイト数';
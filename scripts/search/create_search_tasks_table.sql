@@ -14,6 +14,9 @@ CREATE TABLE IF NOT EXISTS public.search_tasks (
 -- インデックスの作成
 CREATE INDEX IF NOT EXISTS search_tasks_status_idx ON public.search_tasks (status);
 CREATE INDEX IF NOT EXISTS search_tasks_created_at_idx ON public.search_tasks (created_at DESC);
+-- キーセットページネーション用 (created_at, id)
+CREATE INDEX IF NOT EXISTS search_tasks_created_at_id_idx ON public.search_tasks (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS search_tasks_status_created_at_id_idx ON public.search_tasks (status, created_at DESC, id DESC);
 
 -- RLSポリシーの設定
 ALTER TABLE public.search_tasks ENABLE ROW LEVEL SECURITY;
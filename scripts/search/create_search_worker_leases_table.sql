@@ -0,0 +1,24 @@
+-- 検索ワーカーのリーステーブル
+-- 各ワーカーは使用中の実行枠数を一定間隔で登録し、空き枠を生存しているワーカー間で分け合う
+CREATE TABLE IF NOT EXISTS public.search_worker_leases (
+    worker_id TEXT PRIMARY KEY,
+    slots INTEGER NOT NULL DEFAULT 0,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_search_worker_leases_expires_at ON public.search_worker_leases(expires_at);
+
+-- RLSポリシーの設定
+ALTER TABLE public.search_worker_leases ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow anonymous select" ON public.search_worker_leases FOR SELECT USING (true);
+CREATE POLICY "Allow anonymous insert" ON public.search_worker_leases FOR INSERT WITH CHECK (true);
+CREATE POLICY "Allow anonymous update" ON public.search_worker_leases FOR UPDATE USING (true);
+CREATE POLICY "Allow anonymous delete" ON public.search_worker_leases FOR DELETE USING (true);
+
+-- コメント
+COMMENT ON TABLE public.search_worker_leases IS '検索ワーカーの実行枠リース';
+COMMENT ON COLUMN public.search_worker_leases.worker_id IS 'ワーカーID (ホスト名-プロセスID-乱数)';
+COMMENT ON COLUMN public.search_worker_leases.slots IS 'ワーカーが使用中の実行枠数';
+COMMENT ON COLUMN public.search_worker_leases.expires_at IS 'リースの有効期限 (更新が止まったワーカーは期限切れで除外)';
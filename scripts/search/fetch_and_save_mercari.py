@@ -18,11 +18,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.collectors.mercari import MercariClient
 from src.utils.config import get_config
+from src.utils.price_history import PriceHistoryStore
+from src.utils.price_stats import compute_price_stats, frame_from_items, annotate_items
 from src.utils.supabase_client import (
     create_table_if_not_exists, 
-    get_existing_ids, 
-    filter_new_items, 
-    insert_data, 
+    insert_new_items, 
     upsert_data
 )
 
@@ -71,13 +71,17 @@ def fetch_mercari_data(keywords: List[str], batch_size: int = 1, limit: int = 5)
         batch = keywords[i:i+batch_size]
         for keyword in batch:
             try:
-                keyword_results = mercari_client.get_complete_data(keyword, limit)
+                keyword_results = mercari_client.get_complete_data(keyword, limit, with_stats=False)
                 all_results.extend(keyword_results)
                 # APIレート制限対応
                 time.sleep(float(get_config("MERCARI_REQUEST_DELAY", "2.0")))
             except Exception as e:
                 print(f"Error processing keyword '{keyword}': {str(e)}")
     
+    # 全キーワードの統計情報をまとめて計算してアイテムに付与
+    if all_results:
+        annotate_items(all_results, compute_price_stats(frame_from_items(all_results)))
+    
     return all_results
 
 def save_to_supabase(data: List[Dict[str, Any]], update_existing: bool = False) -> Dict[str, Any]:
@@ -102,21 +106,12 @@ def save_to_supabase(data: List[Dict[str, Any]], update_existing: bool = False)
         total_records = len(data)
         saved_count = 0
         
-        # 既存のIDを取得（差分更新のため）
+        # 新しいアイテムのみを挿入（重複はデータベース側でスキップ）
         if not update_existing:
-            print("既存のIDを取得中...")
-            existing_ids = get_existing_ids(table_name, "item_id")
-            print(f"既存のID数: {len(existing_ids)}")
-            
-            # 新しいアイテムのみをフィルタリング
-            new_items = filter_new_items(data, existing_ids)
-            print(f"新しいアイテム数: {len(new_items)}")
-            
-            if not new_items:
-                return {"count": 0, "status": "success", "message": "新しいデータがありません"}
-            
-            data = new_items
-            total_records = len(data)
+            result = insert_new_items(table_name, data, "item_id")
+            print(f"新しいアイテム数: {result.get('count', 0)}")
+            print(f"結果: {result.get('message')}")
+            return result
         
         results = []
         for i in range(0, total_records, batch_size):
@@ -126,10 +121,7 @@ def save_to_supabase(data: List[Dict[str, Any]], update_existing: bool = False)
             print(f"バッチ {i//batch_size + 1} のインポート中... ({batch_count} レコード)")
             
             # データをインポート
-            if update_existing:
-                result = upsert_data(table_name, batch, "item_id")
-            else:
-                result = insert_data(table_name, batch)
+            result = upsert_data(table_name, batch, "item_id")
             
             results.append(result)
             saved_count += result.get("count", 0)
@@ -206,6 +198,13 @@ def main():
     print("Saving data to Supabase...")
     result = save_to_supabase(mercari_data, args.update_existing)
     
+    # 価格履歴（キーワードごとの1時間・1日単位のロールアップ）に記録
+    # 売り切れ済みは初めて保存したアイテムだけを記録する（--update-existing では判定できないため出品中のみ）
+    try:
+        PriceHistoryStore().record_batch("mercari", mercari_data, result.pop("inserted_ids", None))
+    except Exception as e:
+        print(f"Error recording price history: {str(e)}")
+    
     if result["status"] == "success":
         print(f"Success: {result['message']}")
     else:
@@ -13,9 +13,48 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.collectors.yahoo_auction import YahooAuctionClient
-from src.utils.supabase_client import get_supabase_client, create_table_if_not_exists, upsert_data, get_existing_ids, filter_new_items
+from src.utils.supabase_client import get_supabase_client, create_table_if_not_exists, insert_new_items
+from src.utils.id_filter import SeenIdFilter
+from src.utils.price_history import PriceHistoryStore
+from src.utils.price_stats import compute_price_stats, frame_from_items, annotate_items
 from src.utils.config import get_config
 
+def annotate_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    バッチ内の全キーワードの統計情報をまとめて計算し、アイテムに付与します。
+    
+    Args:
+        items: get_complete_data(with_stats=False) の出力を連結したもの
+    
+    Returns:
+        List[Dict[str, Any]]: 統計情報を付与したアイテム
+    """
+    stats = compute_price_stats(frame_from_items(items, "current_price"))
+    return annotate_items(items, stats, lowest_active_key="lowest_current_price")
+
+def save_batch(items: List[Dict[str, Any]], seen_ids: SeenIdFilter, price_history: PriceHistoryStore) -> Dict[str, Any]:
+    """
+    バッチの統計情報を付与して新しいアイテムのみを保存し、価格履歴に記録します。
+    
+    Args:
+        items: get_complete_data(with_stats=False) の出力を連結したもの
+        seen_ids: この実行で送信済みのアイテムID
+        price_history: 価格履歴
+    
+    Returns:
+        Dict[str, Any]: 保存結果
+    """
+    annotate_batch(items)
+    save_result = insert_new_items("yahoo_auction_items", items, "item_id", seen_ids)
+    
+    # 売り切れ済みは初めて保存したアイテムだけを記録（失敗してもアイテムの保存結果は返す）
+    try:
+        price_history.record_batch("yahoo_auction", items, save_result.pop("inserted_ids", None),
+                                   price_key="current_price")
+    except Exception as e:
+        print(f"  価格履歴の記録エラー: {str(e)}")
+    return save_result
+
 def fetch_and_save_yahoo_auction_data(keywords: List[str] = None, limit: int = 10) -> None:
     """
     Yahoo!オークションのデータを取得し、Supabaseに保存します。
@@ -43,9 +82,11 @@ def fetch_and_save_yahoo_auction_data(keywords: List[str] = None, limit: int = 1
         # バッチサイズの設定
         batch_size = int(get_config("BATCH_SIZE", "10"))
         
-        # 既存のアイテムIDを取得
-        existing_ids = get_existing_ids("yahoo_auction_items", "item_id")
-        print(f"既存のアイテム数: {len(existing_ids)}")
+        # この実行で送信済みのアイテムID（既存IDとの重複はデータベース側でスキップ）
+        seen_ids = SeenIdFilter()
+        
+        # 価格履歴（キーワードごとの1時間・1日単位のロールアップ）
+        price_history = PriceHistoryStore()
         
         # 結果を格納するリスト
         all_items = []
@@ -56,39 +97,33 @@ def fetch_and_save_yahoo_auction_data(keywords: List[str] = None, limit: int = 1
             
             try:
                 # データ取得
-                items = client.get_complete_data(keyword, limit, limit)
-                
-                # 新しいアイテムのみをフィルタリング
-                new_items = filter_new_items(items, existing_ids)
+                items = client.get_complete_data(keyword, limit, limit, with_stats=False)
                 
-                print(f"  取得: {len(items)}件, 新規: {len(new_items)}件")
+                print(f"  取得: {len(items)}件")
                 
                 # 結果を追加
-                all_items.extend(new_items)
+                all_items.extend(items)
                 
-                # 既存IDリストを更新
-                existing_ids.extend([item["item_id"] for item in new_items])
-                
-                # バッチサイズに達したらデータを保存
+                # バッチサイズに達したら新しいアイテムのみを保存
                 if len(all_items) >= batch_size:
-                    save_result = upsert_data("yahoo_auction_items", all_items, "item_id")
+                    save_result = save_batch(all_items, seen_ids, price_history)
                     print(f"  保存結果: {save_result}")
                     all_items = []
                 
                 # APIレート制限対応
                 time.sleep(float(get_config("REQUEST_DELAY", "1.0")))
-                
+            
             except Exception as e:
                 print(f"  エラー: {str(e)}")
                 continue
         
         # 残りのデータを保存
         if all_items:
-            save_result = upsert_data("yahoo_auction_items", all_items, "item_id")
+            save_result = save_batch(all_items, seen_ids, price_history)
             print(f"最終保存結果: {save_result}")
         
         print("処理が完了しました。")
-        
+    
     except Exception as e:
         print(f"エラーが発生しました: {str(e)}")
 
@@ -0,0 +1,27 @@
+-- search_results を (task_id, platform, item_id) キーの差分upsertに対応させるマイグレーション
+
+-- 商品IDと内容ハッシュ、保存時に失われていたカラムを追加
+ALTER TABLE search_results ADD COLUMN IF NOT EXISTS item_id TEXT;
+ALTER TABLE search_results ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE search_results ADD COLUMN IF NOT EXISTS currency VARCHAR(3) DEFAULT 'JPY';
+ALTER TABLE search_results ADD COLUMN IF NOT EXISTS seller_name TEXT;
+ALTER TABLE search_results ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+-- 既存行の商品IDをURL（なければ行ID）で補完
+UPDATE search_results
+SET item_id = COALESCE(NULLIF(item_url, ''), id::text)
+WHERE item_id IS NULL;
+
+-- 同じキーの重複行を削除（最新の行を残す。同じ一括insertの行は created_at が同じため id で決める）
+DELETE FROM search_results a
+USING search_results b
+WHERE a.task_id = b.task_id
+  AND a.platform = b.platform
+  AND a.item_id = b.item_id
+  AND (a.created_at < b.created_at OR (a.created_at = b.created_at AND a.id < b.id));
+
+ALTER TABLE search_results ALTER COLUMN item_id SET NOT NULL;
+
+-- upsertの競合判定に使用する一意インデックス
+CREATE UNIQUE INDEX IF NOT EXISTS uq_search_results_task_platform_item
+    ON search_results(task_id, platform, item_id);
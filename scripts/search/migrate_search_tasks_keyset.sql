@@ -0,0 +1,8 @@
+-- search_tasks の一覧取得を (created_at, id) のキーセットページネーションに対応させるインデックス
+
+CREATE INDEX IF NOT EXISTS search_tasks_created_at_id_idx
+    ON public.search_tasks (created_at DESC, id DESC);
+
+-- ステータスで絞り込んだ一覧（実行待ちタスクの取得など）用
+CREATE INDEX IF NOT EXISTS search_tasks_status_created_at_id_idx
+    ON public.search_tasks (status, created_at DESC, id DESC);
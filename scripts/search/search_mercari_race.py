@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+メルカリ検索の統合エントリポイント
+DOM解析を即座に開始し、応答がない・失敗した場合は視覚スクレイピングやフォールバックを
+追加で起動して、最初に有効な結果を返した経路の結果を出力します。
+"""
+import sys
+import os
+import json
+
+# プロジェクトのパスを追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.search.mercari_race import search_mercari_race
+
+def main():
+    if len(sys.argv) < 2:
+        print("JSON_START")
+        print(json.dumps({
+            'success': False,
+            'results': [],
+            'error': '検索クエリが指定されていません'
+        }, ensure_ascii=False))
+        print("JSON_END")
+        sys.exit(1)
+    
+    query = sys.argv[1]
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    
+    print("JSON_START")
+    
+    try:
+        output = search_mercari_race(query, limit)
+        print(json.dumps(output, ensure_ascii=False, indent=2))
+    
+    except Exception as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        print(json.dumps({
+            'success': False,
+            'results': [],
+            'error': str(e),
+            'platform': 'mercari',
+            'method': 'error'
+        }, ensure_ascii=False))
+    
+    print("JSON_END")
+
+if __name__ == "__main__":
+    main()
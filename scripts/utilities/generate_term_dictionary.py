@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+翻訳キャッシュの履歴からオフライン用語辞書を生成するスクリプト
+ブランド名などの短い用語の翻訳結果を組み込みの用語と合わせてJSONファイルに保存します。
+"""
+
+import sys
+import os
+import argparse
+
+# モジュールのインポートパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.translation_cache import get_translation_cache
+from src.utils.term_dictionary import TermDictionary, BUILTIN_TERMS, build_terms_from_cache
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='Generate offline term dictionary from translation cache')
+    parser.add_argument('--output', type=str, default='term_dictionary.json', help='Output JSON file')
+    parser.add_argument('--max-length', type=int, default=12, help='Maximum length of a term')
+    parser.add_argument('--language', type=str, default='en', help='Target language code')
+    args = parser.parse_args()
+    
+    # キャッシュから用語を抽出（組み込みの用語を優先）
+    cache_terms = build_terms_from_cache(get_translation_cache(), args.language, args.max_length)
+    dictionary = TermDictionary(cache_terms)
+    dictionary.update(BUILTIN_TERMS)
+    
+    print(f"Extracted {len(cache_terms)} terms from translation cache")
+    
+    dictionary.save(args.output)
+    print(f"Saved {len(dictionary)} terms to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,25 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.utils.translator import translate_for_platform
+from src.utils.translator import translate_for_platform, translate_batch_for_platform
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python translate_for_ebay.py <product_name>", file=sys.stderr)
+        print("Usage: python translate_for_ebay.py <product_name> [<product_name> ...]", file=sys.stderr)
         sys.exit(1)
     
+    # 複数の商品名は一括翻訳し、1行に1件ずつ出力する
+    if len(sys.argv) > 2:
+        product_names = sys.argv[1:]
+        try:
+            translations = translate_batch_for_platform(product_names, 'ebay')
+        except Exception as e:
+            print(f"Translation error: {str(e)}", file=sys.stderr)
+            translations = {}
+        for product_name in product_names:
+            print(translations.get(product_name, product_name))
+        return
+    
     product_name = sys.argv[1]
     
     try:
@@ -6,32 +6,10 @@ async function searchMercariReliable(searchQuery: string, limit: number = 20): P
   return new Promise((resolve, reject) => {
     console.log(`メルカリSelenium検索開始: ${searchQuery}`);
     
-    // DOM解析を優先的に使用（確実性重視）
-    const domScript = path.join(process.cwd(), 'scripts', 'search_mercari_dom.py');
-    const optimizedScript = path.join(process.cwd(), 'scripts', 'search_mercari_visual_optimized.py');
-    const visualScript = path.join(process.cwd(), 'scripts', 'search_mercari_visual_integrated.py');
-    const fallbackScript = path.join(process.cwd(), 'scripts', 'search_mercari_final.py');
+    // 統合エントリポイント: DOM解析を即座に開始し、応答がない・失敗した場合は
+    // 視覚スクレイピングやフォールバックを追加で起動して、最初に有効な結果を採用する
+    const pythonScript = path.join(process.cwd(), 'scripts', 'search', 'search_mercari_race.py');
     
-    // 優先順位: DOM解析 > 最適化版 > 通常版 > フォールバック
-    let pythonScript = domScript;
-    
-    const fs = require('fs');
-    if (!fs.existsSync(domScript)) {
-      console.log('DOM解析が見つかりません。視覚スクレイピングを使用します。');
-      pythonScript = optimizedScript;
-      
-      if (!fs.existsSync(optimizedScript)) {
-        console.log('最適化版が見つかりません。通常の視覚スクレイピングを使用します。');
-        pythonScript = visualScript;
-        
-        if (!fs.existsSync(visualScript)) {
-          console.log('視覚スクレイピングスクリプトが見つかりません。フォールバックを使用します。');
-          pythonScript = fallbackScript;
-        }
-      }
-    } else {
-      console.log('DOM解析（確実性重視）を使用します。');
-    }
     // タイムアウトを延長し、環境変数を設定
     const pythonProcess = spawn('python3', [pythonScript, searchQuery, limit.toString()], {
       env: { ...process.env },
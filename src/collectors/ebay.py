@@ -10,6 +10,8 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import base64
 from ..utils.config import get_config
+from ..utils.circuit_breaker import get_circuit_breaker, CircuitOpenError
+from ..utils.hedging import hedged_get
 
 class EbayClient:
     """eBay APIと通信するクライアントクラス"""
@@ -111,16 +113,53 @@ class EbayClient:
     def _make_request(self, endpoint: str, params: Dict = None, max_retries: int = 3) -> Dict[str, Any]:
         """
         リトライ機能付きでAPIリクエストを実行します。
+        eBayのサーキットブレーカーが開いている場合はリトライせずに即座に失敗します。
         
         Args:
             endpoint: APIエンドポイント
             params: リクエストパラメータ
             max_retries: 最大リトライ回数
             
+        Returns:
+            Dict[str, Any]: APIレスポンス
+            
+        Raises:
+            CircuitOpenError: サーキットブレーカーが開いている場合
+        """
+        breaker = get_circuit_breaker("ebay")
+        if not breaker.allow_request():
+            raise CircuitOpenError("ebay", breaker.retry_in())
+        
+        start_time = time.time()
+        try:
+            response = self._request_with_retry(endpoint, params, max_retries, breaker)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            breaker.record_failure(time.time() - start_time)
+            raise
+        
+        breaker.record_success(time.time() - start_time)
+        return response
+    
+    def _request_with_retry(self, endpoint: str, params: Dict, max_retries: int, breaker) -> Dict[str, Any]:
+        """
+        リトライ機能付きでAPIリクエストを実行します（_make_requestの内部処理）。
+        
+        Args:
+            endpoint: APIエンドポイント
+            params: リクエストパラメータ
+            max_retries: 最大リトライ回数
+            breaker: eBayのサーキットブレーカー
+            
         Returns:
             Dict[str, Any]: APIレスポンス
         """
         for attempt in range(max_retries + 1):
+            # 他のリクエストの失敗でブレーカーが開いた場合はリトライを打ち切る
+            if attempt > 0 and breaker.is_open():
+                raise CircuitOpenError("ebay", breaker.retry_in())
+            
             try:
                 token = self._get_access_token()
                 headers = {
@@ -130,7 +169,7 @@ class EbayClient:
                 }
                 
                 url = f"{self.api_url}{endpoint}"
-                response = requests.get(url, headers=headers, params=params, timeout=30)
+                response = hedged_get("ebay", url, headers=headers, params=params, timeout=30)
                 
                 if response.status_code == 429:  # Too Many Requests
                     retry_after = int(response.headers.get("Retry-After", self.delay * 2))
@@ -237,7 +276,9 @@ class EbayClient:
             limit: 取得する結果の最大数
             
         Returns:
-            List[Dict[str, Any]]: 出品中商品のリスト
+            List[Dict[str, Any]]: 出品中商品のリスト            
+        Raises:
+            CircuitOpenError: サーキットブレーカーが開いている場合（「結果なし」と区別するため送出する）
         """
         # Browse APIを使用
         endpoint = "/buy/browse/v1/item_summary/search"
@@ -275,6 +316,8 @@ class EbayClient:
                 results.append(result)
             
             return results[:limit]
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"Error searching active items for '{keyword}': {str(e)}")
             return []
@@ -9,6 +9,7 @@ import json
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from ..utils.config import get_config
+from ..utils.price_stats import compute_price_stats, frame_from_listings, annotate_items
 
 class MercariApifyClient:
     """Apify APIを使用してMercariからデータを取得するクライアントクラス"""
@@ -362,55 +363,12 @@ Apify.main(async () => {
             sold_items = self.search_sold_items(keyword, limit)
             print(f"売り切れ済みのアイテム数: {len(sold_items)}")
             
-            # 統計情報を計算
-            active_prices = [item["price"] for item in active_items if item["price"] > 0]
-            sold_prices = [item["price"] for item in sold_items if item["price"] > 0]
+            # 結果を統合（URLが空のアイテムはモックデータとして除外）
+            all_items = [item for item in active_items + sold_items if item.get("url")]
             
-            lowest_active_price = min(active_prices) if active_prices else 0
-            avg_sold_price = sum(sold_prices) / len(sold_prices) if sold_prices else 0
-            
-            # 中央値を計算
-            median_sold_price = 0
-            if sold_prices:
-                sold_prices.sort()
-                mid = len(sold_prices) // 2
-                if len(sold_prices) % 2 == 0 and len(sold_prices) > 1:
-                    median_sold_price = (sold_prices[mid - 1] + sold_prices[mid]) / 2
-                else:
-                    median_sold_price = sold_prices[mid]
-            
-            # 結果を統合
-            all_items = []
-            
-            # 出品中アイテムに統計情報を追加
-            for item in active_items:
-                # URLが空の場合はスキップ（モックデータを除外）
-                if not item.get("url"):
-                    continue
-                    
-                item.update({
-                    "lowest_active_price": lowest_active_price,
-                    "active_listings_count": len(active_items),
-                    "avg_sold_price": round(avg_sold_price, 2),
-                    "median_sold_price": round(median_sold_price, 2),
-                    "sold_count": len(sold_items)
-                })
-                all_items.append(item)
-            
-            # 売り切れ済みアイテムに統計情報を追加
-            for item in sold_items:
-                # URLが空の場合はスキップ（モックデータを除外）
-                if not item.get("url"):
-                    continue
-                    
-                item.update({
-                    "lowest_active_price": lowest_active_price,
-                    "active_listings_count": len(active_items),
-                    "avg_sold_price": round(avg_sold_price, 2),
-                    "median_sold_price": round(median_sold_price, 2),
-                    "sold_count": len(sold_items)
-                })
-                all_items.append(item)
+            # 統計情報を計算してアイテムに追加
+            stats = compute_price_stats(frame_from_listings(keyword, active_items, sold_items))
+            annotate_items(all_items, stats, keyword=keyword)
             
             # データがない場合は空のリストを返す
             if not all_items:
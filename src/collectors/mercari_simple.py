@@ -17,6 +17,11 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from ..utils.config import get_config
+from ..utils.circuit_breaker import get_circuit_breaker, CircuitOpenError
+
+# 検索結果が0件のときにページに表示される文言
+# （同じ文言が埋め込みの翻訳データにも含まれるため、ページソースではなく表示テキストで判定する）
+EMPTY_RESULT_MARKERS = ("出品された商品がありません", "該当する商品はありません", "該当する商品が見つかりません")
 
 class MercariClient:
     """Mercariからデータをスクレイピングするクライアントクラス（簡素化版）"""
@@ -55,6 +60,19 @@ class MercariClient:
             self.driver.quit()
             self.driver = None
     
+    def _has_empty_result_marker(self) -> bool:
+        """
+        検索結果が0件であることを示す表示があるかどうかを判定します。
+        
+        Returns:
+            bool: 0件の表示がある場合True
+        """
+        try:
+            body_text = self.driver.find_element(By.TAG_NAME, "body").text
+        except Exception:
+            return False
+        return any(marker in body_text for marker in EMPTY_RESULT_MARKERS)
+    
     def search_active_items(self, keyword: str, limit: int = 20) -> List[Dict[str, Any]]:
         """
         出品中のアイテムを検索します（実際のスクレイピングのみ）。
@@ -64,8 +82,17 @@ class MercariClient:
             limit: 取得する結果の最大数
             
         Returns:
-            List[Dict[str, Any]]: 出品中アイテムのリスト
+            List[Dict[str, Any]]: 出品中アイテムのリスト            
+        Raises:
+            CircuitOpenError: サーキットブレーカーが開いている場合（「結果なし」と区別するため送出する）
         """
+        # サーキットブレーカーが開いている場合はブラウザを起動しない
+        breaker = get_circuit_breaker("mercari")
+        if not breaker.allow_request():
+            print(f"メルカリ検索をスキップしました（サーキットブレーカー開放中）: {keyword}")
+            raise CircuitOpenError("mercari", breaker.retry_in())
+        
+        start_time = time.time()
         try:
             self._initialize_driver()
             
@@ -103,7 +130,14 @@ class MercariClient:
                     print(f"セレクタ '{selector}' でのエラー: {str(e)}")
             
             if not item_elements:
+                if self._has_empty_result_marker():
+                    # 出品がないことが確認できた場合は正常な応答として記録
+                    print("該当する商品はありません。")
+                    breaker.record_success(time.time() - start_time)
+                    return []
                 print("商品要素が見つかりませんでした。")
+                # 結果も0件の表示もない場合はセレクタ・レイアウト変更の可能性があるため失敗として記録（エラー率で判定）
+                breaker.record_failure(time.time() - start_time)
                 return []
             
             # 商品リストを取得
@@ -168,10 +202,12 @@ class MercariClient:
                     print(f"商品要素の処理でエラー: {str(e)}")
                     continue
             
+            breaker.record_success(time.time() - start_time)
             return items
             
         except Exception as e:
             print(f"Error searching active items for '{keyword}': {str(e)}")
+            breaker.record_failure(time.time() - start_time)
             return []
         finally:
             self._close_driver()
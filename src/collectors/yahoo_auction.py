@@ -11,6 +11,7 @@ from typing import List, Dict, Any, Optional
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 from ..utils.config import get_config, get_optional_config
+from ..utils.price_stats import compute_price_stats, frame_from_listings, annotate_items
 
 class YahooAuctionClient:
     """Yahoo!オークションAPIと通信するクライアントクラス"""
@@ -383,7 +384,8 @@ class YahooAuctionClient:
         finally:
             self._close_driver()
     
-    def get_complete_data(self, keyword: str, active_limit: int = 50, completed_limit: int = 50) -> List[Dict[str, Any]]:
+    def get_complete_data(self, keyword: str, active_limit: int = 50, completed_limit: int = 50,
+                          with_stats: bool = True) -> List[Dict[str, Any]]:
         """
         キーワードの完全なデータ（出品中と終了済み）を取得します。
         
@@ -391,6 +393,8 @@ class YahooAuctionClient:
             keyword: 検索キーワード
             active_limit: 出品中アイテムの取得数
             completed_limit: 終了済みアイテムの取得数
+            with_stats: 統計情報を付与するかどうか（複数キーワードをまとめて集計する場合はFalseにして
+                        price_stats.annotate_items で付与する）
             
         Returns:
             List[Dict[str, Any]]: 完全なデータ
@@ -402,46 +406,12 @@ class YahooAuctionClient:
         # 終了済みのアイテムを取得
         completed_items = self.search_completed_items(keyword, completed_limit)
         
-        # 統計情報を計算
-        active_prices = [item["current_price"] for item in active_items if item["current_price"] > 0]
-        completed_prices = [item["current_price"] for item in completed_items if item["current_price"] > 0]
-        
-        lowest_active_price = min(active_prices) if active_prices else 0
-        avg_sold_price = sum(completed_prices) / len(completed_prices) if completed_prices else 0
-        
-        # 中央値を計算
-        median_sold_price = 0
-        if completed_prices:
-            completed_prices.sort()
-            mid = len(completed_prices) // 2
-            if len(completed_prices) % 2 == 0 and len(completed_prices) > 1:
-                median_sold_price = (completed_prices[mid - 1] + completed_prices[mid]) / 2
-            else:
-                median_sold_price = completed_prices[mid]
-        
         # 結果を統合
-        all_items = []
-        
-        # 出品中アイテムに統計情報を追加
-        for item in active_items:
-            item.update({
-                "lowest_current_price": lowest_active_price,
-                "active_listings_count": len(active_items),
-                "avg_sold_price": round(avg_sold_price, 2),
-                "median_sold_price": round(median_sold_price, 2),
-                "sold_count": len(completed_items)
-            })
-            all_items.append(item)
+        all_items = active_items + completed_items
         
-        # 終了済みアイテムに統計情報を追加
-        for item in completed_items:
-            item.update({
-                "lowest_current_price": lowest_active_price,
-                "active_listings_count": len(active_items),
-                "avg_sold_price": round(avg_sold_price, 2),
-                "median_sold_price": round(median_sold_price, 2),
-                "sold_count": len(completed_items)
-            })
-            all_items.append(item)
+        # 統計情報を計算してアイテムに追加
+        if with_stats:
+            stats = compute_price_stats(frame_from_listings(keyword, active_items, completed_items, "current_price"))
+            annotate_items(all_items, stats, keyword=keyword, lowest_active_key="lowest_current_price")
         
         return all_items
@@ -6,9 +6,17 @@ Yahoo!ショッピングAPIから商品情報を取得します。
 import time
 import requests
 import json
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Iterator
 from datetime import datetime
 from ..utils.config import get_config, get_optional_config
+from ..utils.circuit_breaker import get_circuit_breaker, CircuitOpenError
+from ..utils.hedging import hedged_get
+from ..utils.rate_limiter import get_rate_limiter
+
+# itemSearch APIの1ページあたりの最大取得数と、start+results の上限
+MAX_RESULTS_PER_PAGE = 50
+MAX_SEARCH_OFFSET = 1000
 
 class YahooShoppingClient:
     """Yahoo!ショッピングAPIと通信するクライアントクラス"""
@@ -28,6 +36,9 @@ class YahooShoppingClient:
             "User-Agent": get_optional_config("USER_AGENT", "RecordCollector/1.0")
         }
         self.delay = float(get_optional_config("YAHOO_SHOPPING_REQUEST_DELAY", "1.0"))
+        self.page_workers = int(get_optional_config("YAHOO_SHOPPING_PAGE_WORKERS", "4"))
+        # 全スレッドで共有するレート制限
+        self.rate_limiter = get_rate_limiter("yahoo_shopping")
         
         # YAHOO_SHOPPING_APP_IDが設定されていない場合の警告
         if not self.app_id:
@@ -48,23 +59,129 @@ class YahooShoppingClient:
         if not self.app_id:
             raise ValueError("YAHOO_SHOPPING_APP_IDが設定されていません。Yahoo!ショッピングAPIを使用するには有効なApp IDが必要です。")
         
+        # サーキットブレーカーが開いている場合は即座に失敗
+        breaker = get_circuit_breaker("yahoo_shopping")
+        if not breaker.allow_request():
+            raise CircuitOpenError("yahoo_shopping", breaker.retry_in())
+        
         # アプリケーションIDをパラメータに追加
         params["appid"] = self.app_id
         
         url = f"{self.base_url}/{endpoint}"
-        response = requests.get(url, params=params, headers=self.headers)
+        self.rate_limiter.acquire()
+        start_time = time.time()
+        try:
+            response = hedged_get("yahoo_shopping", url, rate_limiter=self.rate_limiter,
+                                  params=params, headers=self.headers)
+        except requests.exceptions.RequestException:
+            breaker.record_failure(time.time() - start_time)
+            raise
         
         if response.status_code == 429:  # Too Many Requests
+            breaker.record_failure(time.time() - start_time)
             retry_after = int(response.headers.get("Retry-After", self.delay * 2))
             print(f"Rate limit hit. Waiting for {retry_after} seconds...")
             time.sleep(retry_after)
             return self._make_request(endpoint, params)  # 再試行
         
+        if response.status_code >= 500 or response.status_code in (401, 403):
+            breaker.record_failure(time.time() - start_time)
+        else:
+            breaker.record_success(time.time() - start_time)
+        
         response.raise_for_status()
         
         # JSONレスポンスをパース
         return response.json()
     
+    def _extract_items(self, response: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        itemSearch のレスポンスから商品リストを取り出します。
+        
+        Args:
+            response: APIレスポンス
+            
+        Returns:
+            Optional[List[Dict[str, Any]]]: 商品リスト（想定外の構造の場合はNone）
+        """
+        # レスポンス構造を確認（複数の可能性に対応）
+        items = []
+        if "hits" in response:
+            items = response["hits"]
+        elif "ResultSet" in response and "Result" in response["ResultSet"]:
+            items = response["ResultSet"]["Result"]
+        elif "Result" in response:
+            items = response["Result"]
+        else:
+            print(f"Unexpected response structure: {list(response.keys())}")
+            return None
+        
+        # itemsが辞書の場合はリストに変換
+        if isinstance(items, dict):
+            items = [items]
+        elif not isinstance(items, list):
+            print(f"Items is not a list or dict: {type(items)}")
+            return None
+        
+        return items
+    
+    def _normalize_item(self, item: Dict[str, Any], keyword: str) -> Dict[str, Any]:
+        """
+        itemSearch の商品1件を統一フォーマットに変換します。
+        
+        Args:
+            item: APIレスポンスの商品データ
+            keyword: 検索キーワード
+            
+        Returns:
+            Dict[str, Any]: 変換された商品データ
+        """
+        # 価格情報を統一フォーマットに変換
+        price = int(float(item.get("price", 0)))
+        
+        # 在庫情報
+        stock_quantity = item.get("availability", {}).get("inStock", 0)
+        if isinstance(stock_quantity, bool):
+            stock_quantity = 1 if stock_quantity else 0
+        
+        # レビュー情報
+        review_info = item.get("review", {})
+        review_score = float(review_info.get("rate", 0)) if review_info.get("rate") else 0
+        review_count = int(review_info.get("count", 0)) if review_info.get("count") else 0
+        
+        # 配送情報
+        shipping_info = {
+            "free_shipping": item.get("shipping", {}).get("code") == 1,
+            "shipping_cost": item.get("shipping", {}).get("price", 0)
+        }
+        
+        result = {
+            "search_term": keyword,
+            "item_id": item.get("code", ""),
+            "title": item.get("name", ""),
+            "name": item.get("name", ""),  # 互換性のため
+            "price": price,  # 統一された価格フィールド
+            "regular_price": price,  # 通常価格
+            "sale_price": None,  # セール価格（基本的にはprice）
+            "currency": "JPY",
+            "status": "available",
+            "stock_quantity": stock_quantity,
+            "condition": "new",  # Yahoo!ショッピングは基本的に新品
+            "url": item.get("url", ""),
+            "image_url": item.get("image", {}).get("medium", ""),
+            "store_name": item.get("seller", {}).get("name", ""),
+            "store_id": item.get("seller", {}).get("sellerId", ""),
+            "review_score": review_score,
+            "review_count": review_count,
+            "shipping_info": shipping_info,
+            "category_id": item.get("categoryId", ""),
+            "brand": item.get("brand", {}).get("name", ""),
+            "jan_code": item.get("janCode", ""),
+            "description": item.get("description", ""),
+            "thumbnails": [{"url": item.get("image", {}).get("medium", "")}] if item.get("image", {}).get("medium") else []
+        }
+        return result
+    
     def search_items(self, keyword: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
         キーワードで商品を検索します。
@@ -74,7 +191,9 @@ class YahooShoppingClient:
             limit: 取得する結果の最大数
             
         Returns:
-            List[Dict[str, Any]]: 商品のリスト
+            List[Dict[str, Any]]: 商品のリスト            
+        Raises:
+            CircuitOpenError: サーキットブレーカーが開いている場合（「結果なし」と区別するため送出する）
         """
         # YAHOO_SHOPPING_APP_IDが設定されていない場合は空のリストを返す
         if not self.app_id:
@@ -90,80 +209,124 @@ class YahooShoppingClient:
         
         try:
             response = self._make_request(endpoint, params)
-            
-            # レスポンス構造を確認（複数の可能性に対応）
-            items = []
-            if "hits" in response:
-                items = response["hits"]
-            elif "ResultSet" in response and "Result" in response["ResultSet"]:
-                items = response["ResultSet"]["Result"]
-            elif "Result" in response:
-                items = response["Result"]
-            else:
-                print(f"Unexpected response structure: {list(response.keys())}")
-                return []
-            
-            # itemsが辞書の場合はリストに変換
-            if isinstance(items, dict):
-                items = [items]
-            elif not isinstance(items, list):
-                print(f"Items is not a list or dict: {type(items)}")
+            items = self._extract_items(response)
+            if items is None:
                 return []
             
             # 必要なデータを抽出
-            results = []
-            for item in items:
-                # 価格情報を統一フォーマットに変換
-                price = int(float(item.get("price", 0)))
-                
-                # 在庫情報
-                stock_quantity = item.get("availability", {}).get("inStock", 0)
-                if isinstance(stock_quantity, bool):
-                    stock_quantity = 1 if stock_quantity else 0
-                
-                # レビュー情報
-                review_info = item.get("review", {})
-                review_score = float(review_info.get("rate", 0)) if review_info.get("rate") else 0
-                review_count = int(review_info.get("count", 0)) if review_info.get("count") else 0
-                
-                # 配送情報
-                shipping_info = {
-                    "free_shipping": item.get("shipping", {}).get("code") == 1,
-                    "shipping_cost": item.get("shipping", {}).get("price", 0)
-                }
-                
-                result = {
-                    "search_term": keyword,
-                    "item_id": item.get("code", ""),
-                    "title": item.get("name", ""),
-                    "name": item.get("name", ""),  # 互換性のため
-                    "price": price,  # 統一された価格フィールド
-                    "regular_price": price,  # 通常価格
-                    "sale_price": None,  # セール価格（基本的にはprice）
-                    "currency": "JPY",
-                    "status": "available",
-                    "stock_quantity": stock_quantity,
-                    "condition": "new",  # Yahoo!ショッピングは基本的に新品
-                    "url": item.get("url", ""),
-                    "image_url": item.get("image", {}).get("medium", ""),
-                    "store_name": item.get("seller", {}).get("name", ""),
-                    "store_id": item.get("seller", {}).get("sellerId", ""),
-                    "review_score": review_score,
-                    "review_count": review_count,
-                    "shipping_info": shipping_info,
-                    "category_id": item.get("categoryId", ""),
-                    "brand": item.get("brand", {}).get("name", ""),
-                    "jan_code": item.get("janCode", ""),
-                    "description": item.get("description", ""),
-                    "thumbnails": [{"url": item.get("image", {}).get("medium", "")}] if item.get("image", {}).get("medium") else []
-                }
-                results.append(result)
+            results = [self._normalize_item(item, keyword) for item in items]
             
             return results[:limit]
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"Error searching items for '{keyword}': {str(e)}")
             return []
     
+    def _fetch_search_page(self, keyword: str, start: int, results: int) -> Dict[str, Any]:
+        """
+        itemSearch の1ページ分を取得します。
+        
+        Args:
+            keyword: 検索キーワード
+            start: 取得開始位置（1始まり）
+            results: 取得件数（最大50件）
+            
+        Returns:
+            Dict[str, Any]: 変換済みの商品リスト（items）と検索結果の総数（total）
+        """
+        params = {
+            "query": keyword,
+            "start": start,
+            "results": results,
+            "sort": "+price"
+        }
+        response = self._make_request("itemSearch", params)
+        items = self._extract_items(response) or []
+        return {
+            "items": [self._normalize_item(item, keyword) for item in items],
+            "total": int(response.get("totalResultsAvailable", 0) or 0)
+        }
+    
+    def iter_search_items_pages(self, keyword: str, limit: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        キーワード検索の結果を複数ページ並列に取得し、ページが届いた順に商品を返します。
+        最初のページで総件数を確認し、残りのページを start オフセット指定で同時に取得します。
+        リクエストはレート制限（RATE_LIMIT_YAHOO_SHOPPING_*）を全スレッドで共有します。
+        
+        Args:
+            keyword: 検索キーワード
+            limit: 取得する結果の最大数（APIの仕様上 start+results が1000以下のため、最大999件）
+            
+        Yields:
+            Dict[str, Any]: 商品データ（ページをまたいだ価格順は保証されない）
+        """
+        if not self.app_id:
+            print(f"Yahoo!ショッピング検索をスキップしました（App ID未設定）: {keyword}")
+            return
+        
+        # start=1 から数えて start+results <= MAX_SEARCH_OFFSET となる範囲までしか取得できない
+        limit = min(limit, MAX_SEARCH_OFFSET - 1)
+        first_size = min(limit, MAX_RESULTS_PER_PAGE)
+        
+        try:
+            first_page = self._fetch_search_page(keyword, 1, first_size)
+        except Exception as e:
+            print(f"Error searching items for '{keyword}': {str(e)}")
+            return
+        
+        yield from first_page["items"]
+        
+        # 総件数と取得上限から残りのページを決める
+        available = min(limit, first_page["total"] or limit)
+        if len(first_page["items"]) < first_size or available <= first_size:
+            return
+        
+        offsets = range(first_size + 1, available + 1, MAX_RESULTS_PER_PAGE)
+        executor = ThreadPoolExecutor(max_workers=max(1, self.page_workers), thread_name_prefix="yahoo-shopping-page")
+        futures = {
+            executor.submit(self._fetch_search_page, keyword, start,
+                            min(MAX_RESULTS_PER_PAGE, available - start + 1, MAX_SEARCH_OFFSET - start)): start
+            for start in offsets
+        }
+        
+        try:
+            for future in as_completed(futures):
+                try:
+                    page = future.result()
+                except Exception as e:
+                    print(f"Error fetching page (start={futures[future]}) for '{keyword}': {str(e)}")
+                    continue
+                yield from page["items"]
+        finally:
+            # 途中で打ち切られた場合は未実行のページを取り消す
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+    
+    def search_items_bulk(self, keyword: str, limit: int = 500) -> List[Dict[str, Any]]:
+        """
+        キーワードで50件を超える商品を一括取得します（価格履歴ジョブ向け）。
+        
+        Args:
+            keyword: 検索キーワード
+            limit: 取得する結果の最大数（最大999件）
+            
+        Returns:
+            List[Dict[str, Any]]: 商品のリスト（重複を除き価格昇順）
+        """
+        results = []
+        seen_ids = set()
+        for item in self.iter_search_items_pages(keyword, limit):
+            item_id = item.get("item_id")
+            if item_id and item_id in seen_ids:
+                continue
+            seen_ids.add(item_id)
+            results.append(item)
+        
+        results.sort(key=lambda item: item["price"])
+        return results[:limit]
+    
     def search_by_jan_code(self, jan_code: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
         JANコードで商品を検索します。
@@ -240,6 +403,8 @@ class YahooShoppingClient:
                 results.append(result)
             
             return results
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"Error searching by JAN code '{jan_code}': {str(e)}")
             return []
@@ -327,8 +492,11 @@ class YahooShoppingClient:
         Returns:
             List[Dict[str, Any]]: 統計情報付きの商品データ
         """
-        # 商品を検索
-        items = self.search_items(keyword, limit)
+        # 商品を検索（50件を超える場合は複数ページを並列取得）
+        if limit > MAX_RESULTS_PER_PAGE:
+            items = self.search_items_bulk(keyword, limit)
+        else:
+            items = self.search_items(keyword, limit)
         
         if not items:
             return []
@@ -5,6 +5,9 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import logging
 from src.utils.supabase_client import SupabaseClient
+from src.utils.search_result_store import derive_item_id
+from src.search.task_store import TaskStore, SupabaseTaskStore, get_task_store
+from src.search.cheapest_offers import CheapestOfferIndex
 from src.jan.jan_lookup import JANLookupClient
 from src.pricing.calculator import PriceCalculator
 
@@ -14,15 +17,22 @@ logger = logging.getLogger(__name__)
 class JANSearchTaskManager:
     """JANコード検索タスクの管理クラス"""
     
-    def __init__(self, supabase_client: SupabaseClient, jan_lookup_client: JANLookupClient):
+    def __init__(self, supabase_client: Optional[SupabaseClient], jan_lookup_client: JANLookupClient,
+                 store: Optional[TaskStore] = None):
         """
         初期化
         
         Args:
-            supabase_client: Supabaseクライアント
+            supabase_client: Supabaseクライアント（Noneの場合は TASK_STORE_BACKEND で選択した保存先）
             jan_lookup_client: JANコードルックアップクライアント
+            store: タスクの保存先（指定した場合はSupabaseクライアントより優先）
         """
         self.supabase = supabase_client
+        if store is None:
+            store = SupabaseTaskStore(supabase_client, tasks_table='jan_search_tasks') \
+                if supabase_client is not None else get_task_store(tasks_table='jan_search_tasks')
+        self.store = store
+        self.offer_index = CheapestOfferIndex(store)
         self.jan_lookup = jan_lookup_client
         self.price_calculator = PriceCalculator()
         
@@ -58,11 +68,11 @@ class JANSearchTaskManager:
             }
             
             # データベースに保存
-            result = self.supabase.table('jan_search_tasks').insert(task_data).execute()
+            created = self.store.insert_task(task_data)
             
-            if result.data:
+            if created:
                 logger.info(f"Task created successfully: {task_data['id']}")
-                return result.data[0]
+                return created
             else:
                 logger.error(f"Failed to create task for JAN code: {jan_code}")
                 return None
@@ -82,10 +92,10 @@ class JANSearchTaskManager:
             タスク情報
         """
         try:
-            result = self.supabase.table('jan_search_tasks').select('*').eq('id', task_id).execute()
+            task = self.store.get_task(task_id)
             
-            if result.data:
-                return result.data[0]
+            if task:
+                return task
             else:
                 logger.warning(f"Task not found: {task_id}")
                 return None
@@ -117,9 +127,7 @@ class JANSearchTaskManager:
             elif status == 'failed' and error_message:
                 update_data['error_message'] = error_message
                 
-            result = self.supabase.table('jan_search_tasks').update(update_data).eq('id', task_id).execute()
-            
-            if result.data:
+            if self.store.update_task(task_id, update_data):
                 logger.info(f"Task status updated: {task_id} -> {status}")
                 return True
             else:
@@ -146,15 +154,8 @@ class JANSearchTaskManager:
             タスク一覧
         """
         try:
-            query = self.supabase.table('jan_search_tasks').select('*')
-            
-            if status:
-                query = query.eq('status', status)
-                
-            query = query.order('created_at', desc=True).range(offset, offset + limit - 1)
-            result = query.execute()
-            
-            return result.data if result.data else []
+            statuses = [status] if status else None
+            return self.store.list_tasks(['*'], limit, statuses=statuses, offset=offset)
             
         except Exception as e:
             logger.error(f"Error getting tasks: {e}")
@@ -162,7 +163,8 @@ class JANSearchTaskManager:
             
     def save_search_results(self, task_id: str, results: List[Dict[str, Any]]) -> bool:
         """
-        検索結果を保存
+        検索結果を保存（(task_id, platform, item_id) をキーにした差分upsert）
+        あわせてタスクのJANコードの最安出品インデックスを更新
         
         Args:
             task_id: タスクID
@@ -172,10 +174,6 @@ class JANSearchTaskManager:
             保存成功の場合True
         """
         try:
-            # 既存の結果を削除
-            self.supabase.table('search_results').delete().eq('task_id', task_id).execute()
-            
-            # 新しい結果を保存
             search_results = []
             for result in results:
                 # 価格計算
@@ -186,9 +184,8 @@ class JANSearchTaskManager:
                 )
                 
                 search_result = {
-                    'id': str(uuid.uuid4()),
-                    'task_id': task_id,
                     'platform': result.get('platform', ''),
+                    'item_id': derive_item_id(result),
                     'item_title': result.get('title', ''),
                     'price': float(price_info['base_price']),
                     'shipping_fee': float(price_info['shipping_fee']),
@@ -198,28 +195,45 @@ class JANSearchTaskManager:
                     'item_image_url': result.get('image_url', ''),
                     'seller_name': result.get('seller', ''),
                     'condition_text': result.get('condition', ''),
-                    'created_at': datetime.now().isoformat(),
                     'expires_at': (datetime.now() + timedelta(days=7)).isoformat()
                 }
                 search_results.append(search_result)
                 
-            if search_results:
-                result = self.supabase.table('search_results').insert(search_results).execute()
-                
-                if result.data:
-                    logger.info(f"Saved {len(search_results)} search results for task {task_id}")
-                    return True
-                else:
-                    logger.error(f"Failed to save search results for task {task_id}")
-                    return False
-            else:
+            if not search_results:
                 logger.warning(f"No search results to save for task {task_id}")
-                return True
+                
+            stats = self.store.save_results(task_id, search_results)
+            logger.info(f"Saved {stats['upserted']} search results for task {task_id} "
+                        f"({stats['unchanged']} unchanged, {stats['deleted']} removed)")
+            self._update_cheapest_offers(task_id, search_results)
+            return True
                 
         except Exception as e:
             logger.error(f"Error saving search results for task {task_id}: {e}")
             return False
             
+    def _update_cheapest_offers(self, task_id: str, search_results: List[Dict[str, Any]]) -> None:
+        """
+        保存した検索結果で最安出品インデックスを更新（失敗しても保存結果には影響させない）
+        
+        Args:
+            task_id: タスクID
+            search_results: 保存した検索結果の行
+        """
+        try:
+            task = self.store.get_task(task_id, columns=('jan_code',))
+            if not task or not task.get('jan_code'):
+                return
+            
+            platform_items: Dict[str, List[Dict[str, Any]]] = {}
+            for row in search_results:
+                total_price = row['price'] + row['shipping_fee'] + row['service_fee']
+                platform_items.setdefault(row['platform'], []).append(dict(row, total_price=total_price))
+            self.offer_index.update(task['jan_code'], platform_items)
+            
+        except Exception as e:
+            logger.warning(f"Failed to update cheapest offers for task {task_id}: {e}")
+            
     def get_search_results(self, task_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """
         検索結果を取得（総額でソート）
@@ -232,26 +246,27 @@ class JANSearchTaskManager:
             検索結果のリスト
         """
         try:
-            result = self.supabase.table('search_results').select('*').eq('task_id', task_id).order('total_price').limit(limit).execute()
-            
-            return result.data if result.data else []
+            return self.store.get_results(task_id, limit=limit, order_by='total_price')
             
         except Exception as e:
             logger.error(f"Error getting search results for task {task_id}: {e}")
             return []
             
-    def cleanup_expired_results(self) -> int:
+    def cleanup_expired_results(self, batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> int:
         """
-        期限切れの検索結果を削除
+        期限切れの検索結果を削除（expires_at のインデックスに沿って一定件数ずつ）
         
+        Args:
+            batch_size: 1回に削除する件数（省略時は RETENTION_BATCH_SIZE）
+            max_batches: 最大削除回数（省略時は全件削除するまで。残りは次回の実行で削除）
+            
         Returns:
             削除された件数
         """
         try:
             # 期限切れの結果を削除
-            result = self.supabase.rpc('cleanup_expired_search_results').execute()
-            
-            deleted_count = result.data if result.data else 0
+            deleted_count = self.store.delete_expired_results(datetime.now(), batch_size=batch_size,
+                                                              max_batches=max_batches)
             logger.info(f"Cleaned up {deleted_count} expired search results")
             return deleted_count
             
@@ -0,0 +1,236 @@
+"""
+タスク実行の受け入れ制御
+ワーカーごとのローカルなセマフォで実行枠を管理し、フリート全体の実行中タスク数は
+一定間隔でのみ取得します。取得した空き枠は生存しているワーカー間で分け合い、
+各ワーカーは自分の取り分をリース（有効期限付きの枠）として保持します。
+タスクの受け入れ時にはDBへの問い合わせを行いません。
+"""
+
+import os
+import socket
+import uuid
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+from src.utils.config import get_optional_config
+
+logger = logging.getLogger(__name__)
+
+WORKER_LEASE_TABLE = 'search_worker_leases'
+
+
+def _default_worker_id() -> str:
+    """ホスト名・プロセスID・乱数からワーカーIDを作成する"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def share_free_slots(free_slots: int, worker_ids: List[str], worker_id: str) -> int:
+    """
+    空き枠をワーカー間で分け合った場合の取り分を求めます。
+    割り切れない分はワーカーIDの昇順で先頭から1つずつ割り当てます。
+    
+    Args:
+        free_slots: フリート全体の空き枠
+        worker_ids: 生存しているワーカーのID（自分を含む）
+        worker_id: 自分のワーカーID
+    
+    Returns:
+        int: 自分の取り分
+    """
+    if free_slots <= 0:
+        return 0
+    
+    workers = sorted(set(worker_ids) | {worker_id})
+    share, remainder = divmod(free_slots, len(workers))
+    return share + (1 if workers.index(worker_id) < remainder else 0)
+
+
+class TaskAdmissionController:
+    """ローカルセマフォとリースによる実行中タスク数の制御"""
+    
+    def __init__(self, task_manager, max_running_tasks: int, worker_id: Optional[str] = None,
+                 refresh_interval: Optional[float] = None, lease_seconds: Optional[float] = None):
+        """
+        初期化
+        
+        Args:
+            task_manager: SearchTaskManager（実行中タスク数の取得とSupabaseクライアントに使用）
+            max_running_tasks: フリート全体で同時に実行できるタスクの最大数
+            worker_id: ワーカーID（省略時はホスト名とプロセスIDから作成）
+            refresh_interval: 全体の実行中タスク数を取得する間隔（秒、省略時は TASK_ADMISSION_REFRESH_SECONDS）
+            lease_seconds: リースの有効期間（秒、省略時は TASK_ADMISSION_LEASE_SECONDS）
+        """
+        self.task_manager = task_manager
+        self.max_running_tasks = max(1, max_running_tasks)
+        self.worker_id = worker_id or _default_worker_id()
+        self.refresh_interval = refresh_interval or float(get_optional_config("TASK_ADMISSION_REFRESH_SECONDS", "5"))
+        self.lease_seconds = lease_seconds or float(get_optional_config("TASK_ADMISSION_LEASE_SECONDS", "15"))
+        
+        self._slots = threading.BoundedSemaphore(self.max_running_tasks)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._allowed = 0
+        self._lease_expires_at = 0.0  # time.monotonic() 基準
+        self._fleet_running = 0
+        self._live_workers = 1
+        # リース用テーブルはSupabaseのバックエンドでのみ使用する
+        self._lease_table_available = getattr(task_manager, 'supabase', None) is not None
+        
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self) -> None:
+        """リースを取得し、定期更新スレッドを開始する"""
+        if self._thread is not None:
+            return
+        
+        self._stop_event.clear()
+        self.refresh()
+        self._thread = threading.Thread(target=self._refresh_loop, name="task-admission-refresh", daemon=True)
+        self._thread.start()
+        logger.info(f"Started task admission controller for worker {self.worker_id}")
+    
+    def stop(self) -> None:
+        """定期更新を停止し、リースを返却する"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.refresh_interval + 1)
+            self._thread = None
+        
+        with self._lock:
+            self._allowed = 0
+            self._lease_expires_at = 0.0
+        
+        if self._lease_table_available:
+            try:
+                self.task_manager.supabase.table(WORKER_LEASE_TABLE).delete() \
+                    .eq('worker_id', self.worker_id).execute()
+            except Exception as e:
+                logger.warning(f"Failed to release worker lease {self.worker_id}: {e}")
+    
+    def _refresh_loop(self) -> None:
+        """一定間隔でリースを更新する"""
+        while not self._stop_event.wait(self.refresh_interval):
+            self.refresh()
+    
+    def refresh(self) -> bool:
+        """
+        全体の実行中タスク数を取得してリースを更新します。
+        失敗した場合は現在のリースを維持し、有効期限が切れると新しいタスクを受け入れなくなります。
+        
+        Returns:
+            bool: 更新に成功した場合はTrue
+        """
+        with self._lock:
+            in_use = self._in_use
+        
+        try:
+            live_workers, other_reserved = self._sync_worker_leases(in_use)
+            fleet_running = self.task_manager.count_running_tasks()
+        except Exception as e:
+            logger.warning(f"Failed to refresh task admission lease: {e}")
+            return False
+        
+        with self._lock:
+            # 他のワーカーが使用中の枠（リースの報告値と実行中タスク数の多い方）
+            others = max(other_reserved, fleet_running - self._in_use)
+            free_slots = self.max_running_tasks - self._in_use - max(0, others)
+            share = share_free_slots(free_slots, live_workers, self.worker_id)
+            
+            self._allowed = min(self.max_running_tasks, self._in_use + share)
+            self._lease_expires_at = time.monotonic() + self.lease_seconds
+            self._fleet_running = fleet_running
+            self._live_workers = len(set(live_workers) | {self.worker_id})
+        
+        logger.debug(f"Admission lease for {self.worker_id}: allowed={self._allowed}, "
+                     f"fleet_running={fleet_running}, workers={self._live_workers}")
+        return True
+    
+    def _sync_worker_leases(self, in_use: int):
+        """
+        自分のリースを登録し、生存しているワーカーと他ワーカーの使用中の枠数を取得する
+        リース用テーブルがない場合は単一ワーカーとして扱う
+        """
+        if not self._lease_table_available:
+            return [self.worker_id], 0
+        
+        now = datetime.now(timezone.utc)
+        try:
+            self.task_manager.supabase.table(WORKER_LEASE_TABLE).upsert({
+                'worker_id': self.worker_id,
+                'slots': in_use,
+                'expires_at': (now + timedelta(seconds=self.lease_seconds)).isoformat(),
+                'updated_at': now.isoformat()
+            }, on_conflict='worker_id').execute()
+            
+            result = self.task_manager.supabase.table(WORKER_LEASE_TABLE).select('worker_id,slots') \
+                .gt('expires_at', now.isoformat()).execute()
+        except Exception as e:
+            if 'does not exist' in str(e) or '42P01' in str(e):
+                logger.warning(f"Worker lease table {WORKER_LEASE_TABLE} not found; "
+                               "admission control falls back to a single worker")
+                self._lease_table_available = False
+                return [self.worker_id], 0
+            raise
+        
+        rows = result.data or []
+        live_workers = [row['worker_id'] for row in rows]
+        other_reserved = sum(int(row.get('slots') or 0) for row in rows if row['worker_id'] != self.worker_id)
+        return live_workers, other_reserved
+    
+    def try_acquire(self) -> bool:
+        """
+        実行枠を1つ取得します（DBへの問い合わせは行いません）。
+        
+        Returns:
+            bool: 取得できた場合はTrue
+        """
+        with self._lock:
+            if time.monotonic() >= self._lease_expires_at:
+                return False
+            if self._in_use >= self._allowed:
+                return False
+            if not self._slots.acquire(blocking=False):
+                return False
+            self._in_use += 1
+            return True
+    
+    def release(self) -> None:
+        """取得した実行枠を返却する"""
+        with self._lock:
+            self._in_use -= 1
+            self._slots.release()
+    
+    def available_slots(self) -> int:
+        """
+        現在のリースで受け入れられるタスク数を取得する
+        
+        Returns:
+            int: 受け入れ可能なタスク数
+        """
+        with self._lock:
+            if time.monotonic() >= self._lease_expires_at:
+                return 0
+            return max(0, self._allowed - self._in_use)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        受け入れ制御の状態を取得する
+        
+        Returns:
+            Dict[str, Any]: 状態情報
+        """
+        with self._lock:
+            remaining = self._lease_expires_at - time.monotonic()
+            return {
+                'worker_id': self.worker_id,
+                'max_running_tasks': self.max_running_tasks,
+                'in_use': self._in_use,
+                'allowed': self._allowed,
+                'lease_remaining': round(max(0.0, remaining), 1),
+                'fleet_running': self._fleet_running,
+                'live_workers': self._live_workers
+            }
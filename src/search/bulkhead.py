@@ -0,0 +1,318 @@
+"""
+バルクヘッド（隔離された実行プール）
+ブラウザ（Selenium/Chrome）を使うプラットフォーム検索と、軽量なHTTP API呼び出しを
+別々のプールで実行し、それぞれに同時実行数と待ち行列の上限を設けます。
+ブラウザ側が停滞しても、API側の検索はタスクをまたいで影響を受けません。
+タイムアウトしたブラウザ検索は abandon でワーカープロセスごと停止し、実行枠を解放します。
+"""
+
+import os
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Callable, Set
+
+from src.utils.config import get_optional_config
+
+logger = logging.getLogger(__name__)
+
+# ブラウザ（Chrome）を起動して検索するプラットフォーム
+BROWSER_PLATFORMS = frozenset({'mercari', 'rakuma', 'paypay'})
+
+
+class BulkheadFullError(Exception):
+    """バルクヘッドの実行枠と待ち行列が埋まっているため投入を拒否したことを示す例外"""
+    
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        super().__init__(f"Bulkhead '{name}' is full ({capacity} running or queued)")
+
+
+class Bulkhead:
+    """同時実行数と待ち行列の上限を持つ実行プール"""
+    
+    def __init__(self, name: str, max_workers: int, max_queue: int, kind: str = 'thread',
+                 start_method: str = 'spawn'):
+        """
+        初期化
+        
+        Args:
+            name: バルクヘッド名
+            max_workers: 同時に実行するワーカー数
+            max_queue: 実行待ちとして受け付けるタスク数の上限
+            kind: 'thread'（スレッドプール）または 'process'（プロセスプール）
+            start_method: プロセスプールの起動方式（kind='process' の場合のみ使用）
+        """
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"未対応のプール種別: {kind}")
+        
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.kind = kind
+        self.start_method = start_method
+        
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._owners: Dict[Future, Any] = {}  # 実行中のFuture -> 投入したプール
+        self._abandoned: Set[Future] = set()  # 打ち切った（枠を解放済みの）Future
+        self._retired: Set[Any] = set()  # 停滞したワーカーを含むため、残りのタスクの完了後に停止するプール
+        self._recycled = 0
+    
+    def _get_executor(self):
+        """プールを取得（未作成・破損時は作成）"""
+        with self._lock:
+            if self._executor is None:
+                if self.kind == 'process':
+                    context = multiprocessing.get_context(self.start_method)
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix=f"bulkhead-{self.name}")
+                logger.info(f"Started {self.kind} bulkhead '{self.name}' with {self.max_workers} workers (queue limit: {self.max_queue})")
+            return self._executor
+    
+    def _discard_broken_executor(self, executor) -> None:
+        """ワーカープロセスの異常終了で使えなくなったプールを破棄する"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+        logger.warning(f"Bulkhead '{self.name}' pool was broken and will be recreated")
+    
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        タスクを投入します。実行枠と待ち行列が埋まっている場合は待たずに拒否します。
+        
+        Args:
+            func: 実行する関数（プロセスプールの場合はpickle可能なモジュールレベル関数）
+            *args: 関数の位置引数
+            **kwargs: 関数のキーワード引数
+        
+        Returns:
+            Future: 実行結果のFuture
+        
+        Raises:
+            BulkheadFullError: 実行枠と待ち行列が埋まっている場合
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise BulkheadFullError(self.name, self.max_workers + self.max_queue)
+        
+        try:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(func, *args, **kwargs)
+            except BrokenProcessPool:
+                self._discard_broken_executor(executor)
+                executor = self._get_executor()
+                future = executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        
+        with self._lock:
+            self._in_flight += 1
+            self._owners[future] = executor
+        future.add_done_callback(self._on_done)
+        return future
+    
+    def abandon(self, future: Future) -> None:
+        """
+        タイムアウトしたタスクを打ち切り、実行枠を解放します。
+        開始前のタスクは取り消します。プロセスプールで実行中のタスクは取り消せないため、
+        そのプールへの投入をやめて新しいプールを作り、プール内の他のタスクが終わった時点で
+        ワーカープロセスを停止します（停滞したブラウザが枠を使い続けないようにする）。
+        
+        Args:
+            future: submit が返したFuture
+        """
+        if future.cancel() or future.done():
+            return
+        if self.kind != 'process':
+            # スレッドは停止できないため、完了するまで枠を使い続ける
+            return
+        
+        with self._lock:
+            if future in self._abandoned or future not in self._owners:
+                return
+            self._abandoned.add(future)
+            self._in_flight -= 1
+            executor = self._owners[future]
+            if self._executor is executor:
+                self._executor = None
+            self._retired.add(executor)
+            self._recycled += 1
+        self._slots.release()
+        logger.warning(f"Bulkhead '{self.name}' abandoned a stalled task; its pool will be recycled")
+        self._stop_idle_retired()
+    
+    def _stop_idle_retired(self) -> None:
+        """打ち切ったタスク以外が終わった退役プールのワーカープロセスを停止する"""
+        with self._lock:
+            idle = [
+                executor for executor in self._retired
+                if all(future in self._abandoned for future, owner in self._owners.items() if owner is executor)
+            ]
+            self._retired.difference_update(idle)
+        
+        for executor in idle:
+            # ProcessPoolExecutor には実行中のタスクを止める公開APIがないため、ワーカーを直接停止する
+            for process in list((getattr(executor, '_processes', None) or {}).values()):
+                if process.is_alive():
+                    process.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)
+            logger.info(f"Stopped recycled pool of bulkhead '{self.name}'")
+    
+    def _on_done(self, future: Future) -> None:
+        """タスク完了時に枠を解放する"""
+        with self._lock:
+            executor = self._owners.pop(future, None)
+            abandoned = future in self._abandoned
+            self._abandoned.discard(future)
+            if not abandoned:
+                self._in_flight -= 1
+        if not abandoned:
+            # 打ち切ったタスクの枠は abandon で解放済み
+            self._slots.release()
+        
+        if self.kind != 'process':
+            return
+        if not abandoned and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool) \
+                and executor is not None and executor is self._executor:
+            self._discard_broken_executor(executor)
+        if self._retired:
+            self._stop_idle_retired()
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        プールを停止します（次回の投入時に再作成されます）。
+        
+        Args:
+            wait: 実行中のタスクの完了を待つかどうか
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+            logger.info(f"Stopped bulkhead '{self.name}'")
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        バルクヘッドの状態情報を取得します。
+        
+        Returns:
+            Dict[str, Any]: 状態情報
+        """
+        with self._lock:
+            return {
+                'name': self.name,
+                'kind': self.kind,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'rejected': self._rejected,
+                'recycled': self._recycled
+            }
+
+
+def _default_browser_workers() -> int:
+    """物理メモリとCPU数からブラウザ用ワーカー数を算出"""
+    memory_per_worker = int(get_optional_config("BROWSER_POOL_MEMORY_PER_WORKER_MB", "1024")) * 1024 * 1024
+    upper_limit = int(get_optional_config("BROWSER_POOL_MAX_WORKERS_LIMIT", "4"))
+    
+    try:
+        total_memory = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        total_memory = 0
+    
+    # メモリの半分をブラウザに割り当てる
+    by_memory = total_memory // 2 // memory_per_worker if total_memory > 0 else 1
+    return max(1, min(upper_limit, os.cpu_count() or 1, by_memory))
+
+
+# バルクヘッドのレジストリ（プロセス内で共有）
+_bulkheads: Dict[str, Bulkhead] = {}
+_registry_lock = threading.Lock()
+
+
+def _create_bulkhead(name: str) -> Bulkhead:
+    """設定値からバルクヘッドを作成"""
+    if name == 'browser':
+        workers = int(get_optional_config("BROWSER_POOL_MAX_WORKERS", str(_default_browser_workers())))
+        return Bulkhead(
+            'browser',
+            max_workers=workers,
+            max_queue=int(get_optional_config("BROWSER_POOL_MAX_QUEUE", str(workers * 4))),
+            kind=get_optional_config("BROWSER_POOL_KIND", "process"),
+            start_method=get_optional_config("BROWSER_POOL_START_METHOD", "spawn"),
+        )
+    
+    return Bulkhead(
+        name,
+        max_workers=int(get_optional_config("API_POOL_MAX_WORKERS", "32")),
+        max_queue=int(get_optional_config("API_POOL_MAX_QUEUE", "256")),
+        kind='thread',
+    )
+
+
+def get_bulkhead(name: str) -> Bulkhead:
+    """
+    名前に対応するバルクヘッドを取得します（プロセス内で共有）。
+    'browser' は BROWSER_POOL_*、それ以外は API_POOL_* 環境変数で調整できます。
+    
+    Args:
+        name: バルクヘッド名（'browser' または 'api'）
+    
+    Returns:
+        Bulkhead: バルクヘッド
+    """
+    bulkhead = _bulkheads.get(name)
+    if bulkhead is not None:
+        return bulkhead
+    
+    with _registry_lock:
+        if name not in _bulkheads:
+            _bulkheads[name] = _create_bulkhead(name)
+        return _bulkheads[name]
+
+
+def get_platform_bulkhead(platform: str) -> Bulkhead:
+    """
+    プラットフォームの検索を実行するバルクヘッドを取得します。
+    
+    Args:
+        platform: プラットフォーム名
+    
+    Returns:
+        Bulkhead: ブラウザを使うプラットフォームは 'browser'、それ以外は 'api'
+    """
+    return get_bulkhead('browser' if platform in BROWSER_PLATFORMS else 'api')
+
+
+def get_all_bulkhead_status() -> Dict[str, Dict[str, Any]]:
+    """
+    作成済みの全バルクヘッドの状態を取得します。
+    
+    Returns:
+        Dict[str, Dict[str, Any]]: バルクヘッド名 -> 状態情報
+    """
+    return {name: bulkhead.get_status() for name, bulkhead in list(_bulkheads.items())}
+
+
+def shutdown_bulkheads(wait: bool = True) -> None:
+    """
+    全バルクヘッドのプールを停止します。
+    
+    Args:
+        wait: 実行中のタスクの完了を待つかどうか
+    """
+    for bulkhead in list(_bulkheads.values()):
+        bulkhead.shutdown(wait=wait)
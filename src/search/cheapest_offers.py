@@ -0,0 +1,236 @@
+"""
+JANコード別の最安出品インデックス
+検索結果を保存するたびに、JANコード×プラットフォームごとの安い順の上位N件を cheapest_offers テーブルに反映します。
+「JANコードXの現在の最安値」は、インデックスが十分に新しければ検索を実行せずに1回の読み込みで返せます。
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Iterable, Optional, Sequence
+
+from src.utils.config import get_optional_config
+from src.utils.search_result_store import derive_item_id
+from src.search.result_item import SearchResultItem
+
+logger = logging.getLogger(__name__)
+
+CHEAPEST_OFFERS_TABLE = 'cheapest_offers'
+
+# 検索日時だけを記録する行の順位（出品が0件でも「最近検索した」ことを残す）
+SEARCH_MARKER_RANK = 0
+
+
+def ranked_offer_rows(offers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    保存する行（検索日時の目印の行 + 安い順に1始まりの順位を付けた出品）を返します。
+    
+    Args:
+        offers: 安い順の出品
+    
+    Returns:
+        List[Dict[str, Any]]: rank を含む行
+    """
+    # 一括upsertで列がそろうよう、出品と同じ項目を空で持たせる
+    marker = {
+        'rank': SEARCH_MARKER_RANK,
+        'item_id': '',
+        'item_title': '',
+        'item_url': '',
+        'item_image_url': '',
+        'total_price': 0,
+        'currency': 'JPY',
+        'seller_name': ''
+    }
+    return [marker] + [dict(offer, rank=rank) for rank, offer in enumerate(offers, 1)]
+
+
+def extract_jan_code(search_params: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    検索パラメータからJANコードを取り出します（SearchExecutor と同じく8桁以上の数字のクエリをJANコードとみなす）。
+    
+    Args:
+        search_params: 検索パラメータ
+    
+    Returns:
+        Optional[str]: JANコード（JANコード検索でない場合はNone）
+    """
+    if not search_params:
+        return None
+    
+    for key in ('jan_code', 'query'):
+        value = str(search_params.get(key) or '').strip()
+        if value.isdigit() and len(value) >= 8:
+            return value
+    return None
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """ISO形式の日時をタイムゾーン付きのUTCに変換する（タイムゾーンのない値はローカル時刻とみなす）"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except (TypeError, ValueError):
+            return None
+    return parsed.astimezone(timezone.utc)
+
+
+def build_offer(item: Dict[str, Any], platform: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    検索結果アイテムを最安出品インデックスの行に変換します。
+    
+    Args:
+        item: 検索結果アイテム（統一フォーマット、互換キー、search_results の行のいずれも可）
+        platform: プラットフォーム名（アイテムに含まれない場合）
+    
+    Returns:
+        Optional[Dict[str, Any]]: インデックスの行（総額が正の数でない場合はNone）
+    """
+    if not isinstance(item, SearchResultItem):
+        item = SearchResultItem.from_dict(item)
+    
+    total_price = item.total_price
+    if not isinstance(total_price, (int, float)) or total_price <= 0:
+        return None
+    
+    return {
+        'platform': item.platform or platform or 'unknown',
+        'item_id': derive_item_id(item),
+        'item_title': item.item_title or '',
+        'item_url': item.item_url or '',
+        'item_image_url': item.item_image_url or '',
+        'total_price': float(total_price),
+        'currency': item.currency or 'JPY',
+        'seller_name': item.seller or item.get('seller_name') or ''
+    }
+
+
+def select_cheapest(offers: Iterable[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """
+    出品を商品IDで重複除去し、総額の安い順に上位limit件を返します。
+    
+    Args:
+        offers: build_offer で作成した行
+        limit: 件数
+    
+    Returns:
+        List[Dict[str, Any]]: 安い順の行
+    """
+    cheapest: Dict[str, Dict[str, Any]] = {}
+    for offer in offers:
+        current = cheapest.get(offer['item_id'])
+        if current is None or offer['total_price'] < current['total_price']:
+            cheapest[offer['item_id']] = offer
+    return sorted(cheapest.values(), key=lambda offer: offer['total_price'])[:limit]
+
+
+class CheapestOfferIndex:
+    """JANコード×プラットフォームごとの最安出品インデックス"""
+    
+    def __init__(self, store, top_n: Optional[int] = None, max_age_seconds: Optional[float] = None):
+        """
+        初期化
+        
+        Args:
+            store: タスクの保存先（TaskStore）
+            top_n: プラットフォームごとに保持する件数（省略時は CHEAPEST_OFFERS_TOP_N）
+            max_age_seconds: インデックスを新しいとみなす秒数（省略時は CHEAPEST_OFFERS_MAX_AGE_SECONDS）
+        """
+        self.store = store
+        self.top_n = top_n or int(get_optional_config("CHEAPEST_OFFERS_TOP_N", "5"))
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else \
+            float(get_optional_config("CHEAPEST_OFFERS_MAX_AGE_SECONDS", "3600"))
+    
+    def update(self, jan_code: str, platform_items: Dict[str, List[Dict[str, Any]]],
+               observed_at: Optional[str] = None) -> int:
+        """
+        プラットフォームごとの上位N件を置き換えます（指定したプラットフォームのみ。結果が0件なら出品を空にし、
+        検索日時だけを記録する）。
+        
+        Args:
+            jan_code: JANコード
+            platform_items: プラットフォーム名 -> そのプラットフォームの検索結果アイテム
+            observed_at: 検索した日時（ISO形式、タイムゾーン付き。省略時は現在のUTC時刻）
+        
+        Returns:
+            int: インデックスに書き込んだ行数
+        """
+        observed_at = observed_at or datetime.now(timezone.utc).isoformat()
+        written = 0
+        for platform, items in platform_items.items():
+            offers = select_cheapest(
+                (offer for offer in (build_offer(item, platform) for item in items) if offer), self.top_n
+            )
+            self.store.replace_cheapest_offers(jan_code, platform, offers, observed_at)
+            written += len(offers)
+        
+        logger.info(f"Updated cheapest offers for JAN {jan_code}: {written} offers on {len(platform_items)} platforms")
+        return written
+    
+    def update_from_result(self, search_result: Dict[str, Any],
+                           search_params: Optional[Dict[str, Any]] = None) -> int:
+        """
+        execute_search の出力からインデックスを更新します（エラーになったプラットフォームは更新しない）。
+        
+        Args:
+            search_result: execute_search の出力
+            search_params: 検索パラメータ（省略時は出力に含まれるもの）
+        
+        Returns:
+            int: インデックスに書き込んだ行数（JANコード検索でない場合は0）
+        """
+        jan_code = extract_jan_code(search_params or search_result.get('search_params'))
+        if not jan_code:
+            return 0
+        
+        platform_items = {
+            platform: result.get('items') or []
+            for platform, result in (search_result.get('platform_results') or {}).items()
+            if isinstance(result, dict) and 'error' not in result
+        }
+        if not platform_items:
+            return 0
+        return self.update(jan_code, platform_items)
+    
+    def lookup(self, jan_code: str, platforms: Optional[Sequence[str]] = None,
+               max_age_seconds: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        インデックスから最安出品を取得します（1回の読み込み）。
+        
+        Args:
+            jan_code: JANコード
+            platforms: 対象プラットフォーム（指定した場合はすべてのプラットフォームが新しいときだけ返す。
+                       最近検索して出品がなかったプラットフォームも新しいとみなす）
+            max_age_seconds: 新しいとみなす秒数（省略時はインスタンスの設定値）
+        
+        Returns:
+            Optional[Dict[str, Any]]: jan_code, offers（安い順）, cheapest, platforms, updated_at。
+                                      新しいインデックスがない場合はNone
+        """
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        threshold = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+        
+        fresh: Dict[str, List[Dict[str, Any]]] = {}
+        oldest: Optional[datetime] = None
+        for offer in self.store.get_cheapest_offers(jan_code, platforms):
+            updated_at = _parse_timestamp(offer.get('updated_at'))
+            if updated_at is None or updated_at < threshold:
+                continue
+            platform_offers = fresh.setdefault(offer['platform'], [])
+            if offer.get('rank') != SEARCH_MARKER_RANK:
+                platform_offers.append(offer)
+            oldest = updated_at if oldest is None or updated_at < oldest else oldest
+        
+        if not fresh or (platforms and any(platform not in fresh for platform in platforms)):
+            return None
+        
+        offers = sorted((offer for items in fresh.values() for offer in items),
+                        key=lambda offer: offer['total_price'])
+        return {
+            'jan_code': jan_code,
+            'offers': offers,
+            'cheapest': offers[0] if offers else None,
+            'platforms': sorted(fresh),
+            'updated_at': oldest.isoformat() if oldest else None
+        }
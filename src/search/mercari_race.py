@@ -0,0 +1,237 @@
+"""
+メルカリ検索のレース／フォールバック実行
+複数の検索経路（DOM解析、視覚スクレイピング、フォールバック）を別プロセスで起動し、
+最初に有効な結果を返した経路を採用します。安価な経路をすぐに開始し、一定時間応答がない場合や
+失敗した場合に次の経路を追加で起動します（前の経路は止めずに並走させる）。
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import threading
+import subprocess
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+from src.utils.config import get_optional_config
+
+logger = logging.getLogger(__name__)
+
+# リポジトリのルートディレクトリ
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_SCRIPTS_DIR = os.path.join(_PROJECT_ROOT, 'scripts', 'search')
+
+# 検索経路名 -> スクリプト（安価な順）
+MERCARI_SEARCH_PATHS = {
+    'dom': 'search_mercari_dom.py',
+    'visual_optimized': 'search_mercari_visual_optimized.py',
+    'visual': 'search_mercari_visual_integrated.py',
+    'fallback': 'search_mercari_final.py',
+}
+
+DEFAULT_PATH_ORDER = ('dom', 'visual_optimized', 'visual', 'fallback')
+
+
+def parse_script_output(stdout: str, stderr: str) -> Optional[Dict[str, Any]]:
+    """
+    検索スクリプトの出力から JSON_START / JSON_END で囲まれた結果を取り出します。
+    標準出力に見つからない場合は標準エラー出力も確認します。
+    
+    Args:
+        stdout: 標準出力
+        stderr: 標準エラー出力
+    
+    Returns:
+        Optional[Dict[str, Any]]: 検索結果（見つからない・解析できない場合はNone）
+    """
+    for source in (stdout, stderr):
+        start = source.find('JSON_START')
+        end = source.find('JSON_END')
+        if start == -1 or end == -1 or end < start:
+            continue
+        try:
+            return json.loads(source[start + len('JSON_START'):end].strip())
+        except json.JSONDecodeError as e:
+            logger.warning(f"メルカリ検索結果の解析エラー: {e}")
+            return None
+    return None
+
+
+def is_valid_result(result: Optional[Dict[str, Any]]) -> bool:
+    """
+    検索結果が採用可能かどうかを判定します（価格付きの商品が1件以上あること）。
+    
+    Args:
+        result: 検索スクリプトの結果
+    
+    Returns:
+        bool: 採用可能な場合True
+    """
+    if not result or result.get('success') is False:
+        return False
+    return any(isinstance(item, dict) and _price_value(item.get('price')) > 0 for item in result.get('results') or [])
+
+
+def _price_value(price: Any) -> float:
+    """価格を数値に変換する（"1,980" のような文字列も受け付け、変換できない場合は0）"""
+    if price is None:
+        return 0.0
+    try:
+        return float(str(price).replace(',', ''))
+    except ValueError:
+        return 0.0
+
+
+class MercariSearchRace:
+    """メルカリ検索経路のレース／フォールバック実行クラス"""
+    
+    def __init__(self, paths: Optional[List[str]] = None, hedge_delay: Optional[float] = None,
+                 timeout: Optional[float] = None):
+        """
+        初期化
+        
+        Args:
+            paths: 使用する検索経路（優先順）。Noneの場合は MERCARI_RACE_PATHS 環境変数または既定の順序
+            hedge_delay: 次の経路を追加で起動するまでの待ち時間（秒）
+            timeout: 全体のタイムアウト（秒）
+        """
+        if paths is None:
+            configured = get_optional_config("MERCARI_RACE_PATHS", ",".join(DEFAULT_PATH_ORDER))
+            paths = [name.strip() for name in configured.split(",") if name.strip()]
+        
+        self.paths = [name for name in paths if name in MERCARI_SEARCH_PATHS
+                      and os.path.exists(os.path.join(_SCRIPTS_DIR, MERCARI_SEARCH_PATHS[name]))]
+        self.hedge_delay = hedge_delay if hedge_delay is not None else float(get_optional_config("MERCARI_RACE_HEDGE_DELAY", "10"))
+        self.timeout = timeout if timeout is not None else float(get_optional_config("MERCARI_RACE_TIMEOUT", "170"))
+    
+    def _launch(self, name: str, query: str, limit: int,
+                results: "queue.Queue[Tuple[str, int, str, str]]") -> subprocess.Popen:
+        """検索経路のスクリプトを起動し、終了時に結果をキューへ入れる"""
+        script = os.path.join(_SCRIPTS_DIR, MERCARI_SEARCH_PATHS[name])
+        process = subprocess.Popen(
+            [sys.executable, script, query, str(limit)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=_PROJECT_ROOT,
+            start_new_session=True  # Chromeなどの子プロセスごと停止できるようにする
+        )
+        
+        def wait_for_exit():
+            stdout, stderr = process.communicate()
+            results.put((name, process.returncode, stdout, stderr))
+        
+        threading.Thread(target=wait_for_exit, name=f"mercari-race-{name}", daemon=True).start()
+        logger.info(f"メルカリ検索経路を起動しました: {name}")
+        return process
+    
+    @staticmethod
+    def _terminate(process: subprocess.Popen) -> None:
+        """検索経路のプロセスをプロセスグループごと停止する"""
+        if process.poll() is not None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError, AttributeError):
+            process.terminate()
+    
+    def search(self, query: str, limit: int = 20) -> Dict[str, Any]:
+        """
+        検索経路をレースさせ、最初に有効な結果を返した経路の結果を返します。
+        
+        Args:
+            query: 検索クエリ
+            limit: 取得する結果の最大数
+        
+        Returns:
+            Dict[str, Any]: 検索結果（results, method, metadata）。metadata.race に各経路の結果を記録
+        """
+        start_time = time.monotonic()
+        deadline = start_time + self.timeout
+        pending_paths = list(self.paths)
+        running: Dict[str, subprocess.Popen] = {}
+        attempts: List[Dict[str, Any]] = []
+        finished: "queue.Queue[Tuple[str, int, str, str]]" = queue.Queue()
+        winner: Optional[Dict[str, Any]] = None
+        last_result: Optional[Dict[str, Any]] = None
+        next_launch_at = start_time
+        
+        try:
+            while True:
+                now = time.monotonic()
+                
+                # 最初の経路は即座に、以降はヘッジ待ち時間ごとに（または失敗時に即座に）起動
+                if pending_paths and now >= next_launch_at:
+                    name = pending_paths.pop(0)
+                    try:
+                        running[name] = self._launch(name, query, limit, finished)
+                    except OSError as e:
+                        logger.error(f"メルカリ検索経路の起動エラー ({name}): {e}")
+                        attempts.append({'path': name, 'status': 'launch_error', 'error': str(e)})
+                        continue
+                    next_launch_at = now + self.hedge_delay
+                
+                if not running and not pending_paths:
+                    break
+                if now >= deadline:
+                    logger.warning(f"メルカリ検索がタイムアウトしました（{self.timeout:.0f}秒）")
+                    break
+                
+                wait_until = min(deadline, next_launch_at) if pending_paths else deadline
+                try:
+                    name, returncode, stdout, stderr = finished.get(timeout=max(0.0, wait_until - now))
+                except queue.Empty:
+                    continue
+                
+                running.pop(name, None)
+                result = parse_script_output(stdout or '', stderr or '')
+                elapsed = round(time.monotonic() - start_time, 2)
+                
+                if returncode == 0 and is_valid_result(result):
+                    attempts.append({'path': name, 'status': 'won', 'elapsed': elapsed})
+                    logger.info(f"メルカリ検索経路 {name} が{elapsed}秒で有効な結果を返しました")
+                    winner = dict(result, method=result.get('method') or name)
+                    break
+                
+                attempts.append({'path': name, 'status': 'failed', 'returncode': returncode, 'elapsed': elapsed})
+                logger.info(f"メルカリ検索経路 {name} は有効な結果を返しませんでした。次の経路に進みます")
+                if result:
+                    last_result = result
+                # 失敗した場合はヘッジ待ちをせずに次の経路を起動
+                next_launch_at = time.monotonic()
+        finally:
+            for name, process in running.items():
+                self._terminate(process)
+                attempts.append({'path': name, 'status': 'cancelled'})
+        
+        response = winner or last_result or {}
+        metadata = dict(response.get('metadata') or {})
+        metadata['race'] = attempts
+        metadata['execution_time'] = round(time.monotonic() - start_time, 2)
+        
+        return {
+            'success': winner is not None,
+            'results': response.get('results', []) if winner else [],
+            'platform': 'mercari',
+            'query': query,
+            'method': winner['method'] if winner else 'error',
+            'metadata': metadata
+        }
+
+
+def search_mercari_race(query: str, limit: int = 20, **kwargs) -> Dict[str, Any]:
+    """
+    メルカリ検索をレース／フォールバック方式で実行する便利関数
+    
+    Args:
+        query: 検索クエリ
+        limit: 取得する結果の最大数
+        **kwargs: MercariSearchRace に渡す引数（paths, hedge_delay, timeout）
+    
+    Returns:
+        Dict[str, Any]: 検索結果
+    """
+    return MercariSearchRace(**kwargs).search(query, limit)
@@ -5,6 +5,8 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Any, Callable, Optional, Tuple
 
 from src.search.task_manager import SearchTaskManager, TaskStatus
+from src.search.bulkhead import shutdown_bulkheads, get_all_bulkhead_status
+from src.search.admission import TaskAdmissionController
 
 logger = logging.getLogger(__name__)
 
@@ -16,12 +18,13 @@ class ParallelTaskExecutor:
         初期化
         
         Args:
-            max_workers: 同時に実行するワーカー数
-            max_running_tasks: 同時に実行できるタスクの最大数
+            max_workers: 同時に実行するワーカー数（タスク単位。各プラットフォームの検索はブラウザ用・API用のバルクヘッドで実行）
+            max_running_tasks: 同時に実行できるタスクの最大数（全ワーカー合計）
         """
         self.max_workers = max_workers
         self.max_running_tasks = max_running_tasks
         self.task_manager = SearchTaskManager()
+        self.admission = TaskAdmissionController(self.task_manager, max_running_tasks)
         self.executor = None
         self.running = False
     
@@ -33,6 +36,7 @@ class ParallelTaskExecutor:
             
         self.running = True
         self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.admission.start()
         logger.info(f"Started parallel executor with {self.max_workers} workers")
     
     def stop(self) -> None:
@@ -45,8 +49,24 @@ class ParallelTaskExecutor:
         if self.executor:
             self.executor.shutdown(wait=True)
             self.executor = None
+        self.admission.stop()
+        shutdown_bulkheads(wait=False)
         logger.info("Stopped parallel executor")
     
+    def get_pool_status(self) -> Dict[str, Any]:
+        """
+        タスク実行プールとバルクヘッドの状態を取得する
+        
+        Returns:
+            Dict[str, Any]: 状態情報
+        """
+        return {
+            'running': self.running,
+            'max_workers': self.max_workers,
+            'admission': self.admission.get_status(),
+            'bulkheads': get_all_bulkhead_status()
+        }
+    
     def execute_task(self, task_id: str, executor_func: Callable[[Dict[str, Any], Any, str], Dict[str, Any]]) -> None:
         """
         タスクを実行する
@@ -59,8 +79,8 @@ class ParallelTaskExecutor:
             logger.error("Cannot execute task: parallel executor is not running")
             return
             
-        # タスク情報を取得
-        task = self.task_manager.get_task(task_id)
+        # タスク情報を取得（実行に必要なカラムのみ）
+        task = self.task_manager.get_task(task_id, columns=('id', 'status', 'search_params'))
         if not task:
             logger.error(f"Task {task_id} not found")
             return
@@ -70,8 +90,10 @@ class ParallelTaskExecutor:
             logger.warning(f"Cannot execute task {task_id}: status is {task['status']}")
             return
             
-        # タスクのステータスを更新
-        self.task_manager.update_task_status(task_id, TaskStatus.RUNNING)
+        # タスクのステータスを更新（他のワーカーが先に取得した場合は実行しない）
+        if not self.task_manager.claim_task(task_id):
+            logger.warning(f"Cannot execute task {task_id}: already claimed by another worker")
+            return
         
         try:
             # タスクを実行
@@ -136,16 +158,26 @@ class ParallelTaskExecutor:
             logger.error("Cannot submit task: executor is not initialized")
             return
             
-        # 実行中のタスク数を確認
-        running_count = self.task_manager.count_running_tasks()
-        if running_count >= self.max_running_tasks:
+        # 実行枠を確保（ローカルのリースで判定し、DBには問い合わせない）
+        if not self.admission.try_acquire():
             logger.warning(f"Cannot submit task: maximum number of running tasks ({self.max_running_tasks}) reached")
             return
             
         # タスクを実行キューに追加
-        self.executor.submit(self.execute_task, task_id, executor_func)
+        try:
+            self.executor.submit(self._execute_admitted_task, task_id, executor_func)
+        except Exception:
+            self.admission.release()
+            raise
         logger.info(f"Submitted task {task_id} to execution queue")
     
+    def _execute_admitted_task(self, task_id: str, executor_func: Callable[[Dict[str, Any], Any, str], Dict[str, Any]]) -> None:
+        """タスクを実行し、終了後に実行枠を返却する"""
+        try:
+            self.execute_task(task_id, executor_func)
+        finally:
+            self.admission.release()
+    
     def process_pending_tasks(self, executor_func: Callable[[Dict[str, Any], Any, str], Dict[str, Any]], 
                              batch_size: int = 5) -> int:
         """
@@ -162,9 +194,8 @@ class ParallelTaskExecutor:
             logger.error("Cannot process pending tasks: parallel executor is not running")
             return 0
             
-        # 実行中のタスク数を確認
-        running_count = self.task_manager.count_running_tasks()
-        available_slots = self.max_running_tasks - running_count
+        # 現在のリースで受け入れられるタスク数を確認
+        available_slots = self.admission.available_slots()
         
         if available_slots <= 0:
             logger.info("No available slots for pending tasks")
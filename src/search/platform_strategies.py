@@ -4,19 +4,40 @@
 """
 
 import logging
-from typing import Dict, List, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 from abc import ABC, abstractmethod
 
 from src.jan.jan_lookup import get_product_name_from_jan
 from src.utils.translator import translator
-from src.utils.exchange_rate import get_usd_to_jpy_rate
+from src.utils.exchange_rate import convert_to_jpy_batch
 from src.collectors.yahoo_shopping import YahooShoppingClient
 from src.collectors.mercari_simple import MercariClient
 from src.collectors.ebay import EbayClient
 from src.collectors.yahoo_auction import YahooAuctionClient
+from src.search.relevance import attach_relevance_scores
+from src.search.result_item import SearchResultItem, to_serializable
+from src.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from src.utils.config import get_optional_config
 
 logger = logging.getLogger(__name__)
 
+# 投機的検索（JANコード検索と商品名検索の同時実行）用の共有スレッドプール
+_speculative_executor: Optional[ThreadPoolExecutor] = None
+_speculative_executor_lock = threading.Lock()
+
+
+def _get_speculative_executor() -> ThreadPoolExecutor:
+    """投機的検索用のスレッドプールを取得"""
+    global _speculative_executor
+    if _speculative_executor is None:
+        with _speculative_executor_lock:
+            if _speculative_executor is None:
+                max_workers = int(get_optional_config("SPECULATIVE_SEARCH_MAX_WORKERS", "8"))
+                _speculative_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+    return _speculative_executor
+
 
 class PlatformSearchStrategy(ABC):
     """プラットフォーム検索戦略の基底クラス"""
@@ -39,7 +60,7 @@ class PlatformSearchStrategy(ABC):
         """
         pass
     
-    def _format_result(self, item: Dict[str, Any], search_term: str) -> Dict[str, Any]:
+    def _format_result(self, item: Dict[str, Any], search_term: str) -> SearchResultItem:
         """
         検索結果を統一フォーマットに変換します。
         
@@ -48,35 +69,46 @@ class PlatformSearchStrategy(ABC):
             search_term: 検索に使用したクエリ
             
         Returns:
-            Dict[str, Any]: 統一フォーマットの検索結果
+            SearchResultItem: 統一フォーマットの検索結果
         """
-        return {
-            'platform': self.platform_name,
-            'item_id': item.get('item_id', ''),
-            'item_title': item.get('title', item.get('name', '')),
-            'item_url': item.get('url', ''),
-            'item_image_url': item.get('image_url', ''),
-            'item_condition': item.get('condition', ''),
-            'base_price': item.get('price', 0),
-            'shipping_fee': item.get('shipping_fee', 0),
-            'total_price': item.get('price', 0) + item.get('shipping_fee', 0),
-            'currency': item.get('currency', 'JPY'),
-            'seller': item.get('seller', ''),
-            'search_term': search_term
-        }
+        return SearchResultItem(
+            platform=self.platform_name,
+            item_id=item.get('item_id', ''),
+            item_title=item.get('title', item.get('name', '')),
+            item_url=item.get('url', ''),
+            item_image_url=item.get('image_url', ''),
+            item_condition=item.get('condition', ''),
+            base_price=item.get('price', 0),
+            shipping_fee=item.get('shipping_fee', 0),
+            total_price=item.get('price', 0) + item.get('shipping_fee', 0),
+            currency=item.get('currency', 'JPY'),
+            seller=item.get('seller', ''),
+            search_term=search_term
+        )
 
 
 class YahooShoppingStrategy(PlatformSearchStrategy):
     """Yahoo!ショッピング検索戦略"""
     
-    def __init__(self):
+    def __init__(self, speculative: Optional[bool] = None):
+        """
+        初期化
+        
+        Args:
+            speculative: JANコード検索と商品名検索を同時に実行するかどうか
+                         （Noneの場合は YAHOO_SHOPPING_SPECULATIVE_SEARCH 環境変数に従う）
+        """
         super().__init__('Yahoo!ショッピング')
         self.client = YahooShoppingClient()
+        if speculative is None:
+            speculative = get_optional_config("YAHOO_SHOPPING_SPECULATIVE_SEARCH", "false").lower() in ("1", "true", "yes")
+        self.speculative = speculative
     
     def search(self, query: str, jan_code: str = None, limit: int = 20) -> List[Dict[str, Any]]:
         """
         Yahoo!ショッピングで検索を実行します。
         JANコードがある場合はJANコード検索を優先し、結果がない場合は商品名検索にフォールバック。
+        投機的モードでは両方の検索を同時に実行し、JANコード検索の結果を優先します。
         
         Args:
             query: 検索クエリ（商品名またはJANコード）
@@ -87,35 +119,19 @@ class YahooShoppingStrategy(PlatformSearchStrategy):
             List[Dict[str, Any]]: 検索結果
         """
         try:
-            results = []
-            search_term = query
-            
-            # JANコードが指定されている場合、まずJANコード検索を試行
-            if jan_code and jan_code.isdigit() and len(jan_code) >= 8:
-                logger.info(f"Yahoo!ショッピング: JANコード検索を実行 - {jan_code}")
-                results = self.client.search_by_jan_code(jan_code, limit)
-                search_term = jan_code
-                
-                if results:
-                    logger.info(f"Yahoo!ショッピング: JANコード検索で{len(results)}件取得")
-                else:
+            has_jan_code = bool(jan_code and jan_code.isdigit() and len(jan_code) >= 8)
+            
+            if has_jan_code and self.speculative:
+                results, search_term = self._search_speculative(jan_code, limit)
+            elif has_jan_code:
+                # まずJANコード検索を試行し、結果がない場合は商品名検索にフォールバック
+                results, search_term = self._search_by_jan_code(jan_code, limit)
+                if not results:
                     logger.info("Yahoo!ショッピング: JANコード検索で結果なし、商品名検索にフォールバック")
-            
-            # JANコード検索で結果がない場合、または最初から商品名検索の場合
-            if not results:
-                # JANコードから商品名を取得
-                if jan_code and jan_code.isdigit() and len(jan_code) >= 8:
-                    product_name = get_product_name_from_jan(jan_code)
-                    if product_name:
-                        search_term = product_name
-                        logger.info(f"Yahoo!ショッピング: JANコードから商品名を取得 - {product_name}")
-                    else:
-                        search_term = jan_code
-                else:
-                    search_term = query
-                
-                logger.info(f"Yahoo!ショッピング: 商品名検索を実行 - {search_term}")
-                results = self.client.search_items(search_term, limit)
+                    results, search_term = self._search_by_product_name(jan_code, limit)
+            else:
+                logger.info(f"Yahoo!ショッピング: 商品名検索を実行 - {query}")
+                results, search_term = self.client.search_items(query, limit), query
                 logger.info(f"Yahoo!ショッピング: 商品名検索で{len(results)}件取得")
             
             # 結果を統一フォーマットに変換
@@ -126,27 +142,87 @@ class YahooShoppingStrategy(PlatformSearchStrategy):
                 if not item.get('shipping_info', {}).get('free_shipping', False):
                     shipping_fee = item.get('shipping_info', {}).get('shipping_cost', 0)
                 
-                formatted_item = {
-                    'platform': self.platform_name,
-                    'item_id': item.get('item_id', ''),
-                    'item_title': item.get('title', item.get('name', '')),
-                    'item_url': item.get('url', ''),
-                    'item_image_url': item.get('image_url', ''),
-                    'item_condition': item.get('condition', 'new'),
-                    'base_price': item.get('price', 0),
-                    'shipping_fee': shipping_fee,
-                    'total_price': item.get('price', 0) + shipping_fee,
-                    'currency': 'JPY',
-                    'seller': item.get('store_name', ''),
-                    'search_term': search_term
-                }
+                formatted_item = SearchResultItem(
+                    platform=self.platform_name,
+                    item_id=item.get('item_id', ''),
+                    item_title=item.get('title', item.get('name', '')),
+                    item_url=item.get('url', ''),
+                    item_image_url=item.get('image_url', ''),
+                    item_condition=item.get('condition', 'new'),
+                    base_price=item.get('price', 0),
+                    shipping_fee=shipping_fee,
+                    total_price=item.get('price', 0) + shipping_fee,
+                    currency='JPY',
+                    seller=item.get('store_name', ''),
+                    search_term=search_term
+                )
                 formatted_results.append(formatted_item)
             
             return formatted_results
             
+        except CircuitOpenError:
+            # 遮断によるスキップは「結果なし」と区別できるよう呼び出し元へ伝える
+            raise
         except Exception as e:
             logger.error(f"Yahoo!ショッピング検索エラー: {e}")
             return []
+    
+    def _search_by_jan_code(self, jan_code: str, limit: int) -> Tuple[List[Dict[str, Any]], str]:
+        """JANコード検索を実行し、結果と検索語を返す"""
+        logger.info(f"Yahoo!ショッピング: JANコード検索を実行 - {jan_code}")
+        results = self.client.search_by_jan_code(jan_code, limit)
+        if results:
+            logger.info(f"Yahoo!ショッピング: JANコード検索で{len(results)}件取得")
+        return results, jan_code
+    
+    def _search_by_product_name(self, jan_code: str, limit: int) -> Tuple[List[Dict[str, Any]], str]:
+        """JANコードから商品名を取得して商品名検索を実行し、結果と検索語を返す"""
+        product_name = get_product_name_from_jan(jan_code)
+        if product_name:
+            search_term = product_name
+            logger.info(f"Yahoo!ショッピング: JANコードから商品名を取得 - {product_name}")
+        else:
+            search_term = jan_code
+        
+        logger.info(f"Yahoo!ショッピング: 商品名検索を実行 - {search_term}")
+        results = self.client.search_items(search_term, limit)
+        logger.info(f"Yahoo!ショッピング: 商品名検索で{len(results)}件取得")
+        return results, search_term
+    
+    def _search_speculative(self, jan_code: str, limit: int) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        JANコード検索と商品名検索を同時に実行します。
+        JANコード検索で結果があればそれを採用し、商品名検索は取り消す（実行済みなら破棄する）。
+        
+        Args:
+            jan_code: JANコード
+            limit: 取得する結果の最大数
+            
+        Returns:
+            Tuple[List[Dict[str, Any]], str]: 検索結果と検索語
+        """
+        executor = _get_speculative_executor()
+        name_future = executor.submit(self._search_by_product_name, jan_code, limit)
+        
+        try:
+            results, search_term = self._search_by_jan_code(jan_code, limit)
+        except CircuitOpenError:
+            # 遮断中は商品名検索も同じブレーカーで遮断されるため、待たずにスキップを伝える
+            name_future.cancel()
+            raise
+        except Exception as e:
+            logger.warning(f"Yahoo!ショッピング: JANコード検索エラー、商品名検索の結果を使用します: {e}")
+            results, search_term = [], jan_code
+        
+        if results:
+            if name_future.cancel():
+                logger.info("Yahoo!ショッピング: JANコード検索で結果があるため商品名検索を取り消しました")
+            else:
+                logger.info("Yahoo!ショッピング: JANコード検索で結果があるため商品名検索の結果を破棄します")
+            return results, search_term
+        
+        logger.info("Yahoo!ショッピング: JANコード検索で結果なし、同時実行した商品名検索の結果を使用します")
+        return name_future.result()
 
 
 class MercariStrategy(PlatformSearchStrategy):
@@ -189,24 +265,27 @@ class MercariStrategy(PlatformSearchStrategy):
             # 結果を統一フォーマットに変換
             formatted_results = []
             for item in results:
-                formatted_item = {
-                    'platform': self.platform_name,
-                    'item_id': item.get('item_id', ''),
-                    'item_title': item.get('title', ''),
-                    'item_url': item.get('url', ''),
-                    'item_image_url': item.get('image_url', ''),
-                    'item_condition': item.get('condition', ''),
-                    'base_price': item.get('price', 0),
-                    'shipping_fee': item.get('shipping_fee', 0),
-                    'total_price': item.get('price', 0) + item.get('shipping_fee', 0),
-                    'currency': 'JPY',
-                    'seller': item.get('seller', ''),
-                    'search_term': search_term
-                }
+                formatted_item = SearchResultItem(
+                    platform=self.platform_name,
+                    item_id=item.get('item_id', ''),
+                    item_title=item.get('title', ''),
+                    item_url=item.get('url', ''),
+                    item_image_url=item.get('image_url', ''),
+                    item_condition=item.get('condition', ''),
+                    base_price=item.get('price', 0),
+                    shipping_fee=item.get('shipping_fee', 0),
+                    total_price=item.get('price', 0) + item.get('shipping_fee', 0),
+                    currency='JPY',
+                    seller=item.get('seller', ''),
+                    search_term=search_term
+                )
                 formatted_results.append(formatted_item)
             
             return formatted_results
             
+        except CircuitOpenError:
+            # 遮断によるスキップは「結果なし」と区別できるよう呼び出し元へ伝える
+            raise
         except Exception as e:
             logger.error(f"メルカリ検索エラー: {e}")
             return []
@@ -288,6 +367,8 @@ class EbayStrategy(PlatformSearchStrategy):
                     else:
                         logger.info(f"eBay: クエリ{i}で結果なし")
                         
+                except CircuitOpenError:
+                    raise
                 except Exception as query_error:
                     logger.warning(f"eBay: クエリ{i}の検索でエラー - {query_error}")
                     continue
@@ -301,6 +382,9 @@ class EbayStrategy(PlatformSearchStrategy):
             logger.info(f"eBay: 最終結果{len(final_results)}件を返却")
             return final_results
             
+        except CircuitOpenError:
+            # 遮断によるスキップは「結果なし」と区別できるよう呼び出し元へ伝える
+            raise
         except Exception as e:
             logger.error(f"eBay検索エラー: {e}")
             return []
@@ -318,37 +402,33 @@ class EbayStrategy(PlatformSearchStrategy):
         """
         formatted_results = []
         
-        for item in results:
+        # 価格をまとめてJPYに変換（レート表はプロセス内キャッシュから1回だけ参照）
+        converted_prices = convert_to_jpy_batch(
+            [item.get('price', 0) or 0 for item in results],
+            [item.get('currency') or 'USD' for item in results]
+        )
+        
+        for item, converted_price in zip(results, converted_prices):
             try:
-                # 価格をJPYに変換
-                price = item.get('price', 0)
-                currency = item.get('currency', 'USD')
-                if currency == 'USD':
-                    # ExchangeRate-APIからリアルタイムレートを取得
-                    usd_to_jpy_rate = get_usd_to_jpy_rate()
-                    price_jpy = int(price * usd_to_jpy_rate)
-                    logger.debug(f"eBay: USD価格 ${price} を JPY {price_jpy} に変換（レート: {usd_to_jpy_rate}）")
-                else:
-                    price_jpy = int(price)
-                
-                # 商品タイトルの関連性をチェック
-                relevance_score = self._calculate_relevance_score(item.get('title', ''), search_query)
+                if converted_price is None:
+                    logger.debug(f"eBay: 通貨を換算できないため除外 - {item.get('currency')}: {item.get('title', '')}")
+                    continue
+                price_jpy = int(converted_price)
                 
-                formatted_item = {
-                    'platform': self.platform_name,
-                    'item_id': item.get('item_id', ''),
-                    'item_title': item.get('title', ''),
-                    'item_url': item.get('url', ''),
-                    'item_image_url': item.get('image_url', ''),
-                    'item_condition': item.get('condition', ''),
-                    'base_price': price_jpy,
-                    'shipping_fee': 0,  # eBayは送料込み価格として扱う
-                    'total_price': price_jpy,
-                    'currency': 'JPY',
-                    'seller': item.get('seller', ''),
-                    'search_term': search_query,
-                    'relevance_score': relevance_score
-                }
+                formatted_item = SearchResultItem(
+                    platform=self.platform_name,
+                    item_id=item.get('item_id', ''),
+                    item_title=item.get('title', ''),
+                    item_url=item.get('url', ''),
+                    item_image_url=item.get('image_url', ''),
+                    item_condition=item.get('condition', ''),
+                    base_price=price_jpy,
+                    shipping_fee=0,  # eBayは送料込み価格として扱う
+                    total_price=price_jpy,
+                    currency='JPY',
+                    seller=item.get('seller', ''),
+                    search_term=search_query
+                )
                 
                 # 価格が妥当な範囲内かチェック
                 if self._is_price_reasonable(price_jpy):
@@ -360,38 +440,8 @@ class EbayStrategy(PlatformSearchStrategy):
                 logger.warning(f"eBay: 結果フォーマット中にエラー - {format_error}")
                 continue
         
-        return formatted_results
-    
-    def _calculate_relevance_score(self, title: str, search_query: str) -> float:
-        """
-        商品タイトルと検索クエリの関連性スコアを計算します。
-        
-        Args:
-            title: 商品タイトル
-            search_query: 検索クエリ
-            
-        Returns:
-            float: 関連性スコア（0.0-1.0）
-        """
-        if not title or not search_query:
-            return 0.0
-        
-        title_lower = title.lower()
-        query_lower = search_query.lower()
-        
-        # 検索クエリの単語を分割
-        query_words = query_lower.split()
-        
-        # タイトルに含まれる検索語の割合を計算
-        matched_words = 0
-        for word in query_words:
-            if len(word) > 2 and word in title_lower:  # 2文字以下の単語は除外
-                matched_words += 1
-        
-        if len(query_words) == 0:
-            return 0.0
-        
-        return matched_words / len(query_words)
+        # 商品タイトルの関連性をまとめて計算
+        return attach_relevance_scores(formatted_results, search_query)
     
     def _is_price_reasonable(self, price_jpy: int) -> bool:
         """
@@ -449,20 +499,20 @@ class YahooAuctionStrategy(PlatformSearchStrategy):
             # 結果を統一フォーマットに変換
             formatted_results = []
             for item in results:
-                formatted_item = {
-                    'platform': self.platform_name,
-                    'item_id': item.get('item_id', ''),
-                    'item_title': item.get('title', ''),
-                    'item_url': item.get('url', ''),
-                    'item_image_url': item.get('image_url', ''),
-                    'item_condition': item.get('condition', ''),
-                    'base_price': item.get('price', 0),
-                    'shipping_fee': item.get('shipping_fee', 0),
-                    'total_price': item.get('price', 0) + item.get('shipping_fee', 0),
-                    'currency': 'JPY',
-                    'seller': item.get('seller', ''),
-                    'search_term': search_term
-                }
+                formatted_item = SearchResultItem(
+                    platform=self.platform_name,
+                    item_id=item.get('item_id', ''),
+                    item_title=item.get('title', ''),
+                    item_url=item.get('url', ''),
+                    item_image_url=item.get('image_url', ''),
+                    item_condition=item.get('condition', ''),
+                    base_price=item.get('price', 0),
+                    shipping_fee=item.get('shipping_fee', 0),
+                    total_price=item.get('price', 0) + item.get('shipping_fee', 0),
+                    currency='JPY',
+                    seller=item.get('seller', ''),
+                    search_term=search_term
+                )
                 formatted_results.append(formatted_item)
             
             return formatted_results
@@ -524,20 +574,20 @@ class DiscogsStrategy(PlatformSearchStrategy):
             # 結果を統一フォーマットに変換
             formatted_results = []
             for item in results:
-                formatted_item = {
-                    'platform': self.platform_name,
-                    'item_id': item.get('item_id', ''),
-                    'item_title': item.get('title', ''),
-                    'item_url': item.get('url', ''),
-                    'item_image_url': item.get('image_url', ''),
-                    'item_condition': item.get('condition', ''),
-                    'base_price': item.get('price', 0),
-                    'shipping_fee': item.get('shipping_fee', 0),
-                    'total_price': item.get('price', 0) + item.get('shipping_fee', 0),
-                    'currency': item.get('currency', 'USD'),
-                    'seller': item.get('seller', ''),
-                    'search_term': english_query
-                }
+                formatted_item = SearchResultItem(
+                    platform=self.platform_name,
+                    item_id=item.get('item_id', ''),
+                    item_title=item.get('title', ''),
+                    item_url=item.get('url', ''),
+                    item_image_url=item.get('image_url', ''),
+                    item_condition=item.get('condition', ''),
+                    base_price=item.get('price', 0),
+                    shipping_fee=item.get('shipping_fee', 0),
+                    total_price=item.get('price', 0) + item.get('shipping_fee', 0),
+                    currency=item.get('currency', 'USD'),
+                    seller=item.get('seller', ''),
+                    search_term=english_query
+                )
                 formatted_results.append(formatted_item)
             
             return formatted_results
@@ -578,7 +628,13 @@ class PlatformSearchManager:
             return []
         
         strategy = self.strategies[platform]
-        return strategy.search(query, jan_code, limit)
+        results = strategy.search(query, jan_code, limit)
+        
+        # 全プラットフォーム共通で関連性スコアを付与（eBayは採点済み）
+        unscored = [item for item in results if 'relevance_score' not in item]
+        attach_relevance_scores(unscored)
+        
+        return to_serializable(results)
     
     def search_all_platforms(self, query: str, jan_code: str = None, platforms: List[str] = None, limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
         """
@@ -599,9 +655,63 @@ class PlatformSearchManager:
         results = {}
         for platform in platforms:
             if platform in self.strategies:
-                results[platform] = self.search_platform(platform, query, jan_code, limit)
+                try:
+                    results[platform] = self.search_platform(platform, query, jan_code, limit)
+                except CircuitOpenError as e:
+                    logger.warning(f"{platform}: サーキットブレーカー開放中のため検索をスキップしました（再試行まで{e.retry_in:.1f}秒）")
+                    results[platform] = []
             else:
                 logger.warning(f"未対応のプラットフォームをスキップ: {platform}")
                 results[platform] = []
         
         return results
+
+
+def circuit_open_result(error: CircuitOpenError) -> Dict[str, Any]:
+    """
+    サーキットブレーカーで検索がスキップされたことを表す結果を返します。
+    「結果なし」と区別できるよう、degraded フラグと再試行までの秒数を含めます。
+    
+    Args:
+        error: 検索時に送出された CircuitOpenError
+        
+    Returns:
+        Dict[str, Any]: 縮退結果（error='circuit_open', degraded=True, retry_in, items=[]）
+    """
+    return {'error': 'circuit_open', 'degraded': True, 'retry_in': round(error.retry_in, 1), 'items': []}
+
+
+# ワーカープロセス内で使い回す検索管理インスタンス
+_worker_platform_manager: Optional[PlatformSearchManager] = None
+
+
+def run_platform_search(platform: str, query: str, jan_code: str = None, limit: int = 20) -> Dict[str, Any]:
+    """
+    1つのプラットフォームの検索を実行します（ブラウザ用プロセスプールのワーカーから呼び出す）。
+    検索管理インスタンスはワーカープロセスごとに1つだけ作成して使い回します。
+    
+    Args:
+        platform: プラットフォーム名
+        query: 検索クエリ
+        jan_code: JANコード（指定された場合）
+        limit: 取得する結果の最大数
+        
+    Returns:
+        Dict[str, Any]: 検索結果（items, count）と、ワーカー内のサーキットブレーカーの状態（breaker）
+    """
+    global _worker_platform_manager
+    if _worker_platform_manager is None:
+        _worker_platform_manager = PlatformSearchManager()
+    
+    try:
+        items = _worker_platform_manager.search_platform(platform, query, jan_code, limit)
+        result = {'items': items, 'count': len(items)}
+    except CircuitOpenError as e:
+        logger.warning(f"{platform}: サーキットブレーカー開放中のため検索をスキップしました（再試行まで{e.retry_in:.1f}秒）")
+        result = circuit_open_result(e)
+    except Exception as e:
+        logger.error(f"Error in run_platform_search ({platform}): {e}")
+        result = {'error': str(e), 'items': []}
+    
+    result['breaker'] = get_circuit_breaker(platform).get_status()
+    return result
@@ -0,0 +1,204 @@
+"""
+関連性スコアリングエンジン
+検索クエリと商品タイトルの関連性を全プラットフォーム共通の方法で計算します。
+クエリは一度だけトークン化し（日本語はn-gramに分割）、タイトル群はNumPyでまとめて採点します。
+"""
+
+import re
+import logging
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ひらがな、カタカナ、漢字の連続部分
+_JAPANESE_RUN_PATTERN = re.compile(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF]+')
+# 英数字の連続部分
+_ALNUM_RUN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    採点用にテキストを正規化します（全角/半角の統一と小文字化）。
+    
+    Args:
+        text: 対象テキスト
+    
+    Returns:
+        str: 正規化されたテキスト
+    """
+    if not text:
+        return ""
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def tokenize_query(query: str, ngram_size: int = 2) -> Tuple[List[str], List[float]]:
+    """
+    検索クエリをトークンと重みに分解します。
+    英数字は単語単位、日本語は文字n-gram単位で分割し、
+    1つの日本語語句から得たn-gramの重みの合計が1になるようにします。
+    
+    Args:
+        query: 検索クエリ
+        ngram_size: 日本語n-gramの文字数
+    
+    Returns:
+        Tuple[List[str], List[float]]: トークンのリストと対応する重みのリスト
+    """
+    weights: Dict[str, float] = {}
+    normalized = normalize_text(query)
+    
+    for word in normalized.split():
+        for run in _ALNUM_RUN_PATTERN.findall(word):
+            # 2文字以下の英単語は除外（型番のような数字入りは残す）
+            if len(run) <= 2 and not any(c.isdigit() for c in run):
+                continue
+            weights[run] = weights.get(run, 0.0) + 1.0
+        
+        for run in _JAPANESE_RUN_PATTERN.findall(word):
+            if len(run) <= ngram_size:
+                weights[run] = weights.get(run, 0.0) + 1.0
+                continue
+            grams = [run[i:i + ngram_size] for i in range(len(run) - ngram_size + 1)]
+            for gram in grams:
+                weights[gram] = weights.get(gram, 0.0) + 1.0 / len(grams)
+    
+    return list(weights.keys()), list(weights.values())
+
+
+def _is_code_query(query: str) -> bool:
+    """JANコードなどの数字のみのクエリかどうかを判定"""
+    stripped = (query or "").strip()
+    return stripped.isdigit() and len(stripped) >= 8
+
+
+class RelevanceScorer:
+    """1つの検索クエリに対する関連性スコア計算クラス"""
+    
+    def __init__(self, query: str, ngram_size: int = 2):
+        """
+        初期化（クエリのトークン化はここで一度だけ行う）
+        
+        Args:
+            query: 検索クエリ
+            ngram_size: 日本語n-gramの文字数
+        """
+        self.query = query or ""
+        self.is_code_query = _is_code_query(self.query)
+        self.tokens, weights = tokenize_query(self.query, ngram_size)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.total_weight = float(self.weights.sum())
+    
+    def score(self, titles: List[str]) -> np.ndarray:
+        """
+        タイトル群の関連性スコアをまとめて計算します。
+        
+        Args:
+            titles: 商品タイトルのリスト
+        
+        Returns:
+            np.ndarray: 各タイトルの関連性スコア（0.0-1.0）
+        """
+        count = len(titles)
+        if count == 0:
+            return np.zeros(0, dtype=np.float64)
+        
+        # JANコード検索はAPI側で完全一致しているため最大スコアとする
+        if self.is_code_query:
+            return np.ones(count, dtype=np.float64)
+        
+        if not self.tokens or self.total_weight <= 0:
+            return np.zeros(count, dtype=np.float64)
+        
+        normalized_titles = np.array([normalize_text(title) for title in titles], dtype=np.str_)
+        
+        # (タイトル数, トークン数) の一致行列を作成し、重み付き和で採点
+        matches = np.empty((count, len(self.tokens)), dtype=np.float64)
+        for column, token in enumerate(self.tokens):
+            matches[:, column] = np.char.find(normalized_titles, token) >= 0
+        
+        return (matches @ self.weights) / self.total_weight
+
+
+@lru_cache(maxsize=256)
+def get_relevance_scorer(query: str) -> RelevanceScorer:
+    """
+    クエリに対応するRelevanceScorerを取得します（トークン化結果をキャッシュ）。
+    
+    Args:
+        query: 検索クエリ
+    
+    Returns:
+        RelevanceScorer: 関連性スコア計算インスタンス
+    """
+    return RelevanceScorer(query)
+
+
+def score_titles(query: str, titles: List[str]) -> List[float]:
+    """
+    クエリに対するタイトル群の関連性スコアを計算する便利関数
+    
+    Args:
+        query: 検索クエリ
+        titles: 商品タイトルのリスト
+    
+    Returns:
+        List[float]: 各タイトルの関連性スコア（0.0-1.0）
+    """
+    return get_relevance_scorer(query).score(titles).tolist()
+
+
+def attach_relevance_scores(items: List[Dict[str, Any]], query: str = None,
+                            title_key: str = 'item_title',
+                            query_key: str = 'search_term') -> List[Dict[str, Any]]:
+    """
+    各アイテムに relevance_score を付与します。
+    クエリ未指定の場合は各アイテムの search_term ごとにまとめて採点します。
+    
+    Args:
+        items: 統一フォーマットのアイテムリスト
+        query: 全アイテム共通の検索クエリ（省略可）
+        title_key: タイトルのキー名
+        query_key: アイテムごとの検索クエリのキー名
+    
+    Returns:
+        List[Dict[str, Any]]: relevance_score が付与されたアイテムリスト（同じリスト）
+    """
+    if not items:
+        return items
+    
+    # 検索クエリごとにグループ化して一括採点
+    groups: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        item_query = query if query is not None else (item.get(query_key) or '')
+        groups.setdefault(item_query, []).append(index)
+    
+    for item_query, indices in groups.items():
+        titles = [items[i].get(title_key) or '' for i in indices]
+        scores = get_relevance_scorer(item_query).score(titles)
+        for i, score in zip(indices, scores):
+            items[i]['relevance_score'] = round(float(score), 4)
+    
+    return items
+
+
+def filter_by_relevance(items: List[Dict[str, Any]], min_score: float) -> List[Dict[str, Any]]:
+    """
+    関連性スコアが閾値未満のアイテムを除外します。
+    
+    Args:
+        items: relevance_score 付きのアイテムリスト
+        min_score: 関連性スコアの下限（0以下の場合は除外しない）
+    
+    Returns:
+        List[Dict[str, Any]]: フィルタリング後のアイテムリスト
+    """
+    if not min_score or min_score <= 0:
+        return items
+    
+    filtered = [item for item in items if item.get('relevance_score', 0.0) >= min_score]
+    logger.info(f"関連性フィルタ: {len(items)}件 -> {len(filtered)}件 (閾値: {min_score})")
+    return filtered
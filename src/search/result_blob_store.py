@@ -0,0 +1,150 @@
+"""
+検索タスク結果の圧縮保存
+execute_search の出力全体（各プラットフォームの生の結果を含む）を圧縮して search_task_results テーブルに保存し、
+search_tasks.result には一覧表示に必要な要約だけを残します。
+圧縮には zstandard を使用し、インストールされていない場合は zlib を使用します。
+"""
+
+import json
+import zlib
+import base64
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from src.utils.config import get_optional_config
+from src.search.result_item import json_default
+
+try:
+    import zstandard
+except ImportError:  # zlibで圧縮する
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+RESULT_BLOB_TABLE = 'search_task_results'
+
+
+def _compress(raw: bytes) -> Tuple[str, bytes]:
+    """バイト列を圧縮する（zstandardがなければzlib）"""
+    if zstandard is not None:
+        level = int(get_optional_config("RESULT_BLOB_ZSTD_LEVEL", "9"))
+        return 'zstd', zstandard.ZstdCompressor(level=level).compress(raw)
+    return 'zlib', zlib.compress(raw, 6)
+
+
+def decompress_payload(codec: str, data: bytes) -> Dict[str, Any]:
+    """
+    圧縮データを結果に戻します。
+    
+    Args:
+        codec: 圧縮方式
+        data: 圧縮データ
+    
+    Returns:
+        Dict[str, Any]: 結果
+    
+    Raises:
+        ValueError: 未対応の圧縮方式の場合
+    """
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd圧縮された結果を読むには zstandard が必要です")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == 'zlib':
+        raw = zlib.decompress(data)
+    else:
+        raise ValueError(f"未対応の圧縮方式です: {codec}")
+    return json.loads(raw.decode('utf-8'))
+
+
+def summarize_result(result: Dict[str, Any], raw_size: int) -> Dict[str, Any]:
+    """
+    タスク行に残す結果の要約を作成します（統合結果は保持し、プラットフォーム別の生の結果は件数のみ）。
+    
+    Args:
+        result: execute_search の出力
+        raw_size: 結果全体のバイト数
+    
+    Returns:
+        Dict[str, Any]: 要約
+    """
+    summary = {key: value for key, value in result.items() if key != 'platform_results'}
+    
+    platform_summary = {}
+    for platform, platform_result in (result.get('platform_results') or {}).items():
+        if not isinstance(platform_result, dict):
+            continue
+        entry = {'count': platform_result.get('count', len(platform_result.get('items') or []))}
+        for key in ('error', 'degraded'):
+            if key in platform_result:
+                entry[key] = platform_result[key]
+        platform_summary[platform] = entry
+    if platform_summary:
+        summary['platform_results'] = platform_summary
+    
+    summary['full_result_stored'] = True
+    summary['full_result_size'] = raw_size
+    return summary
+
+
+class TaskResultBlobStore:
+    """search_task_results テーブルへの圧縮保存"""
+    
+    def __init__(self, store):
+        """
+        初期化
+        
+        Args:
+            store: タスクの保存先（TaskStore）
+        """
+        self.store = store
+        self.threshold_bytes = int(get_optional_config("RESULT_BLOB_THRESHOLD_BYTES", "65536"))
+    
+    def save(self, task_id: str, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        結果が大きい場合は圧縮して保存し、タスク行に残す要約を返します。
+        
+        Args:
+            task_id: タスクID
+            result: execute_search の出力
+        
+        Returns:
+            Optional[Dict[str, Any]]: 要約（閾値未満で圧縮保存しなかった場合はNone）
+        """
+        raw = json.dumps(result, ensure_ascii=False, default=json_default).encode('utf-8')
+        raw_size = len(raw)
+        if raw_size < self.threshold_bytes:
+            # 以前の大きな結果が残っていると、読み込み時にタスク行の新しい結果より優先されてしまう
+            self.store.delete_result_blob(task_id)
+            return None
+        
+        codec, data = _compress(raw)
+        
+        row = {
+            'task_id': task_id,
+            'codec': codec,
+            'payload': base64.b64encode(data).decode('ascii'),
+            'raw_size': raw_size,
+            'stored_size': len(data),
+            'created_at': datetime.now().isoformat()
+        }
+        self.store.save_result_blob(row)
+        logger.info(f"Stored result of task {task_id} compressed with {codec}: {raw_size} -> {len(data)} bytes")
+        return summarize_result(result, raw_size)
+    
+    def load(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        圧縮保存された結果を読み込みます。
+        
+        Args:
+            task_id: タスクID
+        
+        Returns:
+            Optional[Dict[str, Any]]: 結果（保存されていない場合はNone）
+        """
+        row = self.store.load_result_blob(task_id)
+        if not row:
+            return None
+        
+        return decompress_payload(row['codec'], base64.b64decode(row['payload']))
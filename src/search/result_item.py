@@ -0,0 +1,223 @@
+"""
+統一検索結果アイテムモデル
+各プラットフォームの検索結果を __slots__ ベースの軽量オブジェクトで保持します。
+旧来の辞書形式（title/price/url などの互換キーを含む）にも読み書きできるビューを提供します。
+SearchResultItem は dict ではないため、検索モジュールの外へ返す結果は to_serializable で通常の辞書に変換します。
+"""
+
+from collections.abc import MutableMapping
+from typing import Dict, Any, Iterator, Optional
+
+
+# 正規フィールド（統一フォーマットのキー）
+_FIELDS = (
+    'platform',
+    'item_id',
+    'item_title',
+    'item_url',
+    'item_image_url',
+    'item_condition',
+    'base_price',
+    'shipping_fee',
+    'total_price',
+    'currency',
+    'seller',
+    'search_term',
+    'relevance_score',
+)
+
+# 互換キー -> 正規フィールド
+LEGACY_KEY_ALIASES = {
+    'title': 'item_title',
+    'price': 'base_price',
+    'url': 'item_url',
+    'image_url': 'item_image_url',
+    'condition': 'item_condition',
+}
+
+_FIELD_SET = frozenset(_FIELDS)
+
+
+class SearchResultItem(MutableMapping):
+    """統一フォーマットの検索結果アイテム（辞書互換）"""
+    
+    __slots__ = _FIELDS + ('extra',)
+    
+    def __init__(self, platform: str = '', item_id: str = '', item_title: str = '',
+                 item_url: str = '', item_image_url: str = '', item_condition: str = '',
+                 base_price: Any = 0, shipping_fee: Any = 0, total_price: Any = None,
+                 currency: str = 'JPY', seller: str = '', search_term: str = '',
+                 relevance_score: Optional[float] = None,
+                 extra: Optional[Dict[str, Any]] = None):
+        """
+        初期化
+        
+        Args:
+            platform: プラットフォーム名
+            item_id: 商品ID
+            item_title: 商品タイトル
+            item_url: 商品URL
+            item_image_url: 商品画像URL
+            item_condition: 商品の状態
+            base_price: 本体価格
+            shipping_fee: 送料
+            total_price: 総額（省略時は本体価格+送料）
+            currency: 通貨コード
+            seller: 出品者名
+            search_term: 検索に使用したクエリ
+            relevance_score: 関連性スコア（未採点の場合はNone）
+            extra: 上記以外の追加フィールド（必要な場合のみ作成）
+        """
+        self.platform = platform
+        self.item_id = item_id
+        self.item_title = item_title
+        self.item_url = item_url
+        self.item_image_url = item_image_url
+        self.item_condition = item_condition
+        self.base_price = base_price
+        self.shipping_fee = shipping_fee
+        self.total_price = total_price if total_price is not None else (base_price or 0) + (shipping_fee or 0)
+        self.currency = currency
+        self.seller = seller
+        self.search_term = search_term
+        self.relevance_score = relevance_score
+        self.extra = extra or None
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SearchResultItem':
+        """
+        統一フォーマット（または互換キーを含む）の辞書から生成します。
+        
+        Args:
+            data: 検索結果の辞書
+        
+        Returns:
+            SearchResultItem: 生成されたアイテム
+        """
+        if isinstance(data, cls):
+            return data
+        
+        item = cls()
+        item.total_price = None
+        for key, value in data.items():
+            # 正規フィールドが存在する場合は互換キーを無視
+            alias = LEGACY_KEY_ALIASES.get(key)
+            if alias is not None and alias in data:
+                continue
+            item[key] = value
+        
+        if item.total_price is None:
+            item.total_price = (item.base_price or 0) + (item.shipping_fee or 0)
+        return item
+    
+    def _resolve(self, key: str) -> Optional[str]:
+        """キーを正規フィールド名に解決（該当しない場合はNone）"""
+        if key in _FIELD_SET:
+            return key
+        return LEGACY_KEY_ALIASES.get(key)
+    
+    def __getitem__(self, key: str) -> Any:
+        field = self._resolve(key)
+        if field is not None:
+            value = getattr(self, field)
+            if field == 'relevance_score' and value is None:
+                raise KeyError(key)
+            return value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key: str, value: Any) -> None:
+        field = self._resolve(key)
+        if field is not None:
+            setattr(self, field, value)
+            return
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+    
+    def __delitem__(self, key: str) -> None:
+        field = self._resolve(key)
+        if field == 'relevance_score' and self.relevance_score is not None:
+            self.relevance_score = None
+            return
+        if field is not None:
+            raise TypeError(f"フィールド '{key}' は削除できません")
+        if not self.extra or key not in self.extra:
+            raise KeyError(key)
+        del self.extra[key]
+    
+    def __iter__(self) -> Iterator[str]:
+        for field in _FIELDS:
+            if field == 'relevance_score' and self.relevance_score is None:
+                continue
+            yield field
+        if self.extra:
+            yield from self.extra
+    
+    def __len__(self) -> int:
+        count = len(_FIELDS) - (1 if self.relevance_score is None else 0)
+        return count + (len(self.extra) if self.extra else 0)
+    
+    def __repr__(self) -> str:
+        return f"SearchResultItem(platform={self.platform!r}, item_id={self.item_id!r}, total_price={self.total_price!r})"
+    
+    def copy(self) -> 'SearchResultItem':
+        """アイテムの浅いコピーを返します。"""
+        item = SearchResultItem.__new__(SearchResultItem)
+        for field in self.__slots__:
+            setattr(item, field, getattr(self, field))
+        if self.extra:
+            item.extra = dict(self.extra)
+        return item
+    
+    def to_dict(self, legacy: bool = True) -> Dict[str, Any]:
+        """
+        辞書形式に変換します（JSON保存・API応答用）。
+        
+        Args:
+            legacy: 互換キー（title, price, url など）を含めるかどうか
+        
+        Returns:
+            Dict[str, Any]: アイテムの辞書
+        """
+        data = dict(self.items())
+        if legacy:
+            for alias, field in LEGACY_KEY_ALIASES.items():
+                data.setdefault(alias, getattr(self, field))
+        return data
+
+
+def to_serializable(value: Any) -> Any:
+    """
+    値に含まれる SearchResultItem を通常の辞書（互換キー付き）に置き換えます。
+    検索結果を呼び出し元へ返す境界で使用し、json.dumps などがそのまま扱えるようにします。
+    
+    Args:
+        value: 変換する値（辞書・リスト・タプルは再帰的に変換）
+    
+    Returns:
+        Any: SearchResultItem を含まない値
+    """
+    if isinstance(value, SearchResultItem):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: to_serializable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_serializable(item) for item in value]
+    return value
+
+
+def json_default(obj: Any) -> Any:
+    """
+    json.dumps の default 引数用の変換関数
+    
+    Args:
+        obj: JSONに変換できなかったオブジェクト
+    
+    Returns:
+        Any: JSONに変換可能なオブジェクト
+    """
+    if isinstance(obj, SearchResultItem):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -1,13 +1,23 @@
 import logging
 import time
 from typing import Dict, List, Any, Optional, Union
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeoutError
 
-from src.search.platform_strategies import PlatformSearchManager
+from src.search.platform_strategies import PlatformSearchManager, run_platform_search, circuit_open_result
+from src.search.bulkhead import get_platform_bulkhead, BulkheadFullError
+from src.search.relevance import filter_by_relevance
+from src.search.result_item import SearchResultItem, to_serializable
+from src.search.cheapest_offers import CheapestOfferIndex
+from src.search.task_store import get_task_store
 from src.jan.jan_lookup import get_product_name_from_jan
+from src.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from src.utils.config import get_optional_config
 
 logger = logging.getLogger(__name__)
 
+# 既定の検索対象プラットフォーム（JANコード検索に特化）
+DEFAULT_PLATFORMS = ['ebay', 'mercari', 'yahoo_shopping']
+
 class SearchExecutor:
     """検索を実行し、結果を統合するクラス（プラットフォーム戦略対応版）"""
     
@@ -16,7 +26,7 @@ class SearchExecutor:
         初期化
         
         Args:
-            max_workers: 同時に実行するワーカー数
+            max_workers: 同時に実行するワーカー数（互換性のため保持。プラットフォーム検索は共有バルクヘッドで実行）
             task_manager: タスクマネージャー（進捗ログ用）
             task_id: タスクID（進捗ログ用）
         """
@@ -24,6 +34,7 @@ class SearchExecutor:
         self.task_manager = task_manager
         self.task_id = task_id
         self.platform_manager = PlatformSearchManager()
+        self.platform_timeout = float(get_optional_config("SEARCH_PLATFORM_TIMEOUT", "180"))
     
     def execute_search(self, search_params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -34,7 +45,7 @@ class SearchExecutor:
             search_params: 検索パラメータ
                 
         Returns:
-            Dict[str, Any]: 検索結果
+            Dict[str, Any]: 検索結果（アイテムは互換キー付きの通常の辞書）
         """
         logger.info(f"Executing search with params: {search_params}")
         
@@ -42,7 +53,7 @@ class SearchExecutor:
         self._log_progress("search_started", "started", "検索を開始しました")
         
         # 検索パラメータを取得（JANコード検索に特化：eBay、メルカリ、Yahoo!ショッピングのみ）
-        platforms = search_params.get('platforms', ['ebay', 'mercari', 'yahoo_shopping'])
+        platforms = search_params.get('platforms', list(DEFAULT_PLATFORMS))
         
         # Discogsを明示的に除外（JANコード検索に不適切なため）
         if 'discogs' in platforms:
@@ -61,30 +72,35 @@ class SearchExecutor:
         # 進捗ログ: プラットフォーム検索開始
         self._log_progress("platform_search_started", "started", "プラットフォーム別検索を開始しました（各20件ずつ取得）")
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 各プラットフォームの検索タスクを作成
-            future_to_platform = {}
-                
-            if 'ebay' in platforms:
-                self._log_progress("ebay_search", "started", platform="ebay")
-                future = executor.submit(self._search_ebay, search_params)
-                future_to_platform[future] = 'ebay'
-                
-            if 'mercari' in platforms:
-                self._log_progress("mercari_search", "started", platform="mercari")
-                future = executor.submit(self._search_mercari, search_params)
-                future_to_platform[future] = 'mercari'
-                
-            if 'yahoo_shopping' in platforms:
-                self._log_progress("yahoo_shopping_search", "started", platform="yahoo_shopping")
-                future = executor.submit(self._search_yahoo_shopping, search_params)
-                future_to_platform[future] = 'yahoo_shopping'
+        # ブラウザ検索とAPI検索は別々のバルクヘッド（共有プール）で実行する
+        future_to_platform = {}
+        worker_futures = set()
+        
+        for platform in ('ebay', 'mercari', 'yahoo_shopping'):
+            if platform not in platforms or self._skip_degraded_platform(platform, platform_results):
+                continue
             
-            # 結果を収集
-            for future in as_completed(future_to_platform):
+            self._log_progress(f"{platform}_search", "started", platform=platform)
+            try:
+                future, in_worker = self._submit_platform_search(platform, search_params)
+            except BulkheadFullError as e:
+                logger.warning(f"Skipping {platform}: {e}")
+                platform_results[platform] = {'error': 'bulkhead_full', 'degraded': True, 'items': []}
+                self._log_progress(f"{platform}_search", "skipped", f"{platform}は実行枠が埋まっているためスキップしました（劣化モード）", platform=platform)
+                continue
+            
+            future_to_platform[future] = platform
+            if in_worker:
+                worker_futures.add(future)
+        
+        # 結果を収集
+        try:
+            for future in as_completed(future_to_platform, timeout=self.platform_timeout):
                 platform = future_to_platform[future]
                 try:
                     result = future.result()
+                    if future in worker_futures:
+                        result = self._complete_worker_result(platform, result, search_params)
                     platform_results[platform] = result
                     count = result.get('count', 0) if 'error' not in result else 0
                     self._log_progress(f"{platform}_search", "completed", f"{platform}の検索が完了しました", platform=platform, count=count)
@@ -93,6 +109,17 @@ class SearchExecutor:
                     logger.error(f"Error searching {platform}: {e}")
                     platform_results[platform] = {'error': str(e), 'items': []}
                     self._log_progress(f"{platform}_search", "failed", f"{platform}の検索でエラーが発生しました: {str(e)}", platform=platform)
+        except FuturesTimeoutError:
+            # 停滞したプラットフォームを待たずに、取得済みの結果で続行する
+            for future, platform in future_to_platform.items():
+                if platform in platform_results:
+                    continue
+                # 実行中のブラウザ検索はワーカーごと停止し、実行枠を解放する
+                get_platform_bulkhead(platform).abandon(future)
+                get_circuit_breaker(platform).record_failure(self.platform_timeout)
+                logger.warning(f"Search for {platform} timed out after {self.platform_timeout:.0f}s")
+                platform_results[platform] = {'error': 'timeout', 'degraded': True, 'items': []}
+                self._log_progress(f"{platform}_search", "failed", f"{platform}の検索がタイムアウトしました（劣化モード）", platform=platform)
         
         # 進捗ログ: 結果統合開始
         self._log_progress("integration_started", "started", "検索結果を統合しています（安い順に並べ替え）")
@@ -104,11 +131,169 @@ class SearchExecutor:
         total_count = integrated_results.get('count', 0)
         self._log_progress("search_completed", "completed", f"検索が完了しました。総件数: {total_count}件", count=total_count)
         
-        return {
+        # 呼び出し元（タスク保存・API応答・スクリプト）がそのままJSONにできるよう通常の辞書で返す
+        return to_serializable({
             'search_params': search_params,
             'platform_results': platform_results,
-            'integrated_results': integrated_results
+            'integrated_results': integrated_results,
+            'degraded_platforms': [platform for platform, result in platform_results.items() if result.get('degraded')]
+        })
+    
+    def find_cheapest_offers(self, jan_code: str, platforms: Optional[List[str]] = None,
+                             max_age_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        JANコードの最安出品を取得する
+        最安出品インデックスが十分に新しければ1回の読み込みで返し、そうでなければ検索してインデックスを更新する
+        
+        Args:
+            jan_code: JANコード
+            platforms: 対象プラットフォーム（省略時は execute_search の既定値）
+            max_age_seconds: インデックスを新しいとみなす秒数（省略時は CHEAPEST_OFFERS_MAX_AGE_SECONDS）
+            
+        Returns:
+            Dict[str, Any]: jan_code, offers（安い順）, cheapest, platforms, updated_at, source（index または search）
+        """
+        store = getattr(self.task_manager, 'store', None) or get_task_store()
+        offer_index = CheapestOfferIndex(store)
+        
+        # 一部のプラットフォームだけを検索した結果を全プラットフォームの最安値として返さないよう、
+        # 省略時も既定のプラットフォームすべてが新しい場合だけインデックスを使う
+        cached = offer_index.lookup(jan_code, platforms or DEFAULT_PLATFORMS, max_age_seconds)
+        if cached:
+            cached['source'] = 'index'
+            return cached
+        
+        search_params: Dict[str, Any] = {'query': jan_code, 'jan_code': jan_code}
+        if platforms:
+            search_params['platforms'] = list(platforms)
+        started = time.time()
+        search_result = self.execute_search(search_params)
+        offer_index.update_from_result(search_result)
+        
+        # この検索で更新した行だけを読み直す（エラーになったプラットフォームは行が更新されない）
+        searched = set(search_result['platform_results'])
+        found = offer_index.lookup(jan_code, max_age_seconds=time.time() - started + 1)
+        offers = [offer for offer in (found or {}).get('offers', []) if offer['platform'] in searched]
+        response = {
+            'jan_code': jan_code,
+            'offers': offers,
+            'cheapest': offers[0] if offers else None,
+            'platforms': [platform for platform in (found or {}).get('platforms', []) if platform in searched],
+            'updated_at': found['updated_at'] if found else None
+        }
+        response['source'] = 'search'
+        return response
+    
+    def _skip_degraded_platform(self, platform: str, platform_results: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        サーキットブレーカーが開いているプラットフォームを検索対象から外す
+        
+        Args:
+            platform: プラットフォーム名
+            platform_results: プラットフォーム別の検索結果（スキップ時は劣化状態を記録）
+            
+        Returns:
+            bool: スキップした場合True
+        """
+        breaker = get_circuit_breaker(platform)
+        if not breaker.is_open():
+            return False
+        
+        retry_in = breaker.retry_in()
+        logger.warning(f"Skipping {platform}: circuit breaker is open (retry in {retry_in:.0f}s)")
+        platform_results[platform] = {
+            'error': 'circuit_open',
+            'degraded': True,
+            'retry_in': round(retry_in, 1),
+            'items': []
+        }
+        self._log_progress(f"{platform}_search", "skipped", f"{platform}は障害中のためスキップしました（劣化モード）", platform=platform)
+        return True
+    
+    def _submit_platform_search(self, platform: str, search_params: Dict[str, Any]):
+        """
+        プラットフォームの検索をバルクヘッドに投入する
+        
+        Args:
+            platform: プラットフォーム名
+            search_params: 検索パラメータ
+            
+        Returns:
+            Tuple[Future, bool]: 検索結果のFutureと、ワーカープロセスで実行するかどうか
+            
+        Raises:
+            BulkheadFullError: バルクヘッドの実行枠と待ち行列が埋まっている場合
+        """
+        bulkhead = get_platform_bulkhead(platform)
+        
+        # プロセスプールではブラウザ検索部分のみをワーカーで実行し、後処理は呼び出し側で行う
+        if bulkhead.kind == 'process':
+            query, jan_code = self._build_platform_query(platform, search_params)
+            return bulkhead.submit(run_platform_search, platform, query, jan_code, 20), True
+        
+        search_methods = {
+            'ebay': self._search_ebay,
+            'mercari': self._search_mercari,
+            'yahoo_shopping': self._search_yahoo_shopping
         }
+        return bulkhead.submit(search_methods[platform], search_params), False
+    
+    def _complete_worker_result(self, platform: str, result: Dict[str, Any],
+                                search_params: Dict[str, Any]) -> Dict[str, Any]:
+        """ワーカープロセスの検索結果に後処理を適用し、ブレーカーの状態を反映する"""
+        get_circuit_breaker(platform).sync_status(result.pop('breaker', None))
+        
+        if 'error' in result:
+            return result
+        
+        if platform == 'mercari':
+            result['items'] = self._filter_by_price(result['items'], search_params)
+            result['count'] = len(result['items'])
+        return result
+    
+    def _build_platform_query(self, platform: str, search_params: Dict[str, Any]):
+        """
+        プラットフォームに渡す検索クエリとJANコードを組み立てる
+        
+        Args:
+            platform: プラットフォーム名
+            search_params: 検索パラメータ
+            
+        Returns:
+            Tuple[str, Optional[str]]: 検索クエリとJANコード
+        """
+        query = search_params.get('query', '')
+        jan_code = query if query.isdigit() and len(query) >= 8 else None
+        
+        # アーティストとタイトルが指定されている場合は結合（eBayはクエリをそのまま使用）
+        if platform != 'ebay':
+            if search_params.get('artist') and search_params.get('title'):
+                query = f"{search_params['artist']} {search_params['title']}"
+            elif search_params.get('artist'):
+                query = search_params['artist']
+            elif search_params.get('title'):
+                query = search_params['title']
+        
+        return query, jan_code
+    
+    def _filter_by_price(self, items: List[Dict[str, Any]], search_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """価格の上限・下限でフィルタリングする"""
+        if not (search_params.get('min_price') or search_params.get('max_price')):
+            return items
+        
+        filtered_items = []
+        for item in items:
+            price = item.get('total_price', 0)
+            
+            if search_params.get('min_price') and price < search_params['min_price']:
+                continue
+                
+            if search_params.get('max_price') and price > search_params['max_price']:
+                continue
+                
+            filtered_items.append(item)
+        
+        return filtered_items
     
     def _log_progress(self, step: str, status: str, message: str = None, platform: str = None, count: int = None):
         """進捗ログを記録する"""
@@ -128,8 +313,7 @@ class SearchExecutor:
     def _search_ebay(self, search_params: Dict[str, Any]) -> Dict[str, Any]:
         """eBayで検索を実行（プラットフォーム戦略使用）"""
         try:
-            query = search_params.get('query', '')
-            jan_code = query if query.isdigit() and len(query) >= 8 else None
+            query, jan_code = self._build_platform_query('ebay', search_params)
             
             # プラットフォーム戦略を使用して検索
             items = self.platform_manager.search_platform('ebay', query, jan_code, 20)
@@ -139,6 +323,9 @@ class SearchExecutor:
                 'count': len(items)
             }
             
+        except CircuitOpenError as e:
+            logger.warning(f"Skipped eBay search: circuit breaker is open")
+            return circuit_open_result(e)
         except Exception as e:
             logger.error(f"Error in _search_ebay: {e}")
             return {'error': str(e), 'items': []}
@@ -146,42 +333,22 @@ class SearchExecutor:
     def _search_mercari(self, search_params: Dict[str, Any]) -> Dict[str, Any]:
         """メルカリで検索を実行（プラットフォーム戦略使用）"""
         try:
-            query = search_params.get('query', '')
-            jan_code = query if query.isdigit() and len(query) >= 8 else None
-            
-            # アーティストとタイトルが指定されている場合は結合
-            if search_params.get('artist') and search_params.get('title'):
-                query = f"{search_params['artist']} {search_params['title']}"
-            elif search_params.get('artist'):
-                query = search_params['artist']
-            elif search_params.get('title'):
-                query = search_params['title']
+            query, jan_code = self._build_platform_query('mercari', search_params)
             
             # プラットフォーム戦略を使用して検索
             items = self.platform_manager.search_platform('mercari', query, jan_code, 20)
             
             # 価格でフィルタリング
-            if search_params.get('min_price') or search_params.get('max_price'):
-                filtered_items = []
-                
-                for item in items:
-                    price = item.get('total_price', 0)
-                    
-                    if search_params.get('min_price') and price < search_params['min_price']:
-                        continue
-                        
-                    if search_params.get('max_price') and price > search_params['max_price']:
-                        continue
-                        
-                    filtered_items.append(item)
-                    
-                items = filtered_items
+            items = self._filter_by_price(items, search_params)
             
             return {
                 'items': items,
                 'count': len(items)
             }
             
+        except CircuitOpenError as e:
+            logger.warning(f"Skipped Mercari search: circuit breaker is open")
+            return circuit_open_result(e)
         except Exception as e:
             logger.error(f"Error in _search_mercari: {e}")
             return {'error': str(e), 'items': []}
@@ -189,16 +356,7 @@ class SearchExecutor:
     def _search_yahoo_shopping(self, search_params: Dict[str, Any]) -> Dict[str, Any]:
         """Yahoo!ショッピングで検索を実行（プラットフォーム戦略使用）"""
         try:
-            query = search_params.get('query', '')
-            jan_code = query if query.isdigit() and len(query) >= 8 else None
-            
-            # アーティストとタイトルが指定されている場合は結合
-            if search_params.get('artist') and search_params.get('title'):
-                query = f"{search_params['artist']} {search_params['title']}"
-            elif search_params.get('artist'):
-                query = search_params['artist']
-            elif search_params.get('title'):
-                query = search_params['title']
+            query, jan_code = self._build_platform_query('yahoo_shopping', search_params)
             
             # プラットフォーム戦略を使用して検索
             items = self.platform_manager.search_platform('yahoo_shopping', query, jan_code, 20)
@@ -208,6 +366,9 @@ class SearchExecutor:
                 'count': len(items)
             }
             
+        except CircuitOpenError as e:
+            logger.warning(f"Skipped Yahoo Shopping search: circuit breaker is open")
+            return circuit_open_result(e)
         except Exception as e:
             logger.error(f"Error in _search_yahoo_shopping: {e}")
             return {'error': str(e), 'items': []}
@@ -235,29 +396,18 @@ class SearchExecutor:
                     
                 items = result.get('items', [])
                 
-                # プラットフォーム戦略からの結果は既に統一フォーマットなので、そのまま使用
+                # プラットフォーム戦略からの結果は統一フォーマットの辞書（互換キー付き）
+                # 統合中は軽量な SearchResultItem として扱い、返す時に辞書へ戻す
                 for item in items:
-                    # プラットフォーム戦略からの結果は既に統一フォーマット
-                    # 互換性のため、追加フィールドを設定
-                    formatted_item = item.copy()
-                    
-                    # 互換性フィールドを追加
-                    formatted_item.update({
-                        'title': item.get('item_title', ''),
-                        'price': item.get('base_price', 0),
-                        'url': item.get('item_url', ''),
-                        'image_url': item.get('item_image_url', ''),
-                        'condition': item.get('item_condition', ''),
-                        'currency': item.get('currency', 'JPY'),
-                        'seller': item.get('seller', ''),
-                    })
-                    
-                    all_items.append(formatted_item)
+                    all_items.append(SearchResultItem.from_dict(item))
+            
+            # 関連性スコアが閾値未満のアイテムを価格ソート前に除外
+            all_items = filter_by_relevance(all_items, search_params.get('min_relevance', 0))
             
             # 価格でソート（昇順）
             sorted_items = sorted(
                 all_items, 
-                key=lambda x: x.get('total_price', 0) if isinstance(x.get('total_price'), (int, float)) else 0
+                key=lambda x: x.total_price if isinstance(x.total_price, (int, float)) else 0
             )
             
             # 上位20件を取得
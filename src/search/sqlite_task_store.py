@@ -0,0 +1,439 @@
+"""
+SQLiteによる検索タスクの保存先
+タスクと検索結果を組み込みのSQLiteファイル（WALモード）に保存します。
+ネットワークを経由しないため、単一サーバー構成では Supabase より低遅延で、負荷試験では外部に依存しない保存先になります。
+
+タスクは id / status / created_at / updated_at を列として持ち（インデックス用）、その他のカラムはJSONとして保存します。
+Supabaseと同じ形の行を返すため、SearchTaskManager からはバックエンドの違いが見えません。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+from src.utils.config import get_optional_config
+from src.utils.search_result_store import compute_row_hash, unchanged_expiry, SEARCH_RESULTS_TABLE
+from src.search.cheapest_offers import ranked_offer_rows
+from src.search.task_store import TaskStore
+
+logger = logging.getLogger(__name__)
+
+# 列として保存するタスクのカラム（その他は data にJSONで保存）
+_TASK_KEY_COLUMNS = ('id', 'status', 'created_at', 'updated_at')
+
+# 並び替えに使える検索結果のカラム
+_RESULT_ORDER_COLUMNS = ('total_price', 'created_at', 'updated_at', 'platform', 'item_id')
+
+
+class SQLiteTaskStore(TaskStore):
+    """SQLite（WALモード）に保存するバックエンド"""
+    
+    def __init__(self, path: str, tasks_table: str = 'search_tasks', results_table: str = SEARCH_RESULTS_TABLE):
+        """
+        初期化
+        
+        Args:
+            path: SQLiteファイルのパス
+            tasks_table: タスクのテーブル名
+            results_table: 検索結果のテーブル名
+        """
+        super().__init__(tasks_table, results_table)
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._initialized = False
+    
+    def _connect(self) -> sqlite3.Connection:
+        """スレッドごとの接続を取得（初回はテーブルを作成）"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._initialized:
+                    self._create_tables(connection)
+                    self._initialized = True
+            self._local.connection = connection
+        return connection
+    
+    def _create_tables(self, connection: sqlite3.Connection) -> None:
+        """テーブルとインデックスを作成する"""
+        tasks, results = self.tasks_table, self.results_table
+        connection.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS "{tasks}" (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT,
+                data TEXT NOT NULL DEFAULT '{{}}'
+            );
+            CREATE INDEX IF NOT EXISTS "idx_{tasks}_created_at_id" ON "{tasks}" (created_at DESC, id DESC);
+            CREATE INDEX IF NOT EXISTS "idx_{tasks}_status_created_at_id" ON "{tasks}" (status, created_at DESC, id DESC);
+            
+            CREATE TABLE IF NOT EXISTS "{results}" (
+                task_id TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                total_price REAL,
+                content_hash TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT,
+                expires_at TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (task_id, platform, item_id)
+            );
+            CREATE INDEX IF NOT EXISTS "idx_{results}_task_total_price" ON "{results}" (task_id, total_price);
+            CREATE INDEX IF NOT EXISTS "idx_{results}_created_at" ON "{results}" (created_at);
+            CREATE INDEX IF NOT EXISTS "idx_{results}_expires_at" ON "{results}" (expires_at);
+            
+            CREATE TABLE IF NOT EXISTS cheapest_offers (
+                jan_code TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                total_price REAL NOT NULL,
+                updated_at TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (jan_code, platform, rank)
+            );
+            
+            CREATE TABLE IF NOT EXISTS search_task_results (
+                task_id TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                raw_size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            """
+        )
+    
+    def ensure_schema(self) -> None:
+        """テーブルを作成する"""
+        self._connect()
+        logger.info(f"Using SQLite task store at {self.path}")
+    
+    # --- タスク ---
+    
+    @staticmethod
+    def _task_from_row(row: Tuple, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """SQLiteの行をSupabaseと同じ形のタスクに変換する"""
+        task_id, status, created_at, updated_at, data = row
+        task = json.loads(data) if data else {}
+        task.update({'id': task_id, 'status': status, 'created_at': created_at, 'updated_at': updated_at})
+        if columns and '*' not in columns:
+            task = {column: task.get(column) for column in columns}
+        return task
+    
+    @staticmethod
+    def _split_task_fields(fields: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """列として保存するカラムとJSONで保存するカラムに分ける"""
+        keys = {key: value for key, value in fields.items() if key in _TASK_KEY_COLUMNS}
+        data = {key: value for key, value in fields.items() if key not in _TASK_KEY_COLUMNS}
+        return keys, data
+    
+    def insert_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        keys, data = self._split_task_fields(task)
+        self._connect().execute(
+            f'INSERT INTO "{self.tasks_table}" (id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)',
+            (keys['id'], keys.get('status', 'pending'), keys.get('created_at') or datetime.now().isoformat(),
+             keys.get('updated_at'), json.dumps(data, ensure_ascii=False))
+        )
+        return dict(task)
+    
+    def get_task(self, task_id: str, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            f'SELECT id, status, created_at, updated_at, data FROM "{self.tasks_table}" WHERE id = ?',
+            (task_id,)
+        ).fetchone()
+        return self._task_from_row(row, columns) if row else None
+    
+    def update_task(self, task_id: str, fields: Dict[str, Any],
+                    expected_status: Optional[Sequence[str]] = None) -> bool:
+        keys, data = self._split_task_fields(fields)
+        keys.pop('id', None)
+        
+        connection = self._connect()
+        # 状態の確認から書き込みまでを1トランザクションで行う（実行待ちタスクの取得を他のワーカーと競合させない）
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                f'SELECT status, data FROM "{self.tasks_table}" WHERE id = ?', (task_id,)
+            ).fetchone()
+            if not row or (expected_status and row[0] not in expected_status):
+                connection.execute("ROLLBACK")
+                return False
+            
+            merged = json.loads(row[1]) if row[1] else {}
+            merged.update(data)
+            
+            assignments = [f"{column} = ?" for column in keys] + ["data = ?"]
+            connection.execute(
+                f'UPDATE "{self.tasks_table}" SET {", ".join(assignments)} WHERE id = ?',
+                [*keys.values(), json.dumps(merged, ensure_ascii=False), task_id]
+            )
+            connection.execute("COMMIT")
+            return True
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    
+    def append_task_log(self, task_id: str, entry: Dict[str, Any], updated_at: str) -> bool:
+        connection = self._connect()
+        # 読み込みから書き込みまでを1トランザクションにして、同時に追加されたログを失わない
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                f'SELECT data FROM "{self.tasks_table}" WHERE id = ?', (task_id,)
+            ).fetchone()
+            if not row:
+                connection.execute("ROLLBACK")
+                return False
+            
+            data = json.loads(row[0]) if row[0] else {}
+            logs = data.get('processing_logs') or []
+            if isinstance(logs, str):
+                logs = json.loads(logs)
+            logs.append(entry)
+            data['processing_logs'] = json.dumps(logs)
+            
+            connection.execute(
+                f'UPDATE "{self.tasks_table}" SET data = ?, updated_at = ? WHERE id = ?',
+                (json.dumps(data, ensure_ascii=False), updated_at, task_id)
+            )
+            connection.execute("COMMIT")
+            return True
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    
+    def list_tasks(self, columns: Sequence[str], limit: int, statuses: Optional[Sequence[str]] = None,
+                   after: Optional[Tuple[str, str]] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        conditions, params = [], []
+        if statuses:
+            conditions.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if after:
+            created_at, task_id = after
+            conditions.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([created_at, created_at, task_id])
+        
+        query = f'SELECT id, status, created_at, updated_at, data FROM "{self.tasks_table}"'
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        if offset and not after:
+            query += " OFFSET ?"
+            params.append(offset)
+        
+        rows = self._connect().execute(query, params).fetchall()
+        return [self._task_from_row(row, columns) for row in rows]
+    
+    def count_tasks(self, status: str) -> int:
+        row = self._connect().execute(
+            f'SELECT COUNT(*) FROM "{self.tasks_table}" WHERE status = ?', (status,)
+        ).fetchone()
+        return row[0]
+    
+    # --- 検索結果 ---
+    
+    @staticmethod
+    def _total_price(row: Dict[str, Any]) -> Optional[float]:
+        """並び替え用の総額（JANの結果のように総額がない場合は価格と手数料の合計）"""
+        total = row.get('total_price')
+        if isinstance(total, (int, float)):
+            return float(total)
+        parts = [row.get(key) for key in ('price', 'base_price', 'shipping_fee', 'service_fee')]
+        numbers = [float(value) for value in parts if isinstance(value, (int, float))]
+        return sum(numbers) if numbers else None
+    
+    def save_results(self, task_id: str, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        now = datetime.now().isoformat()
+        
+        # 同じキーの行は後のものを優先して1行にまとめる
+        new_rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for row in rows:
+            row = dict(row, task_id=task_id)
+            row['content_hash'] = compute_row_hash(row)
+            new_rows[(row['platform'], str(row['item_id']))] = row
+        
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            existing = {
+                (platform, item_id): content_hash
+                for platform, item_id, content_hash in connection.execute(
+                    f'SELECT platform, item_id, content_hash FROM "{self.results_table}" WHERE task_id = ?',
+                    (task_id,)
+                )
+            }
+            
+            changed = [row for key, row in new_rows.items() if existing.get(key) != row['content_hash']]
+            
+            # 内容が変わらない行も、初回の有効期限で削除されないよう期限を延長
+            unchanged = [(key, row) for key, row in new_rows.items() if existing.get(key) == row['content_hash']]
+            expires_at = unchanged_expiry(row for _, row in unchanged)
+            if expires_at:
+                connection.executemany(
+                    f'UPDATE "{self.results_table}" SET expires_at = ?, updated_at = ? '
+                    f'WHERE task_id = ? AND platform = ? AND item_id = ?',
+                    [(expires_at, now, task_id, platform, item_id) for (platform, item_id), _ in unchanged]
+                )
+            connection.executemany(
+                f'INSERT INTO "{self.results_table}" '
+                f'(task_id, platform, item_id, total_price, content_hash, created_at, updated_at, expires_at, data) '
+                f'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                f'ON CONFLICT (task_id, platform, item_id) DO UPDATE SET '
+                f'total_price = excluded.total_price, content_hash = excluded.content_hash, '
+                f'updated_at = excluded.updated_at, expires_at = excluded.expires_at, data = excluded.data',
+                [
+                    (task_id, row['platform'], str(row['item_id']), self._total_price(row), row['content_hash'],
+                     now, row.get('updated_at') or now, row.get('expires_at'),
+                     json.dumps(row, ensure_ascii=False, default=str))
+                    for row in changed
+                ]
+            )
+            
+            # 今回の結果に含まれなくなった行を削除
+            stale = [key for key in existing if key not in new_rows]
+            connection.executemany(
+                f'DELETE FROM "{self.results_table}" WHERE task_id = ? AND platform = ? AND item_id = ?',
+                [(task_id, platform, item_id) for platform, item_id in stale]
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        
+        stats = {'upserted': len(changed), 'unchanged': len(new_rows) - len(changed),
+                 'deleted': len(stale), 'failed': 0}
+        logger.info(f"Saved search results for task {task_id}: {stats}")
+        return stats
+    
+    def get_results(self, task_id: str, limit: int = 20, order_by: str = 'total_price') -> List[Dict[str, Any]]:
+        if order_by not in _RESULT_ORDER_COLUMNS:
+            raise ValueError(f"未対応の並び順です: {order_by}")
+        
+        rows = self._connect().execute(
+            f'SELECT data, total_price, created_at FROM "{self.results_table}" '
+            f'WHERE task_id = ? ORDER BY {order_by} LIMIT ?',
+            (task_id, limit)
+        ).fetchall()
+        
+        results = []
+        for data, total_price, created_at in rows:
+            result = json.loads(data)
+            result.setdefault('total_price', total_price)
+            result.setdefault('created_at', created_at)
+            results.append(result)
+        return results
+    
+    def save_result_blob(self, row: Dict[str, Any]) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO search_task_results "
+            "(task_id, codec, payload, raw_size, stored_size, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (row['task_id'], row['codec'], row['payload'], row['raw_size'], row['stored_size'], row['created_at'])
+        )
+    
+    def load_result_blob(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT codec, payload FROM search_task_results WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return {'codec': row[0], 'payload': row[1]} if row else None
+    
+    def delete_result_blob(self, task_id: str) -> None:
+        self._connect().execute("DELETE FROM search_task_results WHERE task_id = ?", (task_id,))
+    
+    # --- 最安出品 ---
+    
+    def replace_cheapest_offers(self, jan_code: str, platform: str, offers: List[Dict[str, Any]],
+                                updated_at: str) -> None:
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM cheapest_offers WHERE jan_code = ? AND platform = ?", (jan_code, platform))
+            connection.executemany(
+                "INSERT INTO cheapest_offers (jan_code, platform, rank, total_price, updated_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(jan_code, platform, row.pop('rank'), row['total_price'], updated_at, json.dumps(row, ensure_ascii=False))
+                 for row in ranked_offer_rows(offers)]
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    
+    def get_cheapest_offers(self, jan_code: str, platforms: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        query = "SELECT platform, rank, updated_at, data FROM cheapest_offers WHERE jan_code = ?"
+        params: List[Any] = [jan_code]
+        if platforms:
+            query += f" AND platform IN ({','.join('?' * len(platforms))})"
+            params.extend(platforms)
+        rows = self._connect().execute(query + " ORDER BY total_price", params).fetchall()
+        return [dict(json.loads(data), jan_code=jan_code, platform=platform, rank=rank, updated_at=updated_at)
+                for platform, rank, updated_at, data in rows]
+    
+    # --- 保持期間 ---
+    
+    def _delete_in_batches(self, select_ids: str, delete_statements: Sequence[str], cutoff: str,
+                           batch_size: Optional[int], max_batches: Optional[int]) -> int:
+        """カットオフより古い行のキーを一定件数ずつ取得し、短いトランザクションで削除する"""
+        batch_size = batch_size or int(get_optional_config("RETENTION_BATCH_SIZE", "1000"))
+        pause_seconds = float(get_optional_config("RETENTION_PAUSE_SECONDS", "0.2"))
+        connection = self._connect()
+        
+        deleted, batches = 0, 0
+        while max_batches is None or batches < max_batches:
+            keys = connection.execute(select_ids, (cutoff, batch_size)).fetchall()
+            if not keys:
+                break
+            
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                count = 0
+                for statement in delete_statements:
+                    count = connection.executemany(statement, keys).rowcount
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            
+            deleted += count
+            batches += 1
+            if len(keys) < batch_size:
+                break
+            if pause_seconds > 0:
+                time.sleep(pause_seconds)
+        return deleted
+    
+    def delete_tasks_before(self, cutoff: datetime, batch_size: Optional[int] = None,
+                            max_batches: Optional[int] = None) -> int:
+        # タスクの削除と同じトランザクションで検索結果と圧縮した結果を削除する（最後の文の件数を返す）
+        return self._delete_in_batches(
+            f'SELECT id FROM "{self.tasks_table}" WHERE created_at < ? ORDER BY created_at LIMIT ?',
+            (
+                f'DELETE FROM "{self.results_table}" WHERE task_id = ?',
+                'DELETE FROM search_task_results WHERE task_id = ?',
+                f'DELETE FROM "{self.tasks_table}" WHERE id = ?',
+            ),
+            cutoff.isoformat(), batch_size, max_batches
+        )
+    
+    def delete_expired_results(self, now: datetime, batch_size: Optional[int] = None,
+                               max_batches: Optional[int] = None) -> int:
+        return self._delete_in_batches(
+            f'SELECT task_id, platform, item_id FROM "{self.results_table}" '
+            f'WHERE expires_at < ? ORDER BY expires_at LIMIT ?',
+            (f'DELETE FROM "{self.results_table}" WHERE task_id = ? AND platform = ? AND item_id = ?',),
+            now.isoformat(), batch_size, max_batches
+        )
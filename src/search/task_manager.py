@@ -1,15 +1,26 @@
 import uuid
 import json
+import base64
 import time
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, Sequence, Tuple
 from enum import Enum
 
-from src.utils.supabase_client import get_supabase_client
+from src.utils.search_result_store import derive_item_id
+from src.search.result_item import SearchResultItem, json_default
+from src.search.result_blob_store import TaskResultBlobStore
+from src.search.task_store import TaskStore, get_task_store
+from src.search.cheapest_offers import CheapestOfferIndex
 
 logger = logging.getLogger(__name__)
 
+# 一覧取得で既定で取得するカラム（大きなJSONの result / processing_logs を除く）
+TASK_LIST_COLUMNS = ('id', 'name', 'status', 'search_params', 'error', 'created_at', 'updated_at', 'completed_at')
+
+# 実行待ちタスクの取得で使用するカラム
+PENDING_TASK_COLUMNS = ('id', 'name', 'status', 'search_params', 'created_at')
+
 class TaskStatus(Enum):
     """検索タスクのステータスを表す列挙型"""
     PENDING = "pending"
@@ -22,45 +33,21 @@ class TaskStatus(Enum):
 class SearchTaskManager:
     """検索タスクを管理するクラス"""
     
-    def __init__(self):
-        """初期化"""
-        self.supabase = get_supabase_client()
-        self._ensure_table_exists()
+    def __init__(self, store: Optional[TaskStore] = None):
+        """
+        初期化
+        
+        Args:
+            store: タスクの保存先（省略時は TASK_STORE_BACKEND で選択した共有の保存先）
+        """
+        self.store = store or get_task_store()
+        self.result_store = TaskResultBlobStore(self.store)  # 大きな結果の圧縮保存先
+        self.offer_index = CheapestOfferIndex(self.store)  # JANコード別の最安出品
     
-    def _ensure_table_exists(self) -> None:
-        """検索タスクテーブルが存在することを確認し、なければ作成する"""
-        try:
-            # テーブルが存在するか確認
-            try:
-                # テーブルからデータを取得してみる（テーブルが存在するか確認するため）
-                self.supabase.table('search_tasks').select('id').limit(1).execute()
-                logger.info("search_tasksテーブルは既に存在します")
-                return
-            except Exception as e:
-                # テーブルが存在しない場合は作成する
-                if "relation" in str(e) and "does not exist" in str(e):
-                    logger.info("search_tasksテーブルが存在しないため、作成します")
-                    
-                    # テーブルを作成するためのスクリプトを実行
-                    import subprocess
-                    import os
-                    
-                    script_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
-                                              'scripts', 'create_search_tasks_table_direct.py')
-                    
-                    result = subprocess.run(['python', script_path], capture_output=True, text=True)
-                    
-                    if result.returncode != 0:
-                        logger.error(f"テーブル作成に失敗しました: {result.stderr}")
-                        raise Exception(f"テーブル作成に失敗しました: {result.stderr}")
-                    
-                    logger.info("search_tasksテーブルが正常に作成されました")
-                else:
-                    # その他のエラーの場合はそのまま例外を投げる
-                    raise e
-        except Exception as e:
-            logger.error(f"Error ensuring search_tasks table exists: {e}")
-            raise
+    @property
+    def supabase(self):
+        """Supabaseクライアント（Supabase以外のバックエンドではNone。リセット後の共有クライアントを返すため保持しない）"""
+        return self.store.client
     
     def create_task(self, name: str, search_params: Dict[str, Any]) -> str:
         """
@@ -86,11 +73,7 @@ class SearchTaskManager:
                 'updated_at': datetime.now().isoformat()
             }
             
-            result = self.supabase.table('search_tasks').insert(task_data).execute()
-            
-            if hasattr(result, 'error') and result.error:
-                logger.error(f"Error creating search task: {result.error}")
-                raise Exception(f"Error creating search task: {result.error}")
+            self.store.insert_task(task_data)
             
             logger.info(f"Created search task: {task_id}")
             return task_id
@@ -99,32 +82,31 @@ class SearchTaskManager:
             logger.error(f"Error creating search task: {e}")
             raise
     
-    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+    def get_task(self, task_id: str, columns: Optional[Sequence[str]] = None,
+                 include_full_result: bool = False) -> Optional[Dict[str, Any]]:
         """
         タスクの情報を取得する
         
         Args:
             task_id: タスクID
+            columns: 取得するカラム（省略時は全カラム）
+            include_full_result: Trueの場合、圧縮保存された結果全体を result に展開する
+                                 （Falseの場合 result は要約のまま。必要時に get_task_result で取得）
             
         Returns:
             Dict[str, Any] or None: タスク情報、存在しない場合はNone
         """
         try:
-            result = self.supabase.table('search_tasks').select('*').eq('id', task_id).execute()
-            
-            if not result.data or len(result.data) == 0:
+            task_data = self.store.get_task(task_id, columns)
+            if not task_data:
                 return None
-                
-            task_data = result.data[0]
             
             # JSONBフィールドをパース
-            if task_data.get('search_params'):
-                if isinstance(task_data['search_params'], str):
-                    task_data['search_params'] = json.loads(task_data['search_params'])
+            self._parse_json_fields(task_data)
             
-            if task_data.get('result'):
-                if isinstance(task_data['result'], str):
-                    task_data['result'] = json.loads(task_data['result'])
+            if include_full_result and isinstance(task_data.get('result'), dict) \
+                    and task_data['result'].get('full_result_stored'):
+                task_data['result'] = self.get_task_result(task_id) or task_data['result']
                 
             return task_data
             
@@ -132,6 +114,23 @@ class SearchTaskManager:
             logger.error(f"Error getting search task {task_id}: {e}")
             raise
     
+    def get_task_result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        タスクの結果全体を取得する（圧縮保存されている場合は展開、されていない場合はタスク行の結果）
+        
+        Args:
+            task_id: タスクID
+            
+        Returns:
+            Dict[str, Any] or None: 結果全体、結果がない場合はNone
+        """
+        full_result = self.result_store.load(task_id)
+        if full_result is not None:
+            return full_result
+        
+        task = self.get_task(task_id, columns=('id', 'result'))
+        return task.get('result') if task else None
+    
     def update_task_status(self, task_id: str, status: TaskStatus, 
                           result: Optional[Dict[str, Any]] = None, 
                           error: Optional[str] = None,
@@ -157,9 +156,10 @@ class SearchTaskManager:
             if status in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
                 update_data['completed_at'] = datetime.now().isoformat()
             
-            # 結果がある場合
+            # 結果がある場合（大きな結果は圧縮して別テーブルに保存し、要約だけをタスク行に残す）
             if result is not None:
-                update_data['result'] = json.dumps(result)
+                summary = self.result_store.save(task_id, result) if isinstance(result, dict) else None
+                update_data['result'] = json.dumps(summary if summary is not None else result, default=json_default)
             
             # エラーがある場合
             if error is not None:
@@ -170,11 +170,7 @@ class SearchTaskManager:
                 update_data['processing_logs'] = json.dumps(processing_logs)
             
             # データを更新
-            result = self.supabase.table('search_tasks').update(update_data).eq('id', task_id).execute()
-            
-            if hasattr(result, 'error') and result.error:
-                logger.error(f"Error updating search task {task_id}: {result.error}")
-                raise Exception(f"Error updating search task {task_id}: {result.error}")
+            self.store.update_task(task_id, update_data)
             
             logger.info(f"Updated search task {task_id} status to {status.value}")
             
@@ -182,6 +178,27 @@ class SearchTaskManager:
             logger.error(f"Error updating search task {task_id}: {e}")
             raise
     
+    def claim_task(self, task_id: str) -> bool:
+        """
+        実行待ちのタスクを実行中にする（ステータスの確認と更新を1回の条件付き更新で行う）
+        
+        Args:
+            task_id: タスクID
+            
+        Returns:
+            bool: 取得できた場合はTrue（既に他のワーカーが実行中、またはPENDINGでない場合はFalse）
+        """
+        try:
+            now = datetime.now().isoformat()
+            claimed = self.store.claim_task(task_id, {'status': TaskStatus.RUNNING.value, 'updated_at': now})
+            if claimed:
+                logger.info(f"Updated search task {task_id} status to {TaskStatus.RUNNING.value}")
+            return claimed
+            
+        except Exception as e:
+            logger.error(f"Error claiming search task {task_id}: {e}")
+            raise
+    
     def add_processing_log(self, task_id: str, step: str, status: str, 
                           message: Optional[str] = None, 
                           platform: Optional[str] = None,
@@ -198,18 +215,6 @@ class SearchTaskManager:
             count: 結果数（オプション）
         """
         try:
-            # 現在のタスク情報を取得
-            task = self.get_task(task_id)
-            if not task:
-                return
-            
-            # 既存の処理ログを取得
-            existing_logs = task.get('processing_logs', [])
-            if isinstance(existing_logs, str):
-                existing_logs = json.loads(existing_logs)
-            elif existing_logs is None:
-                existing_logs = []
-            
             # 新しいログエントリを作成
             log_entry = {
                 'timestamp': datetime.now().isoformat(),
@@ -221,19 +226,8 @@ class SearchTaskManager:
             }
             
             # ログを追加
-            existing_logs.append(log_entry)
-            
-            # データベースを更新
-            update_data = {
-                'processing_logs': json.dumps(existing_logs),
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            result = self.supabase.table('search_tasks').update(update_data).eq('id', task_id).execute()
-            
-            if hasattr(result, 'error') and result.error:
-                logger.error(f"Error adding processing log to task {task_id}: {result.error}")
-                raise Exception(f"Error adding processing log to task {task_id}: {result.error}")
+            if not self.store.append_task_log(task_id, log_entry, datetime.now().isoformat()):
+                return
             
             logger.info(f"Added processing log to task {task_id}: {step} - {status}")
             
@@ -242,51 +236,91 @@ class SearchTaskManager:
             raise
     
     def list_tasks(self, limit: int = 50, offset: int = 0, 
-                  status: Optional[Union[TaskStatus, List[TaskStatus]]] = None) -> List[Dict[str, Any]]:
+                  status: Optional[Union[TaskStatus, List[TaskStatus]]] = None,
+                  columns: Optional[Sequence[str]] = None,
+                  cursor: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         タスクのリストを取得する
         
         Args:
             limit: 取得する最大件数
-            offset: オフセット（ページネーション用）
+            offset: オフセット（cursorを指定しない場合のみ使用。大きな値は遅いためcursorを推奨）
             status: フィルタするステータス（オプション）
+            columns: 取得するカラム（省略時は result / processing_logs を除く TASK_LIST_COLUMNS）
+            cursor: 前のページの next_cursor（キーセットページネーション）
             
         Returns:
             List[Dict[str, Any]]: タスクのリスト
         """
+        return self.list_tasks_page(limit=limit, status=status, columns=columns,
+                                    cursor=cursor, offset=offset)['tasks']
+    
+    def list_tasks_page(self, limit: int = 50,
+                        status: Optional[Union[TaskStatus, List[TaskStatus]]] = None,
+                        columns: Optional[Sequence[str]] = None,
+                        cursor: Optional[str] = None,
+                        offset: int = 0) -> Dict[str, Any]:
+        """
+        タスクのリストを (created_at, id) の降順でキーセットページネーションして取得する
+        
+        Args:
+            limit: 取得する最大件数
+            status: フィルタするステータス（オプション）
+            columns: 取得するカラム（省略時は TASK_LIST_COLUMNS、'*' で全カラム）
+            cursor: 前のページの next_cursor（省略時は先頭ページ）
+            offset: オフセット（cursorを指定しない場合のみ使用）
+            
+        Returns:
+            Dict[str, Any]: tasks（タスクのリスト）と next_cursor（次のページがない場合はNone）
+        """
         try:
-            # クエリを構築
-            query = self.supabase.table('search_tasks').select('*').order('created_at', desc=True).limit(limit).offset(offset)
+            selected = list(columns or TASK_LIST_COLUMNS)
+            # カーソルの生成に必要なカラムは常に取得
+            if '*' not in selected:
+                selected += [column for column in ('id', 'created_at') if column not in selected]
             
             # ステータスでフィルタリング
+            statuses = None
             if status:
-                if isinstance(status, list):
-                    status_values = [s.value for s in status]
-                    query = query.in_('status', status_values)
-                else:
-                    query = query.eq('status', status.value)
+                statuses = [s.value for s in status] if isinstance(status, list) else [status.value]
             
-            # クエリを実行
-            result = query.execute()
+            after = self._decode_cursor(cursor) if cursor else None
+            tasks = self.store.list_tasks(selected, limit, statuses=statuses, after=after, offset=offset)
             
-            tasks = result.data or []
-            
-            # JSONBフィールドをパース
+            # JSONBフィールドをパース（取得したカラムのみ）
             for task in tasks:
-                if task.get('search_params'):
-                    if isinstance(task['search_params'], str):
-                        task['search_params'] = json.loads(task['search_params'])
-                
-                if task.get('result'):
-                    if isinstance(task['result'], str):
-                        task['result'] = json.loads(task['result'])
+                self._parse_json_fields(task)
             
-            return tasks
+            next_cursor = self._encode_cursor(tasks[-1]) if len(tasks) == limit else None
+            return {'tasks': tasks, 'next_cursor': next_cursor}
             
         except Exception as e:
             logger.error(f"Error listing search tasks: {e}")
             raise
     
+    @staticmethod
+    def _parse_json_fields(task: Dict[str, Any]) -> None:
+        """文字列で保存されたJSONBフィールドをパースする"""
+        for field in ('search_params', 'result', 'processing_logs'):
+            if isinstance(task.get(field), str):
+                task[field] = json.loads(task[field])
+    
+    @staticmethod
+    def _encode_cursor(task: Dict[str, Any]) -> str:
+        """タスクの (created_at, id) からページネーション用カーソルを作成する"""
+        raw = json.dumps([task['created_at'], task['id']])
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, str]:
+        """ページネーション用カーソルを (created_at, id) に戻す"""
+        try:
+            created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            # フィルタ文字列に埋め込むため、IDはUUIDとして検証する
+            return str(created_at).replace('"', ''), str(uuid.UUID(str(task_id)))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+    
     def cancel_task(self, task_id: str) -> bool:
         """
         タスクをキャンセルする
@@ -298,8 +332,8 @@ class SearchTaskManager:
             bool: キャンセルに成功した場合はTrue
         """
         try:
-            # 現在のタスク情報を取得
-            task = self.get_task(task_id)
+            # 現在のステータスだけを取得
+            task = self.get_task(task_id, columns=('id', 'status'))
             if not task:
                 return False
             
@@ -330,7 +364,7 @@ class SearchTaskManager:
         Returns:
             List[Dict[str, Any]]: 実行待ちタスクのリスト
         """
-        return self.list_tasks(limit=limit, status=TaskStatus.PENDING)
+        return self.list_tasks(limit=limit, status=TaskStatus.PENDING, columns=PENDING_TASK_COLUMNS)
     
     def count_running_tasks(self) -> int:
         """
@@ -340,111 +374,114 @@ class SearchTaskManager:
             int: 実行中のタスク数
         """
         try:
-            result = self.supabase.table('search_tasks').select('id', count='exact').eq('status', TaskStatus.RUNNING.value).execute()
-            
-            # count結果を取得
-            count = result.count if hasattr(result, 'count') else 0
-            
-            return count
+            return self.store.count_tasks(TaskStatus.RUNNING.value)
             
         except Exception as e:
             logger.error(f"Error counting running tasks: {e}")
             raise
     
-    def save_search_results(self, task_id: str, search_results: Dict[str, Any]) -> None:
+    def save_search_results(self, task_id: str, search_results: Dict[str, Any]) -> Dict[str, int]:
         """
         検索結果をsearch_resultsテーブルに保存する
+        統合結果の上位20件だけでなく全プラットフォームの結果を、(task_id, platform, item_id) をキーに
+        差分upsertで保存する（内容が変わらない行は書き込まない）
+        JANコード検索の場合は最安出品インデックスも更新する
         
         Args:
             task_id: タスクID
             search_results: 検索結果データ
+            
+        Returns:
+            Dict[str, int]: 保存件数の内訳（upserted, unchanged, deleted, failed）
         """
         try:
-            # 既存の検索結果を削除（重複を避けるため）
-            self.supabase.table('search_results').delete().eq('task_id', task_id).execute()
-            
-            # 統合結果から個別のアイテムを取得
-            integrated_results = search_results.get('integrated_results', {})
-            items = integrated_results.get('items', [])
-            
+            items = []
+            platform_results = search_results.get('platform_results') or {}
+            for platform, result in platform_results.items():
+                if not isinstance(result, dict) or 'error' in result:
+                    continue
+                for item in result.get('items', []):
+                    item = SearchResultItem.from_dict(item)
+                    if not item.platform:
+                        item.platform = platform
+                    items.append(item)
+            
+            # プラットフォーム別の結果がない場合は統合結果を保存
             if not items:
-                logger.info(f"No search results to save for task {task_id}")
-                return
+                integrated_results = search_results.get('integrated_results', {})
+                items = [SearchResultItem.from_dict(item) for item in integrated_results.get('items', [])]
             
-            # 各アイテムをsearch_resultsテーブルに保存
-            results_to_insert = []
+            rows = [self._build_result_row(item) for item in items]
+            stats = self.store.save_results(task_id, rows)
             
-            for item in items:
-                # 価格情報を処理
-                item_price = 0
-                shipping_cost = 0
-                total_price = 0
-                
-                if isinstance(item.get('price'), dict):
-                    # Discogsの価格形式
-                    item_price = item['price'].get('value', 0)
-                    total_price = item_price
-                elif isinstance(item.get('price'), (int, float)):
-                    # 数値の価格
-                    item_price = item['price']
-                    total_price = item_price
-                
-                # 送料が別途ある場合
-                if item.get('shipping_cost'):
-                    shipping_cost = item['shipping_cost']
-                    total_price = item_price + shipping_cost
-                
-                # total_priceが直接指定されている場合
-                if item.get('total_price'):
-                    total_price = item['total_price']
-                
-                # 検索結果データを構築（必須カラムを含む）
-                result_data = {
-                    'task_id': task_id,
-                    'platform': item.get('platform', 'unknown'),
-                    'item_title': item.get('item_title', item.get('title', 'Unknown Item')),
-                    'item_url': item.get('item_url', item.get('url', '')),
-                    'item_image_url': item.get('item_image_url', item.get('image_url', '')),
-                    'item_condition': item.get('item_condition', item.get('condition', '')),
-                    'base_price': item_price,
-                    'shipping_fee': shipping_cost,
-                    'created_at': datetime.now().isoformat()
-                }
-                
-                results_to_insert.append(result_data)
+            logger.info(f"Saved {stats['upserted']} search results for task {task_id} "
+                        f"({stats['unchanged']} unchanged, {stats['deleted']} removed)")
             
-            # バッチで挿入
-            if results_to_insert:
-                result = self.supabase.table('search_results').insert(results_to_insert).execute()
-                
-                if hasattr(result, 'error') and result.error:
-                    logger.error(f"Error saving search results for task {task_id}: {result.error}")
-                    raise Exception(f"Error saving search results for task {task_id}: {result.error}")
-                
-                logger.info(f"Saved {len(results_to_insert)} search results for task {task_id}")
+            # インデックスは検索結果から再構築できるため、更新に失敗しても保存は成功とする
+            try:
+                self.offer_index.update_from_result(search_results)
+            except Exception as e:
+                logger.warning(f"Failed to update cheapest offers for task {task_id}: {e}")
+            
+            return stats
             
         except Exception as e:
             logger.error(f"Error saving search results for task {task_id}: {e}")
             raise
+    
+    @staticmethod
+    def _build_result_row(item: SearchResultItem) -> Dict[str, Any]:
+        """
+        検索結果アイテムをsearch_resultsテーブルの行に変換する
+        （create_jan_search_tables.sql のカラム。total_price は生成列のため書き込まない）
+        
+        Args:
+            item: 検索結果アイテム
+            
+        Returns:
+            Dict[str, Any]: search_resultsテーブルの行
+        """
+        # 価格情報を処理（Discogsは {'value': ...} 形式）
+        item_price = item.base_price.get('value', 0) if isinstance(item.base_price, dict) else item.base_price
+        item_price = item_price if isinstance(item_price, (int, float)) else 0
+        shipping_fee = item.shipping_fee if isinstance(item.shipping_fee, (int, float)) else 0
+        
+        return {
+            'platform': item.platform or 'unknown',
+            'item_id': derive_item_id(item),
+            'item_title': item.item_title or 'Unknown Item',
+            'item_url': item.item_url or '',
+            'item_image_url': item.item_image_url or '',
+            'condition_text': item.item_condition or '',
+            'price': item_price,
+            'shipping_fee': shipping_fee,
+            'currency': item.currency or 'JPY',
+            'seller_name': item.seller or '',
+            'updated_at': datetime.now().isoformat()
+        }
 
-    def delete_old_tasks(self, days: int = 30) -> int:
+    def delete_old_tasks(self, days: int = 30, batch_size: Optional[int] = None,
+                         max_batches: Optional[int] = None) -> int:
         """
         古いタスクを削除する
+        作成日時のインデックスに沿って一定件数ずつ削除し、削除した行は取得しない。
+        ON DELETE CASCADE で1回の削除が大きくならないよう、先に同じ期間の検索結果を削除する
         
         Args:
             days: 何日前より古いタスクを削除するか
+            batch_size: 1回に削除する件数（省略時は RETENTION_BATCH_SIZE）
+            max_batches: テーブルごとの最大削除回数（省略時は全件削除するまで）
             
         Returns:
             int: 削除されたタスク数
         """
         try:
             # 現在時刻からdays日前の日時を計算
-            cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
-            
-            # 古いタスクを削除
-            result = self.supabase.table('search_tasks').delete().lt('created_at', cutoff_date).execute()
+            cutoff_date = datetime.now() - timedelta(days=days)
             
-            deleted_count = len(result.data) if result.data else 0
+            # 古い検索結果、圧縮保存した結果、タスクの順に削除
+            deleted_count = self.store.delete_tasks_before(cutoff_date, batch_size=batch_size,
+                                                           max_batches=max_batches)
             logger.info(f"Deleted {deleted_count} old search tasks")
             
             return deleted_count
@@ -0,0 +1,495 @@
+"""
+検索タスクの保存先（ストレージバックエンド）
+タスクの作成・取得・更新・処理ログ・検索結果の保存を TaskStore インターフェースにまとめ、
+SearchTaskManager / JANSearchTaskManager はこのインターフェースだけを使用します。
+
+バックエンドは TASK_STORE_BACKEND で選択します。
+    supabase: Supabase（PostgreSQL）。既定。複数のワーカーで共有する構成向け
+    sqlite:   組み込みのSQLite（WALモード、TASK_STORE_SQLITE_PATH）。単一サーバー構成や負荷試験向け
+"""
+
+import os
+import json
+import subprocess
+import threading
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+from src.utils.config import get_optional_config
+from src.utils.supabase_client import get_supabase_client, execute_with_client
+from src.utils.search_result_store import save_task_results, SEARCH_RESULTS_TABLE
+from src.utils.retention import RetentionJob
+from src.search.result_blob_store import RESULT_BLOB_TABLE
+from src.search.cheapest_offers import CHEAPEST_OFFERS_TABLE, ranked_offer_rows
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStore(ABC):
+    """検索タスクと検索結果の保存先のインターフェース"""
+    
+    #: Supabaseクライアント（Supabase以外のバックエンドではNone）
+    client = None
+    
+    def __init__(self, tasks_table: str = 'search_tasks', results_table: str = SEARCH_RESULTS_TABLE):
+        """
+        初期化
+        
+        Args:
+            tasks_table: タスクのテーブル名
+            results_table: 検索結果のテーブル名
+        """
+        self.tasks_table = tasks_table
+        self.results_table = results_table
+    
+    def ensure_schema(self) -> None:
+        """テーブルが存在することを確認する（必要なら作成する）"""
+    
+    @abstractmethod
+    def insert_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        タスクを登録します。
+        
+        Args:
+            task: タスクの行（id, status, created_at を含む）
+        
+        Returns:
+            Dict[str, Any]: 登録した行
+        """
+    
+    @abstractmethod
+    def get_task(self, task_id: str, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        タスクを取得します。
+        
+        Args:
+            task_id: タスクID
+            columns: 取得するカラム（省略時は全カラム）
+        
+        Returns:
+            Optional[Dict[str, Any]]: タスクの行（存在しない場合はNone）
+        """
+    
+    @abstractmethod
+    def update_task(self, task_id: str, fields: Dict[str, Any],
+                    expected_status: Optional[Sequence[str]] = None) -> bool:
+        """
+        タスクを更新します。
+        
+        Args:
+            task_id: タスクID
+            fields: 更新するカラムと値
+            expected_status: 指定した場合、現在のステータスがこのいずれかのときだけ更新する
+        
+        Returns:
+            bool: 更新した場合True
+        """
+    
+    @abstractmethod
+    def append_task_log(self, task_id: str, entry: Dict[str, Any], updated_at: str) -> bool:
+        """
+        タスクの処理ログ（processing_logs）に1件追加します。
+        
+        Args:
+            task_id: タスクID
+            entry: 追加するログ
+            updated_at: 更新日時
+        
+        Returns:
+            bool: 追加した場合True（タスクが存在しない場合はFalse）
+        """
+    
+    @abstractmethod
+    def list_tasks(self, columns: Sequence[str], limit: int, statuses: Optional[Sequence[str]] = None,
+                   after: Optional[Tuple[str, str]] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        タスクを (created_at, id) の降順で取得します。
+        
+        Args:
+            columns: 取得するカラム（'*' で全カラム）
+            limit: 取得する最大件数
+            statuses: フィルタするステータス
+            after: この (created_at, id) より後（古い側）のタスクだけを取得
+            offset: オフセット（afterを指定しない場合のみ使用）
+        
+        Returns:
+            List[Dict[str, Any]]: タスクの行
+        """
+    
+    @abstractmethod
+    def count_tasks(self, status: str) -> int:
+        """
+        指定したステータスのタスク数を取得します。
+        
+        Args:
+            status: ステータス
+        
+        Returns:
+            int: タスク数
+        """
+    
+    @abstractmethod
+    def save_results(self, task_id: str, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        タスクの検索結果を (task_id, platform, item_id) をキーに差分保存します。
+        
+        Args:
+            task_id: タスクID
+            rows: 保存する行（platform, item_id を含む）
+        
+        Returns:
+            Dict[str, int]: upserted, unchanged, deleted, failed
+        """
+    
+    @abstractmethod
+    def get_results(self, task_id: str, limit: int = 20, order_by: str = 'total_price') -> List[Dict[str, Any]]:
+        """
+        タスクの検索結果を取得します。
+        
+        Args:
+            task_id: タスクID
+            limit: 取得する最大件数
+            order_by: 並び順のカラム（昇順）
+        
+        Returns:
+            List[Dict[str, Any]]: 検索結果の行
+        """
+    
+    @abstractmethod
+    def save_result_blob(self, row: Dict[str, Any]) -> None:
+        """
+        圧縮したタスク結果を保存します。
+        
+        Args:
+            row: task_id, codec, payload, raw_size, stored_size, created_at
+        """
+    
+    @abstractmethod
+    def load_result_blob(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        圧縮したタスク結果を読み込みます。
+        
+        Args:
+            task_id: タスクID
+        
+        Returns:
+            Optional[Dict[str, Any]]: codec と payload（保存されていない場合はNone）
+        """
+    
+    @abstractmethod
+    def delete_result_blob(self, task_id: str) -> None:
+        """
+        圧縮したタスク結果を削除します（保存されていない場合は何もしない）。
+        
+        Args:
+            task_id: タスクID
+        """
+    
+    @abstractmethod
+    def delete_tasks_before(self, cutoff: datetime, batch_size: Optional[int] = None,
+                            max_batches: Optional[int] = None) -> int:
+        """
+        作成日時がカットオフより古いタスクを、検索結果と圧縮した結果も含めて一定件数ずつ削除します。
+        
+        Args:
+            cutoff: カットオフ日時
+            batch_size: 1回に削除する件数（省略時は RETENTION_BATCH_SIZE）
+            max_batches: 最大削除回数（省略時は全件削除するまで）
+        
+        Returns:
+            int: 削除したタスク数
+        """
+    
+    @abstractmethod
+    def delete_expired_results(self, now: datetime, batch_size: Optional[int] = None,
+                               max_batches: Optional[int] = None) -> int:
+        """
+        有効期限（expires_at）を過ぎた検索結果を一定件数ずつ削除します。
+        
+        Args:
+            now: 現在日時
+            batch_size: 1回に削除する件数（省略時は RETENTION_BATCH_SIZE）
+            max_batches: 最大削除回数（省略時は全件削除するまで）
+        
+        Returns:
+            int: 削除した件数
+        """
+    
+    @abstractmethod
+    def replace_cheapest_offers(self, jan_code: str, platform: str, offers: List[Dict[str, Any]],
+                                updated_at: str) -> None:
+        """
+        JANコード×プラットフォームの最安出品を置き換えます。
+        
+        Args:
+            jan_code: JANコード
+            platform: プラットフォーム名
+            offers: 安い順の出品（空の場合も検索日時の目印の行は残す）
+            updated_at: 検索した日時
+        """
+    
+    @abstractmethod
+    def get_cheapest_offers(self, jan_code: str, platforms: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        JANコードの最安出品を取得します。
+        
+        Args:
+            jan_code: JANコード
+            platforms: 対象プラットフォーム（省略時はすべて）
+        
+        Returns:
+            List[Dict[str, Any]]: 出品と検索日時の目印の行（rank, updated_at を含む）
+        """
+    
+    def claim_task(self, task_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        実行待ちのタスクを実行中にします（他のワーカーが先に取得した場合はFalse）。
+        
+        Args:
+            task_id: タスクID
+            fields: 更新するカラムと値（status を含む）
+        
+        Returns:
+            bool: 取得できた場合True
+        """
+        return self.update_task(task_id, fields, expected_status=('pending',))
+
+
+class SupabaseTaskStore(TaskStore):
+    """Supabase（PostgREST）に保存するバックエンド"""
+    
+    def __init__(self, client=None, tasks_table: str = 'search_tasks', results_table: str = SEARCH_RESULTS_TABLE):
+        """
+        初期化
+        
+        Args:
+            client: Supabaseクライアント（省略時は呼び出しのたびに共有クライアントを取得）
+            tasks_table: タスクのテーブル名
+            results_table: 検索結果のテーブル名
+        """
+        super().__init__(tasks_table, results_table)
+        self._client = client
+    
+    @property
+    def client(self):
+        """Supabaseクライアント（共有クライアントはリセット後に作り直されるため保持しない）"""
+        return self._client or get_supabase_client()
+    
+    def _execute(self, build_request):
+        """クライアントを渡してリクエストを実行する（共有クライアントの場合は再試行・再接続付き）"""
+        if self._client is not None:
+            return build_request(self._client)
+        return execute_with_client(build_request)
+    
+    def ensure_schema(self) -> None:
+        """タスクテーブルが存在することを確認し、なければ作成する"""
+        try:
+            # テーブルからデータを取得してみる（テーブルが存在するか確認するため）
+            self._execute(lambda client: client.table(self.tasks_table).select('id').limit(1).execute())
+            logger.info(f"{self.tasks_table}テーブルは既に存在します")
+        except Exception as e:
+            # テーブルが存在しない場合は作成する（search_tasksのみ）
+            if "relation" in str(e) and "does not exist" in str(e) and self.tasks_table == 'search_tasks':
+                logger.info("search_tasksテーブルが存在しないため、作成します")
+                
+                # テーブルを作成するためのスクリプトを実行
+                script_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+                                           'scripts', 'create_search_tasks_table_direct.py')
+                
+                result = subprocess.run(['python', script_path], capture_output=True, text=True)
+                
+                if result.returncode != 0:
+                    logger.error(f"テーブル作成に失敗しました: {result.stderr}")
+                    raise Exception(f"テーブル作成に失敗しました: {result.stderr}")
+                
+                logger.info("search_tasksテーブルが正常に作成されました")
+            else:
+                # その他のエラーの場合はそのまま例外を投げる
+                raise
+    
+    @staticmethod
+    def _check_error(result, message: str) -> None:
+        """レスポンスにエラーが含まれる場合は例外を投げる"""
+        if hasattr(result, 'error') and result.error:
+            raise Exception(f"{message}: {result.error}")
+    
+    def insert_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        result = self._execute(lambda client: client.table(self.tasks_table).insert(task).execute())
+        self._check_error(result, "Error creating task")
+        return result.data[0] if result.data else task
+    
+    def get_task(self, task_id: str, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        select = ','.join(columns) if columns else '*'
+        result = self._execute(lambda client: client.table(self.tasks_table).select(select).eq('id', task_id).execute())
+        return result.data[0] if result.data else None
+    
+    def update_task(self, task_id: str, fields: Dict[str, Any],
+                    expected_status: Optional[Sequence[str]] = None) -> bool:
+        def request(client):
+            query = client.table(self.tasks_table).update(fields).eq('id', task_id)
+            if expected_status:
+                query = query.in_('status', list(expected_status))
+            return query.execute()
+        
+        result = self._execute(request)
+        self._check_error(result, f"Error updating task {task_id}")
+        # 条件付き更新では、更新された行が返らなければ他のワーカーが先に更新している
+        return bool(result.data) if expected_status else True
+    
+    def append_task_log(self, task_id: str, entry: Dict[str, Any], updated_at: str) -> bool:
+        # 現在の処理ログだけを取得して追加する
+        task = self.get_task(task_id, columns=('id', 'processing_logs'))
+        if not task:
+            return False
+        
+        logs = task.get('processing_logs') or []
+        if isinstance(logs, str):
+            logs = json.loads(logs)
+        logs.append(entry)
+        
+        return self.update_task(task_id, {'processing_logs': json.dumps(logs), 'updated_at': updated_at})
+    
+    def list_tasks(self, columns: Sequence[str], limit: int, statuses: Optional[Sequence[str]] = None,
+                   after: Optional[Tuple[str, str]] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        def request(client):
+            query = client.table(self.tasks_table).select(','.join(columns)) \
+                .order('created_at', desc=True).order('id', desc=True).limit(limit)
+            
+            if after:
+                created_at, task_id = after
+                query = query.or_(
+                    f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{task_id})'
+                )
+            elif offset:
+                query = query.offset(offset)
+            
+            if statuses:
+                query = query.in_('status', list(statuses)) if len(statuses) > 1 else query.eq('status', statuses[0])
+            return query.execute()
+        
+        return self._execute(request).data or []
+    
+    def count_tasks(self, status: str) -> int:
+        result = self._execute(
+            lambda client: client.table(self.tasks_table).select('id', count='exact').eq('status', status).execute()
+        )
+        return result.count if hasattr(result, 'count') and result.count is not None else 0
+    
+    def save_results(self, task_id: str, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        return save_task_results(self.client, task_id, rows)
+    
+    def get_results(self, task_id: str, limit: int = 20, order_by: str = 'total_price') -> List[Dict[str, Any]]:
+        result = self._execute(
+            lambda client: client.table(self.results_table).select('*').eq('task_id', task_id)
+            .order(order_by).limit(limit).execute()
+        )
+        return result.data or []
+    
+    def save_result_blob(self, row: Dict[str, Any]) -> None:
+        self._execute(lambda client: client.table(RESULT_BLOB_TABLE).upsert(row, on_conflict='task_id').execute())
+    
+    def load_result_blob(self, task_id: str) -> Optional[Dict[str, Any]]:
+        response = self._execute(
+            lambda client: client.table(RESULT_BLOB_TABLE).select('codec,payload')
+            .eq('task_id', task_id).limit(1).execute()
+        )
+        return response.data[0] if response.data else None
+    
+    def delete_result_blob(self, task_id: str) -> None:
+        self._execute(lambda client: client.table(RESULT_BLOB_TABLE).delete().eq('task_id', task_id).execute())
+    
+    def replace_cheapest_offers(self, jan_code: str, platform: str, offers: List[Dict[str, Any]],
+                                updated_at: str) -> None:
+        rows = [dict(row, jan_code=jan_code, platform=platform, updated_at=updated_at)
+                for row in ranked_offer_rows(offers)]
+        self._execute(
+            lambda client: client.table(CHEAPEST_OFFERS_TABLE).upsert(rows, on_conflict='jan_code,platform,rank').execute()
+        )
+        # 前回より件数が減った分を削除
+        self._execute(
+            lambda client: client.table(CHEAPEST_OFFERS_TABLE).delete().eq('jan_code', jan_code)
+            .eq('platform', platform).gt('rank', len(offers)).execute()
+        )
+    
+    def get_cheapest_offers(self, jan_code: str, platforms: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        def request(client):
+            query = client.table(CHEAPEST_OFFERS_TABLE).select('*').eq('jan_code', jan_code)
+            if platforms:
+                query = query.in_('platform', list(platforms))
+            return query.order('total_price').execute()
+        
+        return self._execute(request).data or []
+    
+    def delete_tasks_before(self, cutoff: datetime, batch_size: Optional[int] = None,
+                            max_batches: Optional[int] = None) -> int:
+        # ON DELETE CASCADE で1回の削除が大きくならないよう、先に同じ期間の結果を削除する
+        # search_task_results は id 列を持たず task_id が主キー
+        for table, id_column in ((self.results_table, 'id'), (RESULT_BLOB_TABLE, 'task_id')):
+            RetentionJob(table, 'created_at', id_column=id_column, batch_size=batch_size) \
+                .run(cutoff, max_batches=max_batches)
+        
+        retention = RetentionJob(self.tasks_table, 'created_at', batch_size=batch_size) \
+            .run(cutoff, max_batches=max_batches)
+        return retention['deleted']
+    
+    def delete_expired_results(self, now: datetime, batch_size: Optional[int] = None,
+                               max_batches: Optional[int] = None) -> int:
+        retention = RetentionJob(self.results_table, 'expires_at', batch_size=batch_size) \
+            .run(now, max_batches=max_batches)
+        return retention['deleted']
+
+
+# シングルトンインスタンス（タスクテーブルごと）
+_task_stores: Dict[str, TaskStore] = {}
+_task_stores_lock = threading.Lock()
+
+
+def create_task_store(backend: str, tasks_table: str = 'search_tasks',
+                      results_table: str = SEARCH_RESULTS_TABLE) -> TaskStore:
+    """
+    バックエンドを指定してタスクの保存先を作成します。
+    
+    Args:
+        backend: 'supabase' または 'sqlite'
+        tasks_table: タスクのテーブル名
+        results_table: 検索結果のテーブル名
+    
+    Returns:
+        TaskStore: タスクの保存先
+    
+    Raises:
+        ValueError: 未対応のバックエンドの場合
+    """
+    backend = backend.lower()
+    if backend == 'supabase':
+        return SupabaseTaskStore(tasks_table=tasks_table, results_table=results_table)
+    if backend == 'sqlite':
+        from src.search.sqlite_task_store import SQLiteTaskStore
+        path = get_optional_config("TASK_STORE_SQLITE_PATH", "search_tasks.sqlite3")
+        return SQLiteTaskStore(path, tasks_table=tasks_table, results_table=results_table)
+    raise ValueError(f"未対応のタスク保存先です: {backend}")
+
+
+def get_task_store(tasks_table: str = 'search_tasks', results_table: str = SEARCH_RESULTS_TABLE) -> TaskStore:
+    """
+    共有のタスク保存先を取得します（TASK_STORE_BACKEND で選択、既定は supabase）。
+    
+    Args:
+        tasks_table: タスクのテーブル名
+        results_table: 検索結果のテーブル名
+    
+    Returns:
+        TaskStore: タスクの保存先
+    """
+    key = f"{tasks_table}:{results_table}"
+    if key not in _task_stores:
+        with _task_stores_lock:
+            if key not in _task_stores:
+                backend = get_optional_config("TASK_STORE_BACKEND", "supabase")
+                store = create_task_store(backend, tasks_table, results_table)
+                store.ensure_schema()
+                _task_stores[key] = store
+                logger.info(f"Using {backend} task store for {tasks_table}")
+    return _task_stores[key]
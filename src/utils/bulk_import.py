@@ -0,0 +1,506 @@
+"""
+一括インポートユーティリティ
+コレクターが出力したJSON配列／NDJSONファイルをストリーミングで読み込み、
+バッチ単位で並列にデータベースへ書き込みます。書き込みは常にパラメータ化されたリクエストで行い、
+完了した位置をチェックポイントファイルに記録するため、途中で失敗しても続きから再開できます。
+
+書き込み先は SUPABASE_DB_URL（PostgreSQL接続文字列）が設定されていて psycopg2 が利用できる場合は
+複数行INSERT（execute_values）、それ以外の場合は Supabase（PostgREST）の一括upsertです。
+"""
+
+import os
+import json
+import time
+import itertools
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, List, Any, Callable, Iterator, Optional, TextIO, Tuple
+
+from .config import get_optional_config
+from .supabase_client import execute_with_client
+
+try:
+    import psycopg2
+    from psycopg2 import sql as psycopg2_sql
+    from psycopg2.extras import execute_values, Json
+except ImportError:  # PostgREST経由でのみ書き込む
+    psycopg2 = None
+
+logger = logging.getLogger(__name__)
+
+# NDJSONとして扱う拡張子
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+
+def iter_json_records(path: str, chunk_size: int = 65536) -> Iterator[Dict[str, Any]]:
+    """
+    JSON配列またはNDJSONファイルからレコードを1件ずつ読み込みます（ファイル全体をメモリに載せない）。
+    
+    Args:
+        path: 入力ファイルのパス
+        chunk_size: 一度に読み込む文字数
+    
+    Yields:
+        Dict[str, Any]: レコード
+    
+    Raises:
+        ValueError: JSONとして解析できない場合
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(chunk_size)
+        stripped = head.lstrip()
+        
+        if path.endswith(NDJSON_EXTENSIONS) or not stripped.startswith('['):
+            # NDJSON（1行1レコード）
+            f.seek(0)
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number}: JSONの解析に失敗しました: {e}") from e
+            return
+        
+        # JSON配列を要素ごとに解析
+        decoder = json.JSONDecoder()
+        buffer = stripped[1:]
+        position = 0
+        eof = False
+        after_value = False  # 直前に要素を読み終えた（次は「,」か「]」）
+        after_comma = False  # 直前に「,」を読んだ（次は要素）
+        while True:
+            # 空白を読み飛ばす
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            
+            if position >= len(buffer):
+                if eof:
+                    raise ValueError(f"{path}: JSON配列が途中で終わっています")
+                buffer = f.read(chunk_size)
+                position = 0
+                eof = not buffer
+                continue
+            
+            char = buffer[position]
+            if char == ']':
+                if after_comma:
+                    raise ValueError(f"{path}: JSONの解析に失敗しました: 配列の末尾に余分な「,」があります")
+                _check_trailing(path, f, buffer[position + 1:], chunk_size)
+                return
+            if char == ',':
+                if not after_value:
+                    raise ValueError(f"{path}: JSONの解析に失敗しました: 配列に空の要素があります")
+                position += 1
+                after_value = False
+                after_comma = True
+                continue
+            if after_value:
+                raise ValueError(f"{path}: JSONの解析に失敗しました: 値の後に予期しない文字があります: {char!r}")
+            
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"{path}: JSONの解析に失敗しました: {e}") from e
+                record, end = None, None
+            
+            # 値の後に区切り文字か配列の終わりが読み込まれるまでは、数値などの続きが
+            # まだ読み込まれていない可能性があるため読み足す（例: "12" や "12." の後の ".5" や "5"）
+            following = end if end is not None else len(buffer)
+            while following < len(buffer) and buffer[following] in ' \t\r\n':
+                following += 1
+            complete = following < len(buffer) and buffer[following] in ',]'
+            if not complete and not eof:
+                more = f.read(chunk_size)
+                if not more:
+                    eof = True
+                buffer = buffer[position:] + more
+                position = 0
+                continue
+            
+            if not complete and following < len(buffer):
+                raise ValueError(f"{path}: JSONの解析に失敗しました: 値の後に予期しない文字があります: {buffer[following]!r}")
+            
+            yield record
+            position = end
+            after_value = True
+            after_comma = False
+            
+            # 読み終えた部分を定期的に捨てる
+            if position > chunk_size:
+                buffer = buffer[position:]
+                position = 0
+
+
+def _check_trailing(path: str, f: TextIO, rest: str, chunk_size: int) -> None:
+    """JSON配列の「]」より後に空白以外の文字がないことを確認する"""
+    while True:
+        if rest.strip():
+            raise ValueError(f"{path}: JSONの解析に失敗しました: 配列の後に予期しない文字があります: {rest.strip()[0]!r}")
+        rest = f.read(chunk_size)
+        if not rest:
+            return
+
+
+class ImportCheckpoint:
+    """一括インポートの進捗（完了したレコード数）を記録するファイル"""
+    
+    def __init__(self, path: str, source: str, table: str):
+        """
+        初期化
+        
+        Args:
+            path: チェックポイントファイルのパス
+            source: 入力ファイルのパス
+            table: 書き込み先テーブル名
+        """
+        self.path = path
+        self.source = source
+        self.table = table
+        self.offset = 0
+        self.written = 0
+        self.completed = False
+        self._source_size = os.path.getsize(source) if os.path.exists(source) else None
+    
+    def load(self) -> bool:
+        """
+        チェックポイントを読み込みます（入力ファイルや書き込み先が異なる場合は無視）。
+        
+        Returns:
+            bool: 再開可能なチェックポイントを読み込んだ場合True
+        """
+        if not os.path.exists(self.path):
+            return False
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"チェックポイントの読み込みに失敗しました: {e}")
+            return False
+        
+        if (data.get('source') != os.path.abspath(self.source) or data.get('table') != self.table
+                or data.get('source_size') != self._source_size):
+            logger.warning("チェックポイントが現在の入力ファイルと一致しないため、最初からインポートします")
+            return False
+        
+        self.offset = int(data.get('offset', 0))
+        self.written = int(data.get('written', 0))
+        self.completed = bool(data.get('completed', False))
+        return True
+    
+    def save(self) -> None:
+        """チェックポイントを保存します（一時ファイル経由で置き換え）。"""
+        data = {
+            'source': os.path.abspath(self.source),
+            'source_size': self._source_size,
+            'table': self.table,
+            'offset': self.offset,
+            'written': self.written,
+            'completed': self.completed,
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+class PostgrestBatchWriter:
+    """Supabase（PostgREST）の一括insert/upsertで書き込む"""
+    
+    def __init__(self, table: str, conflict_column: Optional[str] = None, update_existing: bool = False):
+        """
+        初期化
+        
+        Args:
+            table: 書き込み先テーブル名
+            conflict_column: 一意制約のある列（指定した場合は重複をスキップまたは更新）
+            update_existing: Trueの場合、重複した行を更新
+        """
+        self.table = table
+        self.conflict_column = conflict_column
+        self.update_existing = update_existing
+    
+    def write(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        バッチを書き込みます。
+        
+        Args:
+            rows: 書き込む行
+        
+        Returns:
+            int: 書き込まれた行数
+        """
+        if self.conflict_column:
+            request = lambda client: client.table(self.table).upsert(
+                rows, on_conflict=self.conflict_column, ignore_duplicates=not self.update_existing
+            ).execute()
+        else:
+            request = lambda client: client.table(self.table).insert(rows).execute()
+        
+        result = execute_with_client(request)
+        return len(result.data) if result.data is not None else len(rows)
+
+
+class PostgresBatchWriter:
+    """PostgreSQLへ直接、パラメータ化された複数行INSERTで書き込む"""
+    
+    def __init__(self, dsn: str, table: str, conflict_column: Optional[str] = None, update_existing: bool = False):
+        """
+        初期化
+        
+        Args:
+            dsn: PostgreSQL接続文字列
+            table: 書き込み先テーブル名
+            conflict_column: 一意制約のある列（指定した場合は重複をスキップまたは更新）
+            update_existing: Trueの場合、重複した行を更新
+        """
+        if psycopg2 is None:
+            raise RuntimeError("psycopg2がインストールされていません")
+        
+        self.dsn = dsn
+        self.table = table
+        self.conflict_column = conflict_column
+        self.update_existing = update_existing
+        self._local = threading.local()
+        self._connections: List[Any] = []
+        self._connections_lock = threading.Lock()
+    
+    def _connect(self):
+        """スレッドごとの接続を取得"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or connection.closed:
+            connection = psycopg2.connect(self.dsn)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+    
+    def _build_query(self, columns: List[str]):
+        """INSERT文を組み立てる（識別子はクォートし、値はプレースホルダで渡す）"""
+        query = psycopg2_sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+            psycopg2_sql.Identifier(self.table),
+            psycopg2_sql.SQL(', ').join(map(psycopg2_sql.Identifier, columns))
+        )
+        if not self.conflict_column:
+            return query
+        
+        conflict = psycopg2_sql.Identifier(self.conflict_column)
+        updates = [column for column in columns if column != self.conflict_column]
+        if self.update_existing and updates:
+            return query + psycopg2_sql.SQL(" ON CONFLICT ({}) DO UPDATE SET {}").format(
+                conflict,
+                psycopg2_sql.SQL(', ').join(
+                    psycopg2_sql.SQL("{0} = EXCLUDED.{0}").format(psycopg2_sql.Identifier(column))
+                    for column in updates
+                )
+            )
+        return query + psycopg2_sql.SQL(" ON CONFLICT ({}) DO NOTHING").format(conflict)
+    
+    def write(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        バッチを1トランザクションで書き込みます。
+        列の組み合わせが同じ行ごとにINSERTするため、行にない列はNULLではなく列の既定値になり、
+        既存の行を更新する場合もその列は変更しません。
+        
+        Args:
+            rows: 書き込む行
+        
+        Returns:
+            int: 書き込まれた行数
+        """
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        
+        connection = self._connect()
+        try:
+            written = 0
+            with connection.cursor() as cursor:
+                for columns, group in groups.items():
+                    values = [
+                        tuple(Json(row[column]) if isinstance(row[column], (dict, list)) else row[column]
+                              for column in columns)
+                        for row in group
+                    ]
+                    execute_values(cursor, self._build_query(list(columns)), values, page_size=len(values))
+                    written += cursor.rowcount
+            connection.commit()
+            return written
+        except Exception:
+            connection.rollback()
+            raise
+    
+    def close(self) -> None:
+        """すべての接続を閉じます。"""
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+class BulkImporter:
+    """JSON/NDJSONファイルをバッチ単位で並列に書き込む一括インポーター"""
+    
+    def __init__(self, table: str, conflict_column: Optional[str] = None, update_existing: bool = False,
+                 columns: Optional[List[str]] = None,
+                 transform: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None,
+                 batch_size: Optional[int] = None, max_workers: Optional[int] = None,
+                 dsn: Optional[str] = None):
+        """
+        初期化
+        
+        Args:
+            table: 書き込み先テーブル名
+            conflict_column: 一意制約のある列（指定しない場合、再開時に重複行ができる可能性がある）
+            update_existing: Trueの場合、重複した行を更新（Falseの場合はスキップ）
+            columns: 書き込む列（指定した場合、レコードをこの列だけに絞り込む）
+            transform: レコードを行に変換する関数（Noneを返したレコードはスキップ）
+            batch_size: 1バッチの件数（省略時は BULK_IMPORT_BATCH_SIZE）
+            max_workers: 同時に書き込むバッチ数（省略時は BULK_IMPORT_MAX_WORKERS）
+            dsn: PostgreSQL接続文字列（省略時は SUPABASE_DB_URL、未設定ならPostgREST経由）
+        """
+        self.table = table
+        self.conflict_column = conflict_column
+        self.columns = columns
+        self.transform = transform
+        self.batch_size = batch_size or int(get_optional_config("BULK_IMPORT_BATCH_SIZE", "500"))
+        self.max_workers = max_workers or int(get_optional_config("BULK_IMPORT_MAX_WORKERS", "4"))
+        
+        dsn = dsn or get_optional_config("SUPABASE_DB_URL", "")
+        if dsn and psycopg2 is not None:
+            self.writer = PostgresBatchWriter(dsn, table, conflict_column, update_existing)
+        else:
+            if dsn:
+                logger.warning("psycopg2が利用できないため、PostgREST経由でインポートします")
+            self.writer = PostgrestBatchWriter(table, conflict_column, update_existing)
+    
+    def _prepare(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """レコードを書き込む行に変換する"""
+        if self.transform is not None:
+            record = self.transform(record)
+            if record is None:
+                return None
+        if self.columns is not None:
+            record = {column: record.get(column) for column in self.columns}
+        return record
+    
+    def _iter_batches(self, records: Iterator[Dict[str, Any]]) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """(バッチ内のレコード数, 書き込む行) を順に返す"""
+        while True:
+            chunk = list(itertools.islice(records, self.batch_size))
+            if not chunk:
+                return
+            rows = [row for row in (self._prepare(record) for record in chunk) if row is not None]
+            yield len(chunk), rows
+    
+    def run(self, path: str, checkpoint_path: Optional[str] = None, restart: bool = False) -> Dict[str, Any]:
+        """
+        ファイルをインポートします。チェックポイントがある場合は続きから再開します。
+        
+        Args:
+            path: 入力ファイル（JSON配列またはNDJSON）のパス
+            checkpoint_path: チェックポイントファイルのパス（省略時は「入力ファイル.checkpoint.json」）
+            restart: Trueの場合、チェックポイントを無視して最初からインポート
+        
+        Returns:
+            Dict[str, Any]: インポート結果（status, read, written, resumed_from, failed_batches, elapsed など）
+        """
+        start_time = time.time()
+        checkpoint = ImportCheckpoint(checkpoint_path or f"{path}.checkpoint.json", path, self.table)
+        if not restart and checkpoint.load():
+            if checkpoint.completed:
+                logger.info(f"{path} はインポート済みです（最初からやり直す場合はrestartを指定）")
+                return {'status': 'success', 'read': 0, 'written': 0, 'resumed_from': checkpoint.offset,
+                        'failed_batches': 0, 'elapsed': 0.0, 'message': 'インポート済みです'}
+            logger.info(f"チェックポイントから再開します: {checkpoint.offset}件目から")
+        else:
+            checkpoint.offset = 0
+            checkpoint.written = 0
+            checkpoint.completed = False
+        
+        resumed_from = checkpoint.offset
+        records = itertools.islice(iter_json_records(path), resumed_from, None)
+        
+        in_flight: Dict[Future, int] = {}  # Future -> バッチ番号
+        batch_sizes: Dict[int, int] = {}  # バッチ番号 -> レコード数
+        finished: Dict[int, Tuple[int, int]] = {}  # 書き込み済みでチェックポイントに未反映のバッチ -> (レコード数, 書き込み行数)
+        next_batch = 0
+        read = 0
+        failed_batches = 0
+        first_error: Optional[Exception] = None
+        
+        def collect(done) -> None:
+            nonlocal next_batch, failed_batches, first_error
+            for future in done:
+                batch_number = in_flight.pop(future)
+                try:
+                    finished[batch_number] = (batch_sizes.pop(batch_number), future.result())
+                except Exception as e:
+                    failed_batches += 1
+                    first_error = first_error or e
+                    logger.error(f"バッチ {batch_number + 1} の書き込みに失敗しました: {e}")
+            
+            # 先頭から連続して完了したバッチまでをチェックポイントに反映（書き込み行数も位置と一緒に
+            # 記録する。位置より後のバッチは再開時に再送されるため、ここで数えると二重に数えてしまう）
+            advanced = False
+            while next_batch in finished:
+                size, written = finished.pop(next_batch)
+                checkpoint.offset += size
+                checkpoint.written += written
+                next_batch += 1
+                advanced = True
+            if advanced:
+                checkpoint.save()
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bulk-import")
+        try:
+            for batch_number, (size, rows) in enumerate(self._iter_batches(records)):
+                if first_error is not None:
+                    break
+                
+                # 書き込み待ちのバッチ数を制限してメモリ使用量を抑える
+                while len(in_flight) >= self.max_workers * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                
+                read += size
+                batch_sizes[batch_number] = size
+                if rows:
+                    in_flight[executor.submit(self.writer.write, rows)] = batch_number
+                else:
+                    finished[batch_number] = (batch_sizes.pop(batch_number), 0)
+                    collect([])
+            
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        finally:
+            executor.shutdown(wait=True)
+            if isinstance(self.writer, PostgresBatchWriter):
+                self.writer.close()
+        
+        checkpoint.completed = first_error is None
+        checkpoint.save()
+        
+        elapsed = round(time.time() - start_time, 2)
+        result = {
+            'status': 'success' if first_error is None else 'error',
+            'read': read,
+            'written': checkpoint.written,
+            'resumed_from': resumed_from,
+            'offset': checkpoint.offset,
+            'failed_batches': failed_batches,
+            'elapsed': elapsed,
+            'checkpoint': checkpoint.path
+        }
+        if first_error is not None:
+            result['message'] = f"インポートを中断しました（{checkpoint.offset}件目まで完了）: {first_error}"
+        else:
+            result['message'] = f"{read}件を読み込み、{checkpoint.written}件を書き込みました（{elapsed}秒）"
+        logger.info(result['message'])
+        return result
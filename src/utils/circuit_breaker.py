@@ -0,0 +1,266 @@
+"""
+サーキットブレーカーユーティリティ
+プラットフォームごとに直近のエラー率と応答時間を監視し、障害中のプラットフォームへの
+リクエストを即座に遮断します。一定時間後にハーフオープン状態で試行リクエストを通し、回復を確認します。
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+from enum import Enum
+from typing import Dict, Any
+
+from .config import get_optional_config
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """サーキットブレーカーの状態を表す列挙型"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているためリクエストを遮断したことを示す例外"""
+    
+    def __init__(self, name: str, retry_in: float = 0.0):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"Circuit breaker '{name}' is open (retry in {retry_in:.0f}s)")
+
+
+class CircuitBreaker:
+    """直近の呼び出し結果に基づくサーキットブレーカー"""
+    
+    def __init__(self, name: str, window_seconds: float = 60.0, min_calls: int = 5,
+                 failure_rate_threshold: float = 0.5, slow_call_seconds: float = 10.0,
+                 slow_call_rate_threshold: float = 0.8, open_seconds: float = 30.0,
+                 half_open_max_calls: int = 1):
+        """
+        初期化
+        
+        Args:
+            name: ブレーカー名（プラットフォーム名）
+            window_seconds: エラー率を集計する期間（秒）
+            min_calls: 判定に必要な最小呼び出し数
+            failure_rate_threshold: 開放するエラー率の閾値（0.0-1.0）
+            slow_call_seconds: 低速呼び出しとみなす応答時間（秒）
+            slow_call_rate_threshold: 開放する低速呼び出し率の閾値（0.0-1.0）
+            open_seconds: 開放状態を維持する時間（秒）
+            half_open_max_calls: ハーフオープン時に許可する試行リクエスト数
+        """
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._calls = deque()  # (timestamp, success, latency)
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> CircuitState:
+        """現在の状態（開放時間を過ぎていればハーフオープンとして扱う）"""
+        with self._lock:
+            return self._current_state()
+    
+    def _current_state(self) -> CircuitState:
+        """ロック取得済みの状態で現在の状態を返す"""
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+            logger.info(f"サーキットブレーカー '{self.name}' をハーフオープンに移行しました")
+        return self._state
+    
+    def is_open(self) -> bool:
+        """
+        リクエストを遮断中かどうかを返します（試行枠は消費しない）。
+        
+        Returns:
+            bool: 開放中の場合True
+        """
+        return self.state == CircuitState.OPEN
+    
+    def allow_request(self) -> bool:
+        """
+        リクエストを許可するかどうかを判定します。
+        ハーフオープン時は試行リクエストの枠を消費します。
+        
+        Returns:
+            bool: リクエストを許可する場合True
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return True
+            if state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+    
+    def retry_in(self) -> float:
+        """開放状態が解除されるまでの残り秒数"""
+        with self._lock:
+            if self._state != CircuitState.OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+    
+    def record_success(self, latency: float = 0.0) -> None:
+        """
+        呼び出し成功を記録します。
+        
+        Args:
+            latency: 応答時間（秒）
+        """
+        self._record(True, latency)
+    
+    def record_failure(self, latency: float = 0.0) -> None:
+        """
+        呼び出し失敗を記録します。
+        
+        Args:
+            latency: 応答時間（秒）
+        """
+        self._record(False, latency)
+    
+    def _record(self, success: bool, latency: float) -> None:
+        """呼び出し結果を記録し、状態を更新する"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state()
+            
+            if state == CircuitState.HALF_OPEN:
+                slow = latency >= self.slow_call_seconds
+                if success and not slow:
+                    self._close()
+                else:
+                    self._open(now, "試行リクエストが失敗しました")
+                return
+            
+            self._calls.append((now, success, latency))
+            while self._calls and now - self._calls[0][0] > self.window_seconds:
+                self._calls.popleft()
+            
+            if state != CircuitState.CLOSED or len(self._calls) < self.min_calls:
+                return
+            
+            total = len(self._calls)
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            slow_calls = sum(1 for _, _, elapsed in self._calls if elapsed >= self.slow_call_seconds)
+            
+            if failures / total >= self.failure_rate_threshold:
+                self._open(now, f"エラー率 {failures}/{total}")
+            elif slow_calls / total >= self.slow_call_rate_threshold:
+                self._open(now, f"低速呼び出し率 {slow_calls}/{total}")
+    
+    def _open(self, now: float, reason: str) -> None:
+        """ブレーカーを開放する"""
+        self._state = CircuitState.OPEN
+        self._opened_at = now
+        self._half_open_calls = 0
+        logger.warning(f"サーキットブレーカー '{self.name}' を開放しました（{reason}）。{self.open_seconds:.0f}秒間リクエストを遮断します")
+    
+    def _close(self) -> None:
+        """ブレーカーを閉じ、集計をリセットする"""
+        self._state = CircuitState.CLOSED
+        self._calls.clear()
+        self._half_open_calls = 0
+        logger.info(f"サーキットブレーカー '{self.name}' を閉じました（回復を確認）")
+    
+    def sync_status(self, status: Dict[str, Any]) -> None:
+        """
+        別プロセス（ワーカープロセス）のブレーカーの状態を反映します。
+        相手が開放中でこちらが閉じている場合、残り時間だけ開放状態にします。
+        
+        Args:
+            status: 相手のブレーカーの get_status() の結果
+        """
+        if not status or status.get('state') != CircuitState.OPEN.value:
+            return
+        
+        with self._lock:
+            if self._current_state() == CircuitState.OPEN:
+                return
+            retry_in = min(self.open_seconds, float(status.get('retry_in') or 0.0))
+            self._open(time.monotonic() - (self.open_seconds - retry_in), "ワーカープロセスで開放されました")
+    
+    def reset(self) -> None:
+        """ブレーカーを初期状態に戻します。"""
+        with self._lock:
+            self._close()
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        ブレーカーの状態情報を取得します。
+        
+        Returns:
+            Dict[str, Any]: 状態情報
+        """
+        with self._lock:
+            state = self._current_state()
+            total = len(self._calls)
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            return {
+                'name': self.name,
+                'state': state.value,
+                'calls': total,
+                'failure_rate': round(failures / total, 3) if total else 0.0,
+                'retry_in': round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1) if state == CircuitState.OPEN else 0.0
+            }
+
+
+# プラットフォーム別ブレーカーのレジストリ
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """
+    プラットフォーム名に対応するCircuitBreakerを取得します（プロセス内で共有）。
+    閾値は CIRCUIT_BREAKER_{NAME}_* または CIRCUIT_BREAKER_* 環境変数で調整できます。
+    
+    Args:
+        name: プラットフォーム名（例: 'ebay', 'mercari', 'yahoo_shopping'）
+    
+    Returns:
+        CircuitBreaker: サーキットブレーカー
+    """
+    breaker = _circuit_breakers.get(name)
+    if breaker is not None:
+        return breaker
+    
+    with _registry_lock:
+        if name not in _circuit_breakers:
+            def setting(key: str, default: str) -> str:
+                return get_optional_config(f"CIRCUIT_BREAKER_{name.upper()}_{key}",
+                                           get_optional_config(f"CIRCUIT_BREAKER_{key}", default))
+            
+            _circuit_breakers[name] = CircuitBreaker(
+                name,
+                window_seconds=float(setting("WINDOW_SECONDS", "60")),
+                min_calls=int(setting("MIN_CALLS", "5")),
+                failure_rate_threshold=float(setting("FAILURE_RATE", "0.5")),
+                slow_call_seconds=float(setting("SLOW_CALL_SECONDS", "10")),
+                slow_call_rate_threshold=float(setting("SLOW_CALL_RATE", "0.8")),
+                open_seconds=float(setting("OPEN_SECONDS", "30")),
+            )
+        return _circuit_breakers[name]
+
+
+def get_all_circuit_breaker_status() -> Dict[str, Dict[str, Any]]:
+    """
+    登録済みの全ブレーカーの状態を取得します。
+    
+    Returns:
+        Dict[str, Dict[str, Any]]: ブレーカー名 -> 状態情報
+    """
+    return {name: breaker.get_status() for name, breaker in list(_circuit_breakers.items())}
@@ -1,18 +1,25 @@
 """
 為替レート取得モジュール
 ExchangeRate-APIからリアルタイムの為替レートを取得し、キャッシュ機能を提供します。
+1回のAPI取得で全通貨のレート表をプロセス内メモリに保持し、ファイルキャッシュはプロセス間で共有します。
 """
 
 import json
 import os
-import time
+import tempfile
+import threading
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Sequence
 from datetime import datetime, timedelta
 import requests
 
 from .config import get_config
 
+try:
+    import fcntl
+except ImportError:  # Windowsなど
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,8 +32,16 @@ class ExchangeRateClient:
         """
         self.api_key = get_config("EXCHANGE_RATE_API_KEY", "")
         self.cache_duration_hours = int(get_config("EXCHANGE_RATE_CACHE_HOURS", "24"))
-        self.cache_file = "exchange_rate_cache.json"
-        self.fallback_rate = 150.0  # API障害時のフォールバックレート
+        self.cache_file = get_config("EXCHANGE_RATE_CACHE_FILE", "exchange_rate_cache.json")
+        self.fallback_rate = 150.0  # API障害時のフォールバックレート（USD→JPY）
+        
+        # プロセス内レート表（基準通貨USD）
+        self._rates: Dict[str, float] = {}
+        self._rates_timestamp: Optional[datetime] = None
+        self._rates_expiry: Optional[datetime] = None
+        self._retry_after: Optional[datetime] = None
+        self.retry_interval_minutes = 5  # 取得失敗後に再取得を控える時間
+        self._lock = threading.Lock()
         
         # APIエンドポイント（無料版と有料版に対応）
         if self.api_key:
@@ -38,63 +53,204 @@ class ExchangeRateClient:
     def get_usd_to_jpy_rate(self) -> float:
         """
         USD to JPYの為替レートを取得します。
-        キャッシュがある場合はキャッシュから、ない場合はAPIから取得します。
+        メモリ上のレート表、キャッシュファイル、APIの順に参照します。
         
         Returns:
             float: USD to JPYの為替レート
         """
-        # キャッシュから取得を試行
-        cached_rate = self._get_cached_rate()
-        if cached_rate is not None:
-            logger.info(f"キャッシュから為替レートを取得: {cached_rate}")
-            return cached_rate
+        rate = self.get_rate('USD', 'JPY')
+        if rate is None:
+            logger.warning(f"API取得に失敗、フォールバックレートを使用: {self.fallback_rate}")
+            return self.fallback_rate
+        return rate
+    
+    def get_rates(self) -> Dict[str, float]:
+        """
+        USD基準の全通貨レート表を取得します。
+        有効なレート表がメモリ上にある場合はファイルI/Oを行いません。
+        
+        Returns:
+            Dict[str, float]: 通貨コード -> 1 USDあたりのレート（取得失敗時は空）
+        """
+        if self._rates and datetime.now() < self._rates_expiry:
+            return self._rates
+        
+        # 直近の取得失敗後はAPIやファイルを叩き続けない
+        if self._retry_after and datetime.now() < self._retry_after:
+            return self._rates
+        
+        with self._lock:
+            # 他スレッドが更新済みの場合
+            if self._rates and datetime.now() < self._rates_expiry:
+                return self._rates
+            
+            # キャッシュファイルから取得を試行
+            if self._load_cached_rates():
+                logger.info(f"キャッシュから為替レート表を取得: {len(self._rates)}通貨")
+                return self._rates
+            
+            # APIから取得（プロセス間ロックで同時更新を防止）
+            with self._file_lock():
+                # ロック待ちの間に他プロセスが更新した可能性がある
+                if self._load_cached_rates():
+                    return self._rates
+                
+                api_rates = self._fetch_rates_from_api()
+                if api_rates:
+                    self._set_rates(api_rates, datetime.now())
+                    self._save_to_cache(api_rates)
+                    logger.info(f"APIから為替レート表を取得: {len(api_rates)}通貨")
+                    return self._rates
+            
+            self._retry_after = datetime.now() + timedelta(minutes=self.retry_interval_minutes)
+        
+        # 期限切れでも既存のレート表があれば使用
+        if self._rates:
+            logger.warning("為替レートの更新に失敗、期限切れのレート表を使用します")
+        return self._rates
+    
+    def get_rate(self, from_currency: str, to_currency: str = 'JPY') -> Optional[float]:
+        """
+        通貨間の為替レートを取得します。
+        
+        Args:
+            from_currency: 変換元の通貨コード
+            to_currency: 変換先の通貨コード
+        
+        Returns:
+            Optional[float]: 1 from_currency あたりの to_currency（不明な通貨の場合はNone）
+        """
+        from_currency = (from_currency or '').upper()
+        to_currency = (to_currency or '').upper()
+        if from_currency == to_currency:
+            return 1.0
+        
+        rates = self.get_rates()
+        if from_currency not in rates or to_currency not in rates or not rates[from_currency]:
+            return None
+        return rates[to_currency] / rates[from_currency]
+    
+    def convert(self, amount: float, from_currency: str, to_currency: str = 'JPY') -> Optional[float]:
+        """
+        金額を別の通貨に換算します。
         
-        # APIから取得
-        api_rate = self._fetch_rate_from_api()
-        if api_rate is not None:
-            # キャッシュに保存
-            self._save_to_cache(api_rate)
-            logger.info(f"APIから為替レートを取得: {api_rate}")
-            return api_rate
+        Args:
+            amount: 金額
+            from_currency: 変換元の通貨コード
+            to_currency: 変換先の通貨コード
+        
+        Returns:
+            Optional[float]: 換算後の金額（不明な通貨の場合はNone）
+        """
+        rate = self.get_rate(from_currency, to_currency)
+        if rate is None:
+            return None
+        return amount * rate
+    
+    def convert_batch(self, amounts: Sequence[float], currencies: Sequence[str],
+                      to_currency: str = 'JPY') -> List[Optional[float]]:
+        """
+        複数の金額をまとめて換算します（レート表の参照は1回のみ）。
+        
+        Args:
+            amounts: 金額のリスト
+            currencies: 各金額の通貨コードのリスト
+            to_currency: 変換先の通貨コード
+        
+        Returns:
+            List[Optional[float]]: 換算後の金額のリスト（不明な通貨の要素はNone）
+        """
+        to_currency = (to_currency or '').upper()
+        rates = self.get_rates()
+        
+        # USD→JPYのみフォールバックを適用
+        if not rates and to_currency == 'JPY':
+            rates = {'USD': 1.0, 'JPY': self.fallback_rate}
+            logger.warning(f"API取得に失敗、フォールバックレートを使用: {self.fallback_rate}")
         
-        # フォールバック
-        logger.warning(f"API取得に失敗、フォールバックレートを使用: {self.fallback_rate}")
-        return self.fallback_rate
+        target_rate = rates.get(to_currency)
+        factors: Dict[str, Optional[float]] = {}
+        converted = []
+        for amount, currency in zip(amounts, currencies):
+            currency = (currency or to_currency).upper()
+            if currency not in factors:
+                if currency == to_currency:
+                    factors[currency] = 1.0
+                elif target_rate and rates.get(currency):
+                    factors[currency] = target_rate / rates[currency]
+                else:
+                    logger.warning(f"未対応の通貨のため換算できません: {currency}")
+                    factors[currency] = None
+            factor = factors[currency]
+            converted.append(amount * factor if factor is not None else None)
+        return converted
+    
+    def _set_rates(self, rates: Dict[str, float], timestamp: datetime) -> None:
+        """メモリ上のレート表を更新"""
+        self._rates = rates
+        self._rates_timestamp = timestamp
+        self._rates_expiry = timestamp + timedelta(hours=self.cache_duration_hours)
+        self._retry_after = None
+    
+    def _load_cached_rates(self) -> bool:
+        """
+        キャッシュファイルからレート表を読み込み、有効な場合はメモリに反映します。
+        
+        Returns:
+            bool: 有効なレート表を読み込めた場合True
+        """
+        cache_data = self._read_cache_file()
+        if not cache_data:
+            return False
+        
+        try:
+            cached_time = datetime.fromisoformat(cache_data['timestamp'])
+            if datetime.now() >= cached_time + timedelta(hours=self.cache_duration_hours):
+                logger.info("キャッシュが期限切れです")
+                return False
+            
+            rates = cache_data.get('rates')
+            if not rates:
+                # 旧形式（USD→JPYのみ）のキャッシュ
+                rates = {'USD': 1.0, 'JPY': float(cache_data['usd_to_jpy_rate'])}
+            
+            self._set_rates({code: float(rate) for code, rate in rates.items()}, cached_time)
+            return True
+        
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning(f"キャッシュ読み込みエラー: {e}")
+            return False
     
     def _get_cached_rate(self) -> Optional[float]:
         """
-        キャッシュファイルから為替レートを取得します。
+        キャッシュからUSD→JPYの為替レートを取得します。
         
         Returns:
             Optional[float]: キャッシュされた為替レート（期限切れまたは存在しない場合はNone）
         """
+        if not self._load_cached_rates():
+            return None
+        return self._rates.get('JPY')
+    
+    def _read_cache_file(self) -> Optional[Dict[str, any]]:
+        """キャッシュファイルを読み込む（存在しない場合はNone）"""
         try:
             if not os.path.exists(self.cache_file):
                 return None
             
             with open(self.cache_file, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-            
-            # キャッシュの有効期限をチェック
-            cached_time = datetime.fromisoformat(cache_data['timestamp'])
-            expiry_time = cached_time + timedelta(hours=self.cache_duration_hours)
-            
-            if datetime.now() < expiry_time:
-                return float(cache_data['usd_to_jpy_rate'])
-            else:
-                logger.info("キャッシュが期限切れです")
-                return None
-                
-        except (json.JSONDecodeError, KeyError, ValueError, OSError) as e:
+                return json.load(f)
+        
+        except (json.JSONDecodeError, OSError) as e:
             logger.warning(f"キャッシュ読み込みエラー: {e}")
             return None
     
-    def _fetch_rate_from_api(self) -> Optional[float]:
+    def _fetch_rates_from_api(self) -> Optional[Dict[str, float]]:
         """
-        ExchangeRate-APIから為替レートを取得します。
+        ExchangeRate-APIから全通貨の為替レートを取得します。
         
         Returns:
-            Optional[float]: USD to JPYの為替レート（取得失敗時はNone）
+            Optional[Dict[str, float]]: USD基準のレート表（取得失敗時はNone）
         """
         try:
             logger.info(f"ExchangeRate-APIから為替レートを取得中: {self.api_url}")
@@ -108,15 +264,16 @@ class ExchangeRateClient:
             
             data = response.json()
             
-            # APIレスポンスの形式をチェック
-            if 'rates' in data and 'JPY' in data['rates']:
-                jpy_rate = float(data['rates']['JPY'])
-                logger.info(f"API取得成功: 1 USD = {jpy_rate} JPY")
-                return jpy_rate
+            # APIレスポンスの形式をチェック（v6は conversion_rates、v4は rates）
+            rates = data.get('conversion_rates') or data.get('rates')
+            if rates and 'JPY' in rates:
+                rates = {code: float(rate) for code, rate in rates.items()}
+                logger.info(f"API取得成功: 1 USD = {rates['JPY']} JPY ({len(rates)}通貨)")
+                return rates
             else:
                 logger.error(f"APIレスポンスに期待されるデータが含まれていません: {data}")
                 return None
-                
+        
         except requests.exceptions.RequestException as e:
             logger.error(f"API リクエストエラー: {e}")
             return None
@@ -124,32 +281,61 @@ class ExchangeRateClient:
             logger.error(f"APIレスポンス解析エラー: {e}")
             return None
     
-    def _save_to_cache(self, rate: float) -> None:
+    def _fetch_rate_from_api(self) -> Optional[float]:
+        """
+        ExchangeRate-APIからUSD→JPYの為替レートを取得します。
+        
+        Returns:
+            Optional[float]: USD to JPYの為替レート（取得失敗時はNone）
+        """
+        rates = self._fetch_rates_from_api()
+        return rates['JPY'] if rates else None
+    
+    def _save_to_cache(self, rates: Dict[str, float]) -> None:
         """
-        為替レートをキャッシュファイルに保存します。
+        レート表をキャッシュファイルに保存します。
+        一時ファイルに書き込んでから置き換えるため、他プロセスが書きかけのファイルを読むことはありません。
         
         Args:
-            rate: 保存する為替レート
+            rates: 保存するUSD基準のレート表
         """
         try:
             cache_data = {
-                'usd_to_jpy_rate': rate,
+                'usd_to_jpy_rate': rates['JPY'],
+                'rates': rates,
                 'timestamp': datetime.now().isoformat(),
                 'source': 'ExchangeRate-API'
             }
             
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"為替レートをキャッシュに保存: {rate}")
+            cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+            fd, tmp_path = tempfile.mkstemp(prefix='.exchange_rate_', suffix='.tmp', dir=cache_dir)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(cache_data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.cache_file)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
             
-        except OSError as e:
+            logger.info(f"為替レートをキャッシュに保存: 1 USD = {rates['JPY']} JPY")
+        
+        except (OSError, KeyError) as e:
             logger.warning(f"キャッシュ保存エラー: {e}")
     
+    def _file_lock(self):
+        """プロセス間でAPI更新を排他するロック（fcntlが利用できない場合は何もしない）"""
+        return _CacheFileLock(f"{self.cache_file}.lock")
+    
     def clear_cache(self) -> None:
         """
-        キャッシュファイルを削除します。
+        キャッシュファイルとメモリ上のレート表を削除します。
         """
+        with self._lock:
+            self._rates = {}
+            self._rates_timestamp = None
+            self._rates_expiry = None
+            self._retry_after = None
         try:
             if os.path.exists(self.cache_file):
                 os.remove(self.cache_file)
@@ -165,12 +351,10 @@ class ExchangeRateClient:
             Dict[str, any]: キャッシュ情報
         """
         try:
-            if not os.path.exists(self.cache_file):
+            cache_data = self._read_cache_file()
+            if not cache_data:
                 return {'exists': False}
             
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-            
             cached_time = datetime.fromisoformat(cache_data['timestamp'])
             expiry_time = cached_time + timedelta(hours=self.cache_duration_hours)
             is_valid = datetime.now() < expiry_time
@@ -178,17 +362,50 @@ class ExchangeRateClient:
             return {
                 'exists': True,
                 'rate': cache_data['usd_to_jpy_rate'],
+                'currencies': len(cache_data.get('rates') or {}),
                 'timestamp': cache_data['timestamp'],
                 'source': cache_data.get('source', 'unknown'),
                 'is_valid': is_valid,
-                'expires_at': expiry_time.isoformat()
+                'expires_at': expiry_time.isoformat(),
+                'in_memory': bool(self._rates)
             }
-            
-        except (json.JSONDecodeError, KeyError, ValueError, OSError) as e:
+        
+        except (KeyError, ValueError) as e:
             logger.warning(f"キャッシュ情報取得エラー: {e}")
             return {'exists': False, 'error': str(e)}
 
 
+class _CacheFileLock:
+    """キャッシュ更新用の排他ロック（fcntl.flockを使用）"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+    
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        try:
+            self._handle = open(self.path, 'a')
+            fcntl.flock(self._handle, fcntl.LOCK_EX)
+        except OSError as e:
+            logger.warning(f"キャッシュロック取得エラー: {e}")
+            self._release()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._release()
+        return False
+    
+    def _release(self):
+        if self._handle is not None:
+            try:
+                fcntl.flock(self._handle, fcntl.LOCK_UN)
+            finally:
+                self._handle.close()
+                self._handle = None
+
+
 # グローバルインスタンス
 _exchange_rate_client = None
 
@@ -215,3 +432,18 @@ def get_usd_to_jpy_rate() -> float:
     """
     client = get_exchange_rate_client()
     return client.get_usd_to_jpy_rate()
+
+
+def convert_to_jpy_batch(amounts: Sequence[float], currencies: Sequence[str]) -> List[Optional[float]]:
+    """
+    複数の金額をまとめて日本円に換算します（便利関数）。
+    
+    Args:
+        amounts: 金額のリスト
+        currencies: 各金額の通貨コードのリスト
+    
+    Returns:
+        List[Optional[float]]: 日本円換算後の金額のリスト（不明な通貨の要素はNone）
+    """
+    client = get_exchange_rate_client()
+    return client.convert_batch(amounts, currencies, 'JPY')
@@ -0,0 +1,268 @@
+"""
+ヘッジリクエストユーティリティ
+プラットフォームごとの応答時間の分布を記録し、p95を超えても応答がないリクエストに対して
+同じリクエストをもう1本送信し、先に返ってきた応答を採用します（テールレイテンシ対策）。
+ヘッジの割合には上限があり、レート制限（429）を受けた直後やレート制限の送信枠がない場合はヘッジを行いません。
+元のリクエストとヘッジリクエストは別々のスレッドプールで実行し、ヘッジが元のリクエストの実行枠を奪わないようにします。
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Callable, Optional
+
+import requests
+
+from .config import get_optional_config
+from .rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# 元のリクエスト用・ヘッジリクエスト用の共有スレッドプール
+_primary_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_primary_executor() -> ThreadPoolExecutor:
+    """ヘッジ対象の元のリクエスト用のスレッドプールを取得"""
+    global _primary_executor
+    if _primary_executor is None:
+        with _executor_lock:
+            if _primary_executor is None:
+                max_workers = int(get_optional_config("HEDGED_REQUESTS_PRIMARY_MAX_WORKERS", "16"))
+                _primary_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge-primary")
+    return _primary_executor
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """ヘッジリクエスト用のスレッドプールを取得"""
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _executor_lock:
+            if _hedge_executor is None:
+                max_workers = int(get_optional_config("HEDGED_REQUESTS_MAX_WORKERS", "16"))
+                _hedge_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+    return _hedge_executor
+
+
+class HedgingPolicy:
+    """プラットフォーム単位のヘッジリクエスト方針"""
+    
+    def __init__(self, name: str, enabled: bool = False, percentile: float = 95.0,
+                 max_hedge_ratio: float = 0.1, min_samples: int = 20,
+                 min_delay: float = 0.05, window: int = 200):
+        """
+        初期化
+        
+        Args:
+            name: プラットフォーム名
+            enabled: ヘッジを有効にするかどうか
+            percentile: ヘッジを送信する応答時間のパーセンタイル
+            max_hedge_ratio: 直近のリクエストに対するヘッジの割合の上限（予算）
+            min_samples: ヘッジ判定に必要な応答時間のサンプル数
+            min_delay: ヘッジを送信するまでの最短待ち時間（秒）
+            window: 応答時間・ヘッジ率を集計するリクエスト数
+        """
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        
+        self._latencies = deque(maxlen=window)
+        self._hedged = deque(maxlen=window)  # 各リクエストでヘッジしたかどうか
+        self._rate_limited_until = 0.0
+        self._lock = threading.Lock()
+    
+    def record_latency(self, latency: float) -> None:
+        """
+        応答時間を記録します。
+        
+        Args:
+            latency: 応答時間（秒）
+        """
+        with self._lock:
+            self._latencies.append(latency)
+    
+    def note_rate_limited(self, retry_after: float) -> None:
+        """
+        レート制限を受けたことを記録し、その間はヘッジを停止します。
+        
+        Args:
+            retry_after: レート制限の解除までの秒数
+        """
+        with self._lock:
+            self._rate_limited_until = max(self._rate_limited_until, time.monotonic() + retry_after)
+    
+    def hedge_delay(self) -> Optional[float]:
+        """
+        ヘッジを送信するまでの待ち時間（観測した応答時間のパーセンタイル）を返します。
+        
+        Returns:
+            Optional[float]: 待ち時間（秒）。サンプル不足など判定できない場合はNone
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+        return max(self.min_delay, ordered[index])
+    
+    def can_hedge(self) -> bool:
+        """
+        現時点でヘッジを送信してよいかどうかを判定します（レート制限と予算を確認）。
+        
+        Returns:
+            bool: ヘッジを送信してよい場合True
+        """
+        with self._lock:
+            if time.monotonic() < self._rate_limited_until:
+                return False
+            if not self._hedged:
+                return True
+            return sum(self._hedged) / len(self._hedged) < self.max_hedge_ratio
+    
+    def _record_request(self, hedged: bool) -> None:
+        """リクエスト1件分のヘッジ有無を記録"""
+        with self._lock:
+            self._hedged.append(hedged)
+    
+    def execute(self, func: Callable[..., Any], *args, acquire_hedge: Optional[Callable[[], bool]] = None,
+                **kwargs) -> Any:
+        """
+        ヘッジ方針に従って関数を実行します。
+        p95を過ぎても完了しない場合は同じ呼び出しをもう1本実行し、先に成功した結果を返します。
+        
+        Args:
+            func: 実行する関数（冪等なリクエスト処理であること）
+            *args: 関数の位置引数
+            acquire_hedge: ヘッジの直前に呼ぶ関数（レート制限の送信枠を待たずに取得し、取得できなければFalse）
+            **kwargs: 関数のキーワード引数
+        
+        Returns:
+            Any: 関数の戻り値
+        """
+        start_time = time.monotonic()
+        delay = self.hedge_delay() if self.enabled else None
+        
+        # 無効時・サンプル不足時はそのまま実行
+        if delay is None:
+            result = func(*args, **kwargs)
+            self.record_latency(time.monotonic() - start_time)
+            self._record_request(False)
+            return result
+        
+        primary = _get_primary_executor().submit(func, *args, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        
+        # ヘッジもレート制限の1件として数え、送信枠がなければヘッジしない
+        if done or not self.can_hedge() or (acquire_hedge is not None and not acquire_hedge()):
+            self._record_request(False)
+            result = primary.result()
+            self.record_latency(time.monotonic() - start_time)
+            return result
+        
+        logger.info(f"{self.name}: {delay:.2f}秒以内に応答がないためヘッジリクエストを送信します")
+        hedge = _get_hedge_executor().submit(func, *args, **kwargs)
+        self._record_request(True)
+        
+        pending = {primary, hedge}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    self.record_latency(time.monotonic() - start_time)
+                    if future is hedge:
+                        logger.info(f"{self.name}: ヘッジリクエストが先に応答しました")
+                    return future.result()
+                last_error = error
+        
+        raise last_error
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        ヘッジ方針の状態情報を取得します。
+        
+        Returns:
+            Dict[str, Any]: 状態情報
+        """
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                'name': self.name,
+                'enabled': self.enabled,
+                'samples': len(self._latencies),
+                'hedge_delay': round(delay, 3) if delay is not None else None,
+                'hedge_ratio': round(sum(self._hedged) / len(self._hedged), 3) if self._hedged else 0.0,
+                'rate_limited': time.monotonic() < self._rate_limited_until
+            }
+
+
+# プラットフォーム別ヘッジ方針のレジストリ
+_hedging_policies: Dict[str, HedgingPolicy] = {}
+_registry_lock = threading.Lock()
+
+
+def get_hedging_policy(name: str) -> HedgingPolicy:
+    """
+    プラットフォーム名に対応するHedgingPolicyを取得します（プロセス内で共有）。
+    HEDGED_REQUESTS_ENABLED（または HEDGED_REQUESTS_{NAME}_ENABLED）が true の場合のみヘッジします。
+    
+    Args:
+        name: プラットフォーム名（例: 'ebay', 'yahoo_shopping'）
+    
+    Returns:
+        HedgingPolicy: ヘッジ方針
+    """
+    policy = _hedging_policies.get(name)
+    if policy is not None:
+        return policy
+    
+    with _registry_lock:
+        if name not in _hedging_policies:
+            def setting(key: str, default: str) -> str:
+                return get_optional_config(f"HEDGED_REQUESTS_{name.upper()}_{key}",
+                                           get_optional_config(f"HEDGED_REQUESTS_{key}", default))
+            
+            _hedging_policies[name] = HedgingPolicy(
+                name,
+                enabled=setting("ENABLED", "false").lower() in ("1", "true", "yes"),
+                percentile=float(setting("PERCENTILE", "95")),
+                max_hedge_ratio=float(setting("MAX_RATIO", "0.1")),
+                min_samples=int(setting("MIN_SAMPLES", "20")),
+            )
+        return _hedging_policies[name]
+
+
+def hedged_get(name: str, url: str, rate_limiter: Optional[RateLimiter] = None, **kwargs) -> requests.Response:
+    """
+    ヘッジ方針に従ってGETリクエストを実行します（便利関数）。
+    429応答を受けた場合はそのプラットフォームのヘッジを一時停止します。
+    
+    Args:
+        name: プラットフォーム名
+        url: リクエストURL
+        rate_limiter: 元のリクエストの送信枠を取得済みのレート制限（指定した場合、ヘッジは空き枠がある時だけ送信）
+        **kwargs: requests.get に渡す引数
+    
+    Returns:
+        requests.Response: レスポンス
+    """
+    policy = get_hedging_policy(name)
+    acquire_hedge = rate_limiter.try_acquire if rate_limiter is not None else None
+    response = policy.execute(requests.get, url, acquire_hedge=acquire_hedge, **kwargs)
+    
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get("Retry-After", 60))
+        except (TypeError, ValueError):
+            retry_after = 60.0
+        policy.note_rate_limited(retry_after)
+    
+    return response
@@ -0,0 +1,67 @@
+"""
+登録済みIDのローカルフィルタ
+一括登録の前に、このプロセスで既に送信したIDを除外して送信量を減らします。
+件数に上限があり、超えた場合は古いIDから忘れます（忘れたIDはサーバー側の重複判定で除外されます）。
+"""
+
+import threading
+from typing import Dict, List, Any, Iterable
+
+
+class SeenIdFilter:
+    """送信済みIDの集合（上限付き）"""
+    
+    def __init__(self, max_size: int = 1000000):
+        """
+        初期化
+        
+        Args:
+            max_size: 保持するIDの最大数
+        """
+        self.max_size = max(1, max_size)
+        self._ids: Dict[str, None] = {}  # 挿入順を保持する集合として使用
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def __contains__(self, item_id: Any) -> bool:
+        return str(item_id) in self._ids
+    
+    def add_many(self, item_ids: Iterable[Any]) -> None:
+        """
+        IDを追加します。
+        
+        Args:
+            item_ids: 追加するID
+        """
+        with self._lock:
+            for item_id in item_ids:
+                self._ids[str(item_id)] = None
+            
+            # 上限を超えた場合は古い半分を忘れる
+            if len(self._ids) > self.max_size:
+                keep = self.max_size // 2
+                self._ids = dict.fromkeys(list(self._ids)[-keep:]) if keep else {}
+    
+    def filter_unseen(self, data: List[Dict[str, Any]], id_key: str = "item_id") -> List[Dict[str, Any]]:
+        """
+        未送信のアイテムだけを返します（同じバッチ内の重複も除外）。
+        
+        Args:
+            data: アイテムのリスト
+            id_key: データ内のID項目のキー名
+        
+        Returns:
+            List[Dict[str, Any]]: 未送信のアイテムのリスト
+        """
+        unseen: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for item in data:
+                item_id = item.get(id_key)
+                if item_id is None:
+                    continue
+                key = str(item_id)
+                if key not in self._ids and key not in unseen:
+                    unseen[key] = item
+        return list(unseen.values())
@@ -5,10 +5,17 @@ OpenAI API翻訳ユーティリティ
 
 import os
 import re
+import json
 import logging
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Tuple
 import openai
 
+from .config import get_optional_config
+from .rate_limiter import get_rate_limiter
+from .translation_cache import get_translation_cache, normalize_cache_text
+from .term_dictionary import get_term_dictionary
+
 # ログ設定
 logger = logging.getLogger(__name__)
 
@@ -26,7 +33,13 @@ class OpenAITranslator:
             self.client = None
             logger.warning("OpenAI APIキーが設定されていません")
         
-        self.translation_cache = {}  # 翻訳結果キャッシュ
+        self.translation_cache = get_translation_cache()  # 翻訳結果キャッシュ（プロセス間で共有）
+        self.term_dictionary = get_term_dictionary()  # オフライン用語辞書
+        
+        # 一括翻訳の設定（1回のプロンプトに含める件数と同時実行数）
+        self.batch_size = int(get_optional_config("OPENAI_TRANSLATION_BATCH_SIZE", "40"))
+        self.batch_workers = int(get_optional_config("OPENAI_TRANSLATION_MAX_WORKERS", "4"))
+        self.rate_limiter = get_rate_limiter('openai', default_rate=2.0, default_burst=4)
     
     def translate_product_name(self, product_name: str, target_language: str = 'en') -> str:
         """
@@ -42,59 +55,195 @@ class OpenAITranslator:
         if not product_name:
             return ""
         
-        # キャッシュをチェック
-        cache_key = f"{product_name}_{target_language}"
-        if cache_key in self.translation_cache:
-            logger.debug(f"キャッシュから翻訳結果を取得: {product_name}")
-            return self.translation_cache[cache_key]
+        # キャッシュ・用語辞書・レート制限付きのJSONプロンプトは一括翻訳と共通（1件のバッチとして翻訳）
+        translated_text = self.translate_batch([product_name], target_language).get(product_name)
+        return translated_text if translated_text is not None else product_name
+    
+    def translate_batch(self, texts: List[str], target_language: str = 'en') -> Dict[str, Optional[str]]:
+        """
+        複数の商品名をまとめて翻訳します。
+        キャッシュや用語辞書で翻訳できないものだけを OPENAI_TRANSLATION_BATCH_SIZE 件ずつ
+        1回のJSONプロンプトにまとめ、レート制限の範囲で並列に翻訳します。結果はキャッシュに保存します。
+        用語辞書の用語を含むテキストは、辞書にない部分だけを翻訳して辞書の訳と組み合わせます。
+        
+        Args:
+            texts: 翻訳対象の商品名のリスト
+            target_language: 翻訳先言語コード（デフォルト: 'en'）
+            
+        Returns:
+            Dict[str, Optional[str]]: 元のテキスト -> 翻訳結果
+                                      （日本語でない場合はクリーニング後のテキスト、翻訳できなかった場合はNone）
+        """
+        results: Dict[str, Optional[str]] = {}
+        pending: Dict[str, str] = {}  # 元のテキスト -> クリーニング後のテキスト
+        
+        for text in dict.fromkeys(t for t in texts if t):
+            cleaned = self._clean_product_name(text)
+            if not self.is_japanese_text(cleaned):
+                results[text] = cleaned
+            else:
+                pending[text] = cleaned
+        
+        # キャッシュ済みのテキストを除外
+        cached = self.translation_cache.lookup_many(pending.keys(), target_language) if pending else {}
+        for text in list(pending):
+            key = normalize_cache_text(text)
+            if key in cached:
+                results[text] = cached[key]
+                del pending[text]
+        
+        # 用語辞書だけで翻訳できるテキストを除外
+        if pending and target_language == 'en':
+            offline_translations: Dict[str, Optional[str]] = {}
+            for text in list(pending):
+                offline_translation = self.term_dictionary.translate_fully(pending[text])
+                if offline_translation:
+                    offline_translations[text] = offline_translation
+                    results[text] = offline_translation
+                    del pending[text]
+            if offline_translations:
+                self.translation_cache.store_many(offline_translations, target_language, provider='dictionary')
+        
+        if not pending:
+            return results
         
-        # クライアントが初期化されていない場合は元のテキストを返す
         if not self.client:
             logger.warning("OpenAI APIクライアントが利用できません。元のテキストを返します。")
-            return product_name
+            results.update({text: None for text in pending})
+            return results
         
-        try:
-            # 商品名をクリーニング
-            cleaned_name = self._clean_product_name(product_name)
+        # 辞書の用語を含むテキストは、辞書にない日本語部分だけを翻訳して辞書の訳と組み合わせる
+        spliced: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+        if target_language == 'en':
+            for text, cleaned in pending.items():
+                segments = self.term_dictionary.partial_segments(cleaned)
+                if segments is not None:
+                    spliced[text] = segments
+        
+        units = [cleaned for text, cleaned in pending.items() if text not in spliced]
+        for segments in spliced.values():
+            units.extend(source for source, translation in segments if translation is None)
+        translations = self._translate_units(units, target_language)
+        
+        # 残りの部分を翻訳できなかったテキストは全体を翻訳する
+        fallback = [
+            text for text, segments in spliced.items()
+            if any(translation is None and translations.get(source) is None for source, translation in segments)
+        ]
+        if fallback:
+            translations.update(self._translate_units([pending[text] for text in fallback], target_language))
+            for text in fallback:
+                del spliced[text]
+        
+        translated_texts: Dict[str, Optional[str]] = {}
+        spliced_texts: Dict[str, Optional[str]] = {}
+        for text, cleaned in pending.items():
+            if text in spliced:
+                spliced_texts[text] = results[text] = self.term_dictionary.join_segments(
+                    (source, translation if translation is not None else translations[source])
+                    for source, translation in spliced[text]
+                )
+                continue
+            results[text] = translations.get(cleaned)
+            if cleaned in translations:
+                # 品質チェックを通らなかった訳（None）は一定期間再翻訳しない（ネガティブキャッシュ）
+                translated_texts[text] = translations[cleaned]
+        
+        if translated_texts:
+            self.translation_cache.store_many(translated_texts, target_language, provider='openai')
+        if spliced_texts:
+            self.translation_cache.store_many(spliced_texts, target_language, provider='dictionary+openai')
+        return results
+    
+    def _translate_units(self, units: List[str], target_language: str) -> Dict[str, Optional[str]]:
+        """
+        テキストを OPENAI_TRANSLATION_BATCH_SIZE 件ずつのJSONプロンプトで並列に翻訳します（重複は除く）。
+        
+        Args:
+            units: クリーニング済みの商品名（または辞書にない日本語部分）のリスト
+            target_language: 翻訳先言語コード
             
-            # 日本語テキストかチェック
-            if not self.is_japanese_text(cleaned_name):
-                logger.debug(f"日本語テキストではありません: {cleaned_name}")
-                return cleaned_name
+        Returns:
+            Dict[str, Optional[str]]: テキスト -> 翻訳結果（品質チェックを通らなかった場合はNone）。
+                                      リクエストが失敗した、または応答から漏れたテキストは含まない（キャッシュしない）
+        """
+        units = list(dict.fromkeys(units))
+        if not units:
+            return {}
+        batches = [units[start:start + self.batch_size] for start in range(0, len(units), self.batch_size)]
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(self.batch_workers, len(batches)))) as executor:
+            batch_results = list(executor.map(
+                lambda batch: self._translate_prompt_batch(batch, target_language),
+                batches
+            ))
+        
+        translations: Dict[str, Optional[str]] = {}
+        for batch, batch_translations in zip(batches, batch_results):
+            if batch_translations is None:
+                continue
+            for unit, translated in zip(batch, batch_translations):
+                if translated is not None:
+                    translations[unit] = translated if self._is_translation_valid(unit, translated) else None
+        
+        logger.info(f"一括翻訳: {len(units)}件を{len(batches)}回のリクエストで翻訳しました")
+        return translations
+    
+    def _translate_prompt_batch(self, texts: List[str], target_language: str) -> Optional[List[Optional[str]]]:
+        """
+        複数の商品名を1回のJSONプロンプトで翻訳します。
+        
+        Args:
+            texts: クリーニング済みの商品名のリスト
+            target_language: 翻訳先言語コード
             
-            # OpenAI APIで翻訳
+        Returns:
+            Optional[List[Optional[str]]]: textsと同じ順序の翻訳結果（応答に含まれない項目はNone）。
+                                           リクエストが失敗した場合はNone
+        """
+        payload = json.dumps(
+            {'items': [{'id': index, 'text': text} for index, text in enumerate(texts)]},
+            ensure_ascii=False
+        )
+        
+        try:
+            self.rate_limiter.acquire()
             response = self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a professional translator specializing in product names. Translate Japanese product names to English accurately, preserving brand names and product specifications."
+                        "content": (
+                            "You are a professional translator specializing in product names. "
+                            f"Translate each Japanese product name to the language '{target_language}' accurately, "
+                            "preserving brand names and product specifications. "
+                            'Respond with a JSON object of the form {"translations": [{"id": <id>, "translation": "<text>"}]} '
+                            "containing one entry for every input id."
+                        )
                     },
                     {
                         "role": "user",
-                        "content": f"Translate this Japanese product name to English: {cleaned_name}"
+                        "content": payload
                     }
                 ],
+                response_format={"type": "json_object"},
                 temperature=0.3,
-                max_tokens=200
+                max_tokens=min(4096, 60 * len(texts) + 100)
             )
-            
-            translated_text = response.choices[0].message.content.strip()
-            
-            # 翻訳品質をチェック
-            if self._is_translation_valid(cleaned_name, translated_text):
-                # キャッシュに保存
-                self.translation_cache[cache_key] = translated_text
-                logger.debug(f"翻訳完了: '{cleaned_name}' -> '{translated_text}'")
-                return translated_text
-            else:
-                logger.warning(f"翻訳品質が低いため、元のテキストを返します: {translated_text}")
-                return product_name
-            
+            content = json.loads(response.choices[0].message.content)
         except Exception as e:
-            logger.error(f"翻訳エラー: {e}")
-            # エラー時は元のテキストを返す
-            return product_name
+            logger.error(f"一括翻訳エラー（{len(texts)}件）: {e}")
+            return None
+        
+        translations: List[Optional[str]] = [None] * len(texts)
+        for entry in content.get('translations') or []:
+            if not isinstance(entry, dict):
+                continue
+            index = entry.get('id')
+            translated = entry.get('translation')
+            if isinstance(index, int) and 0 <= index < len(texts) and isinstance(translated, str):
+                translations[index] = translated.strip()
+        return translations
     
     def _is_translation_valid(self, original: str, translated: str) -> bool:
         """
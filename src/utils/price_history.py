@@ -0,0 +1,400 @@
+"""
+価格履歴ユーティリティ
+キーワード（JANコードを含む）×プラットフォーム×種別（出品中・売り切れ済み）ごとに、
+観測した価格を1時間単位と1日単位のロールアップとして取り込み時に集計します。
+
+取得スクリプトは実行のたびに同じ出品・同じ売り切れ済みアイテムを取得するため、件数が実行頻度に
+比例しないよう、売り切れ済みは初めて保存したアイテムだけを区間に追加し、出品中は区間の行を
+最新の出品一覧（商品IDで重複除去）で置き換えます。
+
+ロールアップの行は件数・最小値・最大値・合計とパーセンタイルに加えて、相対誤差を保証した
+対数ヒストグラム（スケッチ）を持ちます。スケッチは足し合わせられるため、既存の行への追記も
+数か月分の集計も、再スクレイピングせずに日単位の行を読むだけで行えます。
+"""
+
+import math
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Collection, Iterable, Optional, Sequence, Tuple
+
+from .config import get_optional_config
+from .supabase_client import execute_with_client
+from .price_stats import KIND_ACTIVE, KIND_SOLD, SOLD_STATUSES
+
+logger = logging.getLogger(__name__)
+
+PRICE_HISTORY_TABLE = 'price_history_rollups'
+
+# ロールアップの粒度
+ROLLUP_GRANULARITIES = ('hour', 'day')
+
+# 行に保持するパーセンタイル（列名 -> 分位）
+ROLLUP_PERCENTILES = {
+    'p10_price': 0.10,
+    'p25_price': 0.25,
+    'median_price': 0.50,
+    'p75_price': 0.75,
+    'p90_price': 0.90,
+}
+
+_ROLLUP_KEY_COLUMNS = ('series_key', 'platform', 'kind', 'granularity', 'bucket_start')
+
+
+class PriceSketch:
+    """相対誤差を保証した価格の対数ヒストグラム（足し合わせ可能）"""
+    
+    def __init__(self, relative_accuracy: Optional[float] = None):
+        """
+        初期化
+        
+        Args:
+            relative_accuracy: パーセンタイルの相対誤差（省略時は PRICE_HISTORY_SKETCH_ACCURACY）
+        """
+        self.relative_accuracy = relative_accuracy or float(get_optional_config("PRICE_HISTORY_SKETCH_ACCURACY", "0.01"))
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+    
+    def add(self, price: float, count: int = 1) -> None:
+        """
+        価格を追加します（0以下の価格は無視）。
+        
+        Args:
+            price: 価格
+            count: 件数
+        """
+        if price is None or price <= 0:
+            return
+        
+        index = math.ceil(math.log(price) / self._log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+        self.total += price * count
+        self.min = price if self.min is None else min(self.min, price)
+        self.max = price if self.max is None else max(self.max, price)
+    
+    def merge(self, other: 'PriceSketch') -> None:
+        """
+        別のスケッチを足し合わせます（相対誤差が同じスケッチのみ）。
+        
+        Args:
+            other: 足し合わせるスケッチ
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("相対誤差が異なるスケッチは足し合わせられません")
+        
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        分位qの価格を推定します（最小値・最大値の範囲に丸める）。
+        
+        Args:
+            q: 分位（0〜1）
+        
+        Returns:
+            Optional[float]: 推定値（空の場合はNone）
+        """
+        if not self.count:
+            return None
+        
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        ロールアップの統計値を返します。
+        
+        Returns:
+            Dict[str, Any]: count, min_price, max_price, sum_price, avg_price と各パーセンタイル
+        """
+        stats = {
+            'count': self.count,
+            'min_price': self.min,
+            'max_price': self.max,
+            'sum_price': round(self.total, 2),
+            'avg_price': round(self.total / self.count, 2) if self.count else None
+        }
+        for column, q in ROLLUP_PERCENTILES.items():
+            value = self.quantile(q)
+            stats[column] = round(value, 2) if value is not None else None
+        return stats
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSONに保存できる形式に変換する"""
+        return {
+            'accuracy': self.relative_accuracy,
+            'bins': {str(index): count for index, count in self.bins.items()},
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PriceSketch':
+        """to_dict の出力から復元する"""
+        sketch = cls(data.get('accuracy'))
+        sketch.bins = {int(index): count for index, count in (data.get('bins') or {}).items()}
+        sketch.count = data.get('count', 0)
+        sketch.total = data.get('sum', 0.0)
+        sketch.min = data.get('min')
+        sketch.max = data.get('max')
+        return sketch
+
+
+def bucket_start(observed_at: datetime, granularity: str) -> str:
+    """
+    観測日時を含むロールアップ区間の開始日時を返します。
+    
+    Args:
+        observed_at: 観測日時
+        granularity: 粒度（hour または day）
+    
+    Returns:
+        str: 区間の開始日時（ISO形式）
+    """
+    if granularity == 'hour':
+        start = observed_at.replace(minute=0, second=0, microsecond=0)
+    elif granularity == 'day':
+        start = observed_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        raise ValueError(f"未対応の粒度です: {granularity}")
+    return start.isoformat()
+
+
+def split_item_prices(items: Iterable[Dict[str, Any]], price_key: str = 'price',
+                      new_item_ids: Optional[Collection[str]] = None) -> Tuple[List[float], List[float]]:
+    """
+    コレクターのアイテムを出品中と売り切れ済みの価格に分けます（商品IDで重複除去）。
+    
+    Args:
+        items: get_complete_data の出力
+        price_key: 価格のキー
+        new_item_ids: 初めて保存したアイテムのID（売り切れ済みはこのIDのアイテムだけを返す。Noneの場合は返さない）
+    
+    Returns:
+        Tuple[List[float], List[float]]: 出品中の価格, 新しく売り切れたアイテムの価格（0以下は除く）
+    """
+    active_prices: Dict[Any, float] = {}
+    sold_prices: Dict[str, float] = {}
+    for index, item in enumerate(items):
+        price = item.get(price_key)
+        if not isinstance(price, (int, float)) or price <= 0:
+            continue
+        item_id = item.get('item_id')
+        if item.get('status') not in SOLD_STATUSES:
+            # IDがない出品は重複を判定できないため、それぞれ1件として数える
+            active_prices[str(item_id) if item_id is not None else index] = price
+        elif new_item_ids is not None and item_id is not None and str(item_id) in new_item_ids:
+            sold_prices[str(item_id)] = price
+    return list(active_prices.values()), list(sold_prices.values())
+
+
+class PriceHistoryStore:
+    """価格履歴のロールアップ（price_history_rollups テーブル）"""
+    
+    def __init__(self, table: str = PRICE_HISTORY_TABLE):
+        """
+        初期化
+        
+        Args:
+            table: ロールアップのテーブル名
+        """
+        self.table = table
+    
+    def record(self, series_key: str, platform: str, active_prices: Sequence[float] = (),
+               sold_prices: Sequence[float] = (), observed_at: Optional[datetime] = None) -> int:
+        """
+        1つのキーワードの観測価格を取り込みます。
+        
+        Args:
+            series_key: キーワードまたはJANコード
+            platform: プラットフォーム名
+            active_prices: 現在の出品一覧の価格（区間の行を置き換える）
+            sold_prices: 新しく売り切れたアイテムの価格（区間の行に追加する）
+            observed_at: 観測日時（省略時は現在時刻）
+        
+        Returns:
+            int: 更新したロールアップの行数
+        """
+        return self.record_observations([
+            (series_key, platform, KIND_ACTIVE, active_prices, observed_at),
+            (series_key, platform, KIND_SOLD, sold_prices, observed_at)
+        ])
+    
+    def record_batch(self, platform: str, items: Iterable[Dict[str, Any]],
+                     new_item_ids: Optional[Collection[str]], price_key: str = 'price',
+                     keyword_key: str = 'search_term', observed_at: Optional[datetime] = None) -> int:
+        """
+        保存したバッチ（複数キーワードの get_complete_data の出力）をまとめて取り込みます。
+        
+        Args:
+            platform: プラットフォーム名
+            items: 保存したアイテム
+            new_item_ids: 保存時に初めて挿入されたアイテムのID（insert_new_items の inserted_ids。
+                          Noneの場合は売り切れ済みを記録しない）
+            price_key: 価格のキー
+            keyword_key: キーワードのキー
+            observed_at: 観測日時（省略時は現在時刻）
+        
+        Returns:
+            int: 更新したロールアップの行数
+        """
+        new_item_ids = set(new_item_ids) if new_item_ids is not None else None
+        by_keyword: Dict[str, List[Dict[str, Any]]] = {}
+        for item in items:
+            if item.get(keyword_key):
+                by_keyword.setdefault(item[keyword_key], []).append(item)
+        
+        observations = []
+        for keyword, keyword_items in by_keyword.items():
+            active_prices, sold_prices = split_item_prices(keyword_items, price_key, new_item_ids)
+            observations.append((keyword, platform, KIND_ACTIVE, active_prices, observed_at))
+            observations.append((keyword, platform, KIND_SOLD, sold_prices, observed_at))
+        return self.record_observations(observations)
+    
+    def record_observations(self, observations: Iterable[Tuple[str, str, str, Sequence[float], Optional[datetime]]]) -> int:
+        """
+        観測価格をまとめて取り込みます。
+        取り込み分をロールアップ区間ごとにスケッチへ集計し、1回のupsertで書き込みます。
+        売り切れ済み（sold）は既存の行と足し合わせ、出品中（active）は区間の行を今回の出品一覧で置き換えます
+        （出品中の日単位の行は、その日の最後の出品一覧になります）。
+        同じ区間に複数のプロセスが同時に書き込むと一方の追記が失われるため、取り込みはプラットフォームごとに1プロセスで行います。
+        
+        Args:
+            observations: (series_key, platform, kind, prices, observed_at) の列
+        
+        Returns:
+            int: 更新したロールアップの行数
+        """
+        now = datetime.now()
+        sketches: Dict[Tuple[str, str, str, str, str], PriceSketch] = {}
+        for series_key, platform, kind, prices, observed_at in observations:
+            prices = [price for price in prices if isinstance(price, (int, float)) and price > 0]
+            if not prices:
+                continue
+            for granularity in ROLLUP_GRANULARITIES:
+                key = (series_key, platform, kind, granularity, bucket_start(observed_at or now, granularity))
+                sketch = sketches.setdefault(key, PriceSketch())
+                for price in prices:
+                    sketch.add(price)
+        
+        if not sketches:
+            return 0
+        
+        sold_keys = [key for key in sketches if key[2] == KIND_SOLD]
+        if sold_keys:
+            for key, existing in self._load_sketches(sold_keys).items():
+                sketches[key].merge(existing)
+        
+        updated_at = now.isoformat()
+        rows = [
+            dict(zip(_ROLLUP_KEY_COLUMNS, key), **sketch.summary(), sketch=sketch.to_dict(), updated_at=updated_at)
+            for key, sketch in sketches.items()
+        ]
+        execute_with_client(
+            lambda client: client.table(self.table).upsert(rows, on_conflict=','.join(_ROLLUP_KEY_COLUMNS)).execute()
+        )
+        
+        logger.info(f"Updated {len(rows)} price history rollups")
+        return len(rows)
+    
+    def _load_sketches(self, keys: List[Tuple[str, str, str, str, str]]) -> Dict[Tuple[str, str, str, str, str], PriceSketch]:
+        """取り込み先の区間の既存スケッチを読み込む"""
+        def column_values(position: int) -> List[str]:
+            return sorted({key[position] for key in keys})
+        
+        result = execute_with_client(
+            lambda client: client.table(self.table)
+            .select(','.join(_ROLLUP_KEY_COLUMNS) + ',sketch')
+            .in_('series_key', column_values(0))
+            .in_('platform', column_values(1))
+            .in_('granularity', column_values(3))
+            .in_('bucket_start', column_values(4))
+            .execute()
+        )
+        
+        wanted = set(keys)
+        sketches = {}
+        for row in result.data or []:
+            key = tuple(row[column] for column in _ROLLUP_KEY_COLUMNS[:4]) + \
+                (datetime.fromisoformat(row['bucket_start']).isoformat(),)
+            if key in wanted and row.get('sketch'):
+                sketches[key] = PriceSketch.from_dict(row['sketch'])
+        return sketches
+    
+    def get_series(self, series_key: str, platform: str, kind: str = KIND_SOLD, granularity: str = 'day',
+                   start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        ロールアップの時系列を取得します（スケッチ列は含めない）。
+        
+        Args:
+            series_key: キーワードまたはJANコード
+            platform: プラットフォーム名
+            kind: 種別（active または sold）
+            granularity: 粒度（hour または day）
+            start: 開始日時（この日時を含む区間から）
+            end: 終了日時（この日時より前の区間まで）
+        
+        Returns:
+            List[Dict[str, Any]]: 区間の古い順のロールアップ
+        """
+        columns = ['bucket_start', 'count', 'min_price', 'max_price', 'avg_price', *ROLLUP_PERCENTILES]
+        return self._query(series_key, platform, kind, granularity, start, end, columns)
+    
+    def summarize(self, series_key: str, platform: str, kind: str = KIND_SOLD,
+                  start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        期間全体の統計値を日単位のロールアップから求めます（数か月分でも1回の読み込み）。
+        出品中（active）の日単位のロールアップはその日の最後のスナップショットのため、
+        期間全体の値は日ごとのスナップショットを合算したものになります。
+        
+        Args:
+            series_key: キーワードまたはJANコード
+            platform: プラットフォーム名
+            kind: 種別（active または sold）
+            start: 開始日時（この日を含む）
+            end: 終了日時（この日より前まで）
+        
+        Returns:
+            Dict[str, Any]: count, min_price, max_price, sum_price, avg_price と各パーセンタイル, days
+        """
+        rows = self._query(series_key, platform, kind, 'day', start, end, ['sketch'])
+        total = PriceSketch()
+        for row in rows:
+            if row.get('sketch'):
+                total.merge(PriceSketch.from_dict(row['sketch']))
+        return dict(total.summary(), days=len(rows))
+    
+    def _query(self, series_key: str, platform: str, kind: str, granularity: str,
+               start: Optional[datetime], end: Optional[datetime], columns: Sequence[str]) -> List[Dict[str, Any]]:
+        """ロールアップを区間の古い順に取得する"""
+        def build_request(client):
+            query = client.table(self.table).select(','.join(columns)) \
+                .eq('series_key', series_key).eq('platform', platform) \
+                .eq('kind', kind).eq('granularity', granularity)
+            if start is not None:
+                query = query.gte('bucket_start', bucket_start(start, granularity))
+            if end is not None:
+                query = query.lt('bucket_start', end.isoformat())
+            return query.order('bucket_start').execute()
+        
+        return execute_with_client(build_request).data or []
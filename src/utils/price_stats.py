@@ -0,0 +1,190 @@
+"""
+価格統計ユーティリティ
+キーワードごとの出品中・売り切れ済み価格の統計を、pandas のグループ集計でまとめて計算します。
+数千キーワード分の価格を1つのデータフレームに入れ、パーセンタイル・トリム平均・IQRによる外れ値除去・
+売り切れ価格と出品中価格の差（スプレッド）を1回のグループ集計で求めます。
+"""
+
+import logging
+from typing import Dict, List, Any, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 価格の種別
+KIND_ACTIVE = 'active'
+KIND_SOLD = 'sold'
+KINDS = (KIND_ACTIVE, KIND_SOLD)
+
+# 売り切れ済み（落札済み）を表すアイテムのステータス
+SOLD_STATUSES = ('sold', 'sold_out', 'ended')
+
+# 既定のパーセンタイル
+DEFAULT_PERCENTILES = (0.10, 0.25, 0.50, 0.75, 0.90)
+
+_GROUP_COLUMNS = ['keyword', 'kind']
+
+
+def frame_from_listings(keyword: str, active_items: Iterable[Dict[str, Any]], sold_items: Iterable[Dict[str, Any]],
+                        price_key: str = 'price') -> pd.DataFrame:
+    """
+    1つのキーワードの出品中・売り切れ済みアイテムから価格のデータフレームを作成します。
+    
+    Args:
+        keyword: 検索キーワード
+        active_items: 出品中のアイテム
+        sold_items: 売り切れ済みのアイテム
+        price_key: 価格のキー
+    
+    Returns:
+        pd.DataFrame: keyword, kind, price の列を持つデータフレーム
+    """
+    records = [(keyword, KIND_ACTIVE, item.get(price_key)) for item in active_items]
+    records.extend((keyword, KIND_SOLD, item.get(price_key)) for item in sold_items)
+    return _build_frame(records)
+
+
+def frame_from_items(items: Iterable[Dict[str, Any]], price_key: str = 'price',
+                     keyword_key: str = 'search_term') -> pd.DataFrame:
+    """
+    複数キーワードのアイテムから価格のデータフレームを作成します（種別はアイテムのステータスで判定）。
+    
+    Args:
+        items: get_complete_data の出力を連結したもの
+        price_key: 価格のキー
+        keyword_key: キーワードのキー
+    
+    Returns:
+        pd.DataFrame: keyword, kind, price の列を持つデータフレーム
+    """
+    return _build_frame(
+        (item.get(keyword_key), KIND_SOLD if item.get('status') in SOLD_STATUSES else KIND_ACTIVE, item.get(price_key))
+        for item in items
+    )
+
+
+def _build_frame(records: Iterable[Sequence[Any]]) -> pd.DataFrame:
+    """(keyword, kind, price) の列からデータフレームを作成する（数値でない価格はNaN）"""
+    frame = pd.DataFrame.from_records(list(records), columns=['keyword', 'kind', 'price'])
+    frame['price'] = pd.to_numeric(frame['price'], errors='coerce')
+    # グループ集計のたびにキーを分解しないよう、カテゴリ型にしておく
+    frame['keyword'] = frame['keyword'].astype('category')
+    frame['kind'] = pd.Categorical(frame['kind'], categories=KINDS)
+    return frame
+
+
+def compute_price_stats(frame: pd.DataFrame, percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                        trim: float = 0.1, iqr_multiplier: float = 1.5) -> pd.DataFrame:
+    """
+    キーワードごとの価格統計をまとめて計算します。
+    0以下・数値でない価格は件数（active_count, sold_count）にのみ含めます。
+    
+    Args:
+        frame: keyword, kind, price の列を持つデータフレーム
+        percentiles: 計算するパーセンタイル（0〜1）
+        trim: トリム平均で両端から除く割合
+        iqr_multiplier: 外れ値とみなす四分位範囲の倍数（Q1 - k*IQR 未満、Q3 + k*IQR 超を除く）
+    
+    Returns:
+        pd.DataFrame: キーワードをインデックスとし、種別ごとに次の列を持つデータフレーム
+                      （{kind}_count, {kind}_valid_count, {kind}_min, {kind}_max, {kind}_mean, {kind}_median,
+                      {kind}_p10 など, {kind}_trimmed_mean, {kind}_outliers, {kind}_filtered_mean,
+                      {kind}_filtered_median）と sold_active_spread, sold_active_spread_ratio
+    """
+    counts = frame.groupby(_GROUP_COLUMNS, observed=True).size().rename('count')
+    
+    valid = frame[frame['price'] > 0]
+    grouped = valid.groupby(_GROUP_COLUMNS, observed=True)['price']
+    columns = [
+        counts,
+        grouped.agg(['size', 'min', 'max', 'mean', 'median']).rename(columns={'size': 'valid_count'})
+    ]
+    
+    columns.extend(grouped.quantile(q).rename(f"p{round(q * 100)}") for q in percentiles)
+    
+    # トリム平均: グループ内の価格順の位置で両端を除く
+    ordered = valid.sort_values(_GROUP_COLUMNS + ['price'])
+    position = ordered.groupby(_GROUP_COLUMNS, observed=True).cumcount()
+    size = ordered.groupby(_GROUP_COLUMNS, observed=True)['price'].transform('size')
+    cut = np.floor(size * trim)
+    kept = ordered[(position >= cut) & (position < size - cut)]
+    columns.append(kept.groupby(_GROUP_COLUMNS, observed=True)['price'].mean().rename('trimmed_mean'))
+    
+    # IQRによる外れ値除去: グループごとの四分位を各行に結合して判定
+    quartiles = pd.concat([grouped.quantile(0.25).rename('q1'), grouped.quantile(0.75).rename('q3')], axis=1)
+    bounds = valid.join(quartiles, on=_GROUP_COLUMNS)
+    iqr = bounds['q3'] - bounds['q1']
+    inliers = valid[(bounds['price'] >= bounds['q1'] - iqr_multiplier * iqr) &
+                    (bounds['price'] <= bounds['q3'] + iqr_multiplier * iqr)]
+    filtered = inliers.groupby(_GROUP_COLUMNS, observed=True)['price'].agg(['size', 'mean', 'median'])
+    filtered.columns = ['inlier_count', 'filtered_mean', 'filtered_median']
+    columns.append(filtered)
+    
+    per_kind = pd.concat(columns, axis=1)
+    per_kind['outliers'] = per_kind['valid_count'].fillna(0) - per_kind['inlier_count'].fillna(0)
+    per_kind = per_kind.drop(columns='inlier_count')
+    
+    # 種別ごとの列に展開（片方の種別しかない場合も列をそろえる）
+    stats = per_kind.unstack('kind')
+    stats = stats.reindex(columns=pd.MultiIndex.from_product([per_kind.columns, KINDS]))
+    stats.columns = [f"{kind}_{stat}" for stat, kind in stats.columns]
+    for kind in KINDS:
+        for column in ('count', 'valid_count', 'outliers'):
+            stats[f"{kind}_{column}"] = stats[f"{kind}_{column}"].fillna(0).astype(int)
+    
+    # 売り切れ価格（外れ値除去後の中央値）と出品中の最安値の差
+    stats['sold_active_spread'] = stats['sold_filtered_median'] - stats['active_min']
+    stats['sold_active_spread_ratio'] = stats['sold_active_spread'] / stats['active_min']
+    
+    stats.index.name = 'keyword'
+    return stats
+
+
+def item_stats(stats: pd.DataFrame, lowest_active_key: str = 'lowest_active_price') -> Dict[str, Dict[str, Any]]:
+    """
+    コレクターのアイテムに付与する統計値（従来の項目）をキーワードごとに返します。
+    
+    Args:
+        stats: compute_price_stats の出力
+        lowest_active_key: 出品中の最安値の項目名
+    
+    Returns:
+        Dict[str, Dict[str, Any]]: キーワード -> lowest_active_key, active_listings_count,
+                                   avg_sold_price, median_sold_price, sold_count
+    """
+    legacy = pd.DataFrame({
+        lowest_active_key: stats['active_min'].fillna(0),
+        'active_listings_count': stats['active_count'],
+        'avg_sold_price': stats['sold_mean'].fillna(0).round(2),
+        'median_sold_price': stats['sold_median'].fillna(0).round(2),
+        'sold_count': stats['sold_count']
+    })
+    return {
+        keyword: {key: value.item() if hasattr(value, 'item') else value for key, value in row.items()}
+        for keyword, row in legacy.to_dict('index').items()
+    }
+
+
+def annotate_items(items: List[Dict[str, Any]], stats: pd.DataFrame, keyword: Optional[str] = None,
+                   keyword_key: str = 'search_term', lowest_active_key: str = 'lowest_active_price') -> List[Dict[str, Any]]:
+    """
+    アイテムにキーワードの統計値を付与します。
+    
+    Args:
+        items: 対象アイテム（そのまま更新）
+        stats: compute_price_stats の出力
+        keyword: すべてのアイテムに使うキーワード（省略時は keyword_key の値）
+        keyword_key: キーワードのキー
+        lowest_active_key: 出品中の最安値の項目名
+    
+    Returns:
+        List[Dict[str, Any]]: 統計値を付与したアイテム
+    """
+    by_keyword = item_stats(stats, lowest_active_key)
+    for item in items:
+        fields = by_keyword.get(keyword if keyword is not None else item.get(keyword_key))
+        if fields:
+            item.update(fields)
+    return items
@@ -0,0 +1,122 @@
+"""
+レート制限ユーティリティ
+プラットフォームごとのトークンバケットでAPIリクエストの送信間隔を制御します。
+同じプロセス内のスレッド（並列ページ取得など）は同じバケットを共有します。
+"""
+
+import time
+import threading
+import logging
+from typing import Dict, Any
+
+from .config import get_optional_config
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """トークンバケット方式のレート制限"""
+    
+    def __init__(self, name: str, rate: float, burst: int = 1):
+        """
+        初期化
+        
+        Args:
+            name: レート制限名（プラットフォーム名）
+            rate: 1秒あたりに許可するリクエスト数
+            burst: 連続して送信できるリクエスト数の上限
+        """
+        self.name = name
+        self.rate = max(rate, 0.001)
+        self.burst = max(1, burst)
+        
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """
+        リクエスト1件分の送信枠を取得します（枠が空くまで待機）。
+        
+        Returns:
+            float: 待機した秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                
+                wait_time = (1.0 - self._tokens) / self.rate
+            
+            time.sleep(wait_time)
+            waited += wait_time
+    
+    def try_acquire(self) -> bool:
+        """
+        送信枠が空いていれば1件分を取得します（待機しない）。
+        
+        Returns:
+            bool: 取得できた場合True
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        レート制限の状態情報を取得します。
+        
+        Returns:
+            Dict[str, Any]: 状態情報
+        """
+        with self._lock:
+            return {
+                'name': self.name,
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': round(self._tokens, 2)
+            }
+
+
+# プラットフォーム別レート制限のレジストリ
+_rate_limiters: Dict[str, RateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, default_rate: float = 5.0, default_burst: int = 5) -> RateLimiter:
+    """
+    プラットフォーム名に対応するRateLimiterを取得します（プロセス内で共有）。
+    RATE_LIMIT_{NAME}_PER_SECOND / RATE_LIMIT_{NAME}_BURST 環境変数で調整できます。
+    
+    Args:
+        name: プラットフォーム名（例: 'yahoo_shopping'）
+        default_rate: 環境変数未設定時の1秒あたりのリクエスト数
+        default_burst: 環境変数未設定時の連続送信数の上限
+    
+    Returns:
+        RateLimiter: レート制限
+    """
+    limiter = _rate_limiters.get(name)
+    if limiter is not None:
+        return limiter
+    
+    with _registry_lock:
+        if name not in _rate_limiters:
+            _rate_limiters[name] = RateLimiter(
+                name,
+                rate=float(get_optional_config(f"RATE_LIMIT_{name.upper()}_PER_SECOND", str(default_rate))),
+                burst=int(get_optional_config(f"RATE_LIMIT_{name.upper()}_BURST", str(default_burst))),
+            )
+        return _rate_limiters[name]
@@ -0,0 +1,402 @@
+"""
+データ保持期間ユーティリティ
+保持期間を過ぎた行を、タイムスタンプ列のインデックスに沿って一定件数ずつ削除します。
+1回の削除を小さなトランザクションに抑え、削除の合間に待機を入れることで、
+大きなテーブルでも長時間のロックやWALの急増を避けます。削除した行は返さず件数だけを受け取ります。
+
+削除は SUPABASE_DB_URL（PostgreSQL接続文字列）が設定されていて psycopg2 が利用できる場合は直接SQLで、
+それ以外の場合は Supabase（PostgREST）経由で行います。直接接続の場合、範囲パーティション化された
+テーブルでは境界がカットオフより前のパーティションを切り離して削除します（行単位の削除は不要）。
+"""
+
+import os
+import re
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from .config import get_optional_config
+from .supabase_client import execute_with_client
+
+try:
+    import psycopg2
+    from psycopg2 import sql as psycopg2_sql
+except ImportError:  # PostgREST経由でのみ削除する
+    psycopg2 = None
+
+try:
+    from postgrest.types import ReturnMethod
+except ImportError:  # 古いpostgrestでは削除した行が返される
+    ReturnMethod = None
+
+logger = logging.getLogger(__name__)
+
+# パーティションの上限値（FOR VALUES FROM (...) TO ('...')）
+_PARTITION_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+class RetentionCheckpoint:
+    """保持期間ジョブの進捗（カットオフと削除件数）を記録するファイル"""
+    
+    def __init__(self, path: str, table: str, timestamp_column: str):
+        """
+        初期化
+        
+        Args:
+            path: チェックポイントファイルのパス
+            table: 対象テーブル名
+            timestamp_column: 保持期間の判定に使う列
+        """
+        self.path = path
+        self.table = table
+        self.timestamp_column = timestamp_column
+        self.cutoff: Optional[str] = None
+        self.deleted = 0
+        self.batches = 0
+        self.dropped_partitions: List[str] = []
+        self.completed = False
+    
+    def load(self) -> bool:
+        """
+        未完了のチェックポイントを読み込みます（対象が異なる場合や完了済みの場合は無視）。
+        
+        Returns:
+            bool: 再開可能なチェックポイントを読み込んだ場合True
+        """
+        if not os.path.exists(self.path):
+            return False
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"チェックポイントの読み込みに失敗しました: {e}")
+            return False
+        
+        if data.get('table') != self.table or data.get('timestamp_column') != self.timestamp_column:
+            logger.warning("チェックポイントの対象が異なるため、新しいカットオフで削除します")
+            return False
+        if data.get('completed'):
+            return False
+        
+        self.cutoff = data.get('cutoff')
+        self.deleted = int(data.get('deleted', 0))
+        self.batches = int(data.get('batches', 0))
+        self.dropped_partitions = list(data.get('dropped_partitions') or [])
+        return self.cutoff is not None
+    
+    def save(self) -> None:
+        """チェックポイントを保存します（一時ファイル経由で置き換え）。"""
+        data = {
+            'table': self.table,
+            'timestamp_column': self.timestamp_column,
+            'cutoff': self.cutoff,
+            'deleted': self.deleted,
+            'batches': self.batches,
+            'dropped_partitions': self.dropped_partitions,
+            'completed': self.completed,
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+class PostgrestChunkDeleter:
+    """Supabase（PostgREST）経由で、IDを指定して一定件数ずつ削除する"""
+    
+    def __init__(self, table: str, timestamp_column: str, id_column: str = 'id',
+                 ids_per_request: Optional[int] = None):
+        """
+        初期化
+        
+        Args:
+            table: 対象テーブル名
+            timestamp_column: 保持期間の判定に使う列
+            id_column: 行を特定する列
+            ids_per_request: 1回の削除リクエストで指定するIDの数（省略時は RETENTION_POSTGREST_IDS_PER_REQUEST）。
+                             IDはURLのクエリ文字列で渡すため、UUIDを数百件以上指定すると 414 URI Too Long になる
+        """
+        self.table = table
+        self.timestamp_column = timestamp_column
+        self.id_column = id_column
+        self.ids_per_request = ids_per_request or int(get_optional_config("RETENTION_POSTGREST_IDS_PER_REQUEST", "100"))
+    
+    def delete_chunk(self, cutoff: str, limit: int) -> int:
+        """
+        カットオフより古い行を最大limit件削除します。
+        
+        Args:
+            cutoff: カットオフ日時（ISO形式）
+            limit: 削除する最大件数
+        
+        Returns:
+            int: 削除した件数（0の場合は対象なし）
+        """
+        # タイムスタンプ列のインデックスに沿って古い順にIDだけを取得
+        result = execute_with_client(
+            lambda client: client.table(self.table).select(self.id_column)
+            .lt(self.timestamp_column, cutoff).order(self.timestamp_column).limit(limit).execute()
+        )
+        ids = [row[self.id_column] for row in (result.data or [])]
+        if not ids:
+            return 0
+        
+        # URLが長くなりすぎないよう、IDを分けて削除する
+        deleted = 0
+        for start in range(0, len(ids), self.ids_per_request):
+            deleted += self._delete_ids(ids[start:start + self.ids_per_request])
+        return deleted
+    
+    def _delete_ids(self, ids: List[Any]) -> int:
+        """指定したIDの行を削除し、削除した件数を返す"""
+        # 削除した行は返さず件数だけを受け取る
+        if ReturnMethod is not None:
+            request = lambda client: client.table(self.table).delete(count='exact', returning=ReturnMethod.minimal) \
+                .in_(self.id_column, ids).execute()
+        else:
+            request = lambda client: client.table(self.table).delete(count='exact').in_(self.id_column, ids).execute()
+        result = execute_with_client(request)
+        
+        if result.count is not None:
+            return result.count
+        return len(result.data) if result.data else len(ids)
+    
+    def drop_expired_partitions(self, cutoff: str) -> Tuple[List[str], int]:
+        """PostgREST経由ではパーティションを操作できないため何もしない"""
+        return [], 0
+    
+    def close(self) -> None:
+        """何もしない（接続はSupabaseクライアントが管理）"""
+
+
+class PostgresChunkDeleter:
+    """PostgreSQLへ直接接続し、一定件数ずつ削除する"""
+    
+    def __init__(self, dsn: str, table: str, timestamp_column: str, id_column: str = 'id'):
+        """
+        初期化
+        
+        Args:
+            dsn: PostgreSQL接続文字列
+            table: 対象テーブル名
+            timestamp_column: 保持期間の判定に使う列
+            id_column: 行を特定する列
+        """
+        if psycopg2 is None:
+            raise RuntimeError("psycopg2がインストールされていません")
+        
+        self.dsn = dsn
+        self.table = table
+        self.timestamp_column = timestamp_column
+        self.id_column = id_column
+        self._connection = None
+    
+    def _connect(self):
+        """接続を取得"""
+        if self._connection is None or self._connection.closed:
+            self._connection = psycopg2.connect(self.dsn)
+        return self._connection
+    
+    def delete_chunk(self, cutoff: str, limit: int) -> int:
+        """
+        カットオフより古い行を最大limit件、1トランザクションで削除します。
+        
+        Args:
+            cutoff: カットオフ日時（ISO形式）
+            limit: 削除する最大件数
+        
+        Returns:
+            int: 削除した件数（0の場合は対象なし）
+        """
+        query = psycopg2_sql.SQL(
+            "DELETE FROM {table} WHERE {id} IN ("
+            "SELECT {id} FROM {table} WHERE {column} < %s ORDER BY {column} LIMIT %s)"
+        ).format(
+            table=psycopg2_sql.Identifier(self.table),
+            id=psycopg2_sql.Identifier(self.id_column),
+            column=psycopg2_sql.Identifier(self.timestamp_column)
+        )
+        
+        connection = self._connect()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (cutoff, limit))
+                deleted = cursor.rowcount
+            connection.commit()
+            return deleted
+        except Exception:
+            connection.rollback()
+            raise
+    
+    def drop_expired_partitions(self, cutoff: str) -> Tuple[List[str], int]:
+        """
+        上限がカットオフ以前のパーティションを切り離して削除します（テーブルがパーティション化されていない場合は何もしない）。
+        
+        Args:
+            cutoff: カットオフ日時（ISO形式）
+        
+        Returns:
+            Tuple[List[str], int]: 削除したパーティション名、含まれていた行数（統計情報による推定値）
+        """
+        connection = self._connect()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples "
+                    "FROM pg_inherits "
+                    "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                    "WHERE parent.relname = %s",
+                    (self.table,)
+                )
+                partitions = cursor.fetchall()
+                
+                # 境界値の比較はPostgreSQLに任せる（タイムゾーン表記の違いを吸収するため）
+                expired = []
+                for name, bound, estimated_rows in partitions:
+                    match = _PARTITION_UPPER_BOUND.search(bound or '')
+                    if not match:  # DEFAULTパーティションやMAXVALUE
+                        continue
+                    cursor.execute("SELECT %s::timestamptz <= %s::timestamptz", (match.group(1), cutoff))
+                    if cursor.fetchone()[0]:
+                        expired.append((name, max(0, int(estimated_rows))))
+            connection.commit()
+            
+            dropped, rows = [], 0
+            for name, estimated_rows in sorted(expired):
+                with connection.cursor() as cursor:
+                    cursor.execute(psycopg2_sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                        psycopg2_sql.Identifier(self.table), psycopg2_sql.Identifier(name)))
+                    cursor.execute(psycopg2_sql.SQL("DROP TABLE {}").format(psycopg2_sql.Identifier(name)))
+                connection.commit()
+                logger.info(f"Dropped partition {name} of {self.table} (~{estimated_rows} rows)")
+                dropped.append(name)
+                rows += estimated_rows
+            return dropped, rows
+        except Exception:
+            connection.rollback()
+            raise
+    
+    def close(self) -> None:
+        """接続を閉じます。"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class RetentionJob:
+    """保持期間を過ぎた行を一定件数ずつ削除するジョブ"""
+    
+    def __init__(self, table: str, timestamp_column: str, id_column: str = 'id',
+                 batch_size: Optional[int] = None, pause_seconds: Optional[float] = None,
+                 drop_partitions: bool = False, dsn: Optional[str] = None):
+        """
+        初期化
+        
+        Args:
+            table: 対象テーブル名
+            timestamp_column: 保持期間の判定に使う列（インデックスがあること）
+            id_column: 行を特定する列
+            batch_size: 1回に削除する件数（省略時は RETENTION_BATCH_SIZE）
+            pause_seconds: 削除の合間に待機する秒数（省略時は RETENTION_PAUSE_SECONDS）
+            drop_partitions: Trueの場合、期限切れのパーティションを削除してから行を削除
+            dsn: PostgreSQL接続文字列（省略時は SUPABASE_DB_URL、未設定ならPostgREST経由）
+        """
+        self.table = table
+        self.timestamp_column = timestamp_column
+        self.batch_size = batch_size or int(get_optional_config("RETENTION_BATCH_SIZE", "1000"))
+        self.pause_seconds = pause_seconds if pause_seconds is not None else \
+            float(get_optional_config("RETENTION_PAUSE_SECONDS", "0.2"))
+        self.drop_partitions = drop_partitions
+        
+        dsn = dsn or get_optional_config("SUPABASE_DB_URL", "")
+        if dsn and psycopg2 is not None:
+            self.deleter = PostgresChunkDeleter(dsn, table, timestamp_column, id_column)
+        else:
+            if drop_partitions:
+                logger.warning("パーティションの削除にはPostgreSQLへの直接接続が必要なため、行単位で削除します")
+            self.deleter = PostgrestChunkDeleter(table, timestamp_column, id_column)
+    
+    def run(self, cutoff: datetime, checkpoint_path: Optional[str] = None, restart: bool = False,
+            max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """
+        カットオフより古い行を削除します。
+        チェックポイントを指定した場合、中断したジョブは前回のカットオフと件数を引き継いで再開します。
+        
+        Args:
+            cutoff: カットオフ日時（これより古い行を削除）
+            checkpoint_path: チェックポイントファイルのパス（省略時は記録しない）
+            restart: Trueの場合、チェックポイントを無視して新しいカットオフで削除
+            max_batches: 今回の実行で削除する最大回数（到達した場合は未完了として終了）
+        
+        Returns:
+            Dict[str, Any]: cutoff, deleted（削除件数）, batches（削除回数）,
+                dropped_partitions（削除したパーティション）, completed（すべて削除したか）
+        """
+        checkpoint = RetentionCheckpoint(checkpoint_path, self.table, self.timestamp_column) \
+            if checkpoint_path else None
+        if checkpoint is not None and not restart and checkpoint.load():
+            logger.info(f"Resuming retention of {self.table} from checkpoint "
+                        f"(cutoff {checkpoint.cutoff}, {checkpoint.deleted} rows deleted)")
+            cutoff_value = checkpoint.cutoff
+            deleted, batches = checkpoint.deleted, checkpoint.batches
+            dropped_partitions = checkpoint.dropped_partitions
+        else:
+            cutoff_value = cutoff.isoformat()
+            deleted, batches, dropped_partitions = 0, 0, []
+        
+        def record(completed: bool) -> None:
+            if checkpoint is None:
+                return
+            checkpoint.cutoff = cutoff_value
+            checkpoint.deleted = deleted
+            checkpoint.batches = batches
+            checkpoint.dropped_partitions = dropped_partitions
+            checkpoint.completed = completed
+            checkpoint.save()
+        
+        completed = False
+        run_batches = 0
+        try:
+            if self.drop_partitions:
+                dropped, partition_rows = self.deleter.drop_expired_partitions(cutoff_value)
+                dropped_partitions = dropped_partitions + dropped
+                deleted += partition_rows
+                record(False)
+            
+            while max_batches is None or run_batches < max_batches:
+                count = self.deleter.delete_chunk(cutoff_value, self.batch_size)
+                if count <= 0:
+                    completed = True
+                    break
+                
+                deleted += count
+                batches += 1
+                run_batches += 1
+                record(False)
+                
+                if count < self.batch_size:
+                    completed = True
+                    break
+                if self.pause_seconds > 0:
+                    time.sleep(self.pause_seconds)
+            
+            record(completed)
+        finally:
+            self.deleter.close()
+        
+        logger.info(f"Retention of {self.table} ({self.timestamp_column} < {cutoff_value}): "
+                    f"deleted {deleted} rows in {batches} batches"
+                    f"{'' if completed else ' (incomplete)'}")
+        return {
+            'table': self.table,
+            'cutoff': cutoff_value,
+            'deleted': deleted,
+            'batches': batches,
+            'dropped_partitions': dropped_partitions,
+            'completed': completed
+        }
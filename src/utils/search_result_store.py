@@ -0,0 +1,165 @@
+"""
+検索結果の一括保存ユーティリティ
+search_results テーブルへの保存を (task_id, platform, item_id) をキーにした差分upsertで行います。
+各行の内容ハッシュを保存しておき、再実行時は内容が変わった行だけを書き込み、
+今回の結果に含まれなくなった行だけを削除します。
+"""
+
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+from .config import get_optional_config
+from .supabase_client import bulk_upsert_data
+
+logger = logging.getLogger(__name__)
+
+SEARCH_RESULTS_TABLE = 'search_results'
+SEARCH_RESULTS_CONFLICT_COLUMNS = 'task_id,platform,item_id'
+
+# 内容ハッシュの計算から除外するカラム（書き込みのたびに変わる値）
+_VOLATILE_COLUMNS = frozenset({'id', 'created_at', 'updated_at', 'expires_at', 'content_hash'})
+
+# 既存行を読み込む際の1リクエストあたりの件数
+_FETCH_PAGE_SIZE = 1000
+
+
+def derive_item_id(item: Dict[str, Any]) -> str:
+    """
+    検索結果アイテムのプラットフォーム内で一意なIDを求めます。
+    
+    Args:
+        item: 検索結果アイテム
+    
+    Returns:
+        str: 商品ID（なければURL、URLもなければタイトルと価格のハッシュ）
+    """
+    for key in ('item_id', 'id', 'item_url', 'url'):
+        value = item.get(key)
+        if value:
+            return str(value)
+    
+    fallback = f"{item.get('item_title', item.get('title', ''))}|{item.get('base_price', item.get('price', ''))}"
+    return hashlib.sha1(fallback.encode('utf-8')).hexdigest()[:16]
+
+
+def compute_row_hash(row: Dict[str, Any]) -> str:
+    """
+    行の内容ハッシュを計算します（書き込みのたびに変わるカラムは除外）。
+    
+    Args:
+        row: search_results に保存する行
+    
+    Returns:
+        str: 内容ハッシュ
+    """
+    content = {key: value for key, value in row.items() if key not in _VOLATILE_COLUMNS}
+    serialized = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+
+def _fetch_existing_rows(client, task_id: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """タスクの既存行のキーと内容ハッシュを読み込む"""
+    existing: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    start = 0
+    while True:
+        result = client.table(SEARCH_RESULTS_TABLE).select('id,platform,item_id,content_hash') \
+            .eq('task_id', task_id).range(start, start + _FETCH_PAGE_SIZE - 1).execute()
+        rows = result.data or []
+        for row in rows:
+            existing[(row.get('platform'), row.get('item_id'))] = row
+        if len(rows) < _FETCH_PAGE_SIZE:
+            return existing
+        start += _FETCH_PAGE_SIZE
+
+
+def _refresh_expiry(client, row_ids: List[Any], expires_at: str, chunk_size: int) -> None:
+    """内容が変わらない行の有効期限だけを延長する（チャンクごとに1回のupdate）"""
+    fields = {'expires_at': expires_at, 'updated_at': datetime.now().isoformat()}
+    for start in range(0, len(row_ids), chunk_size):
+        client.table(SEARCH_RESULTS_TABLE).update(fields).in_('id', row_ids[start:start + chunk_size]).execute()
+
+
+def unchanged_expiry(rows: Iterable[Dict[str, Any]]) -> Optional[str]:
+    """
+    内容が変わらない行に設定する有効期限を返します。
+    有効期限は内容ハッシュに含めないため、再実行時は行を書き込まずに有効期限だけを延長します。
+    
+    Args:
+        rows: 内容が変わらない行
+    
+    Returns:
+        Optional[str]: 行の有効期限のうち最も遅いもの（有効期限を持つ行がない場合はNone）
+    """
+    expiries = [str(row['expires_at']) for row in rows if row.get('expires_at')]
+    return max(expiries) if expiries else None
+
+
+def _delete_rows(client, row_ids: List[Any], chunk_size: int) -> int:
+    """IDを指定して行を削除する（チャンクごと）"""
+    deleted = 0
+    for start in range(0, len(row_ids), chunk_size):
+        chunk = row_ids[start:start + chunk_size]
+        client.table(SEARCH_RESULTS_TABLE).delete().in_('id', chunk).execute()
+        deleted += len(chunk)
+    return deleted
+
+
+def save_task_results(client, task_id: str, rows: Iterable[Dict[str, Any]],
+                      chunk_size: Optional[int] = None, max_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    タスクの検索結果を差分upsertで保存します。
+    
+    Args:
+        client: Supabaseクライアント
+        task_id: タスクID
+        rows: 保存する行（task_id, platform, item_id を含む）
+        chunk_size: 1リクエストあたりの件数（省略時は SEARCH_RESULTS_UPSERT_CHUNK_SIZE）
+        max_workers: 同時に送信するリクエスト数（省略時は SEARCH_RESULTS_UPSERT_WORKERS）
+    
+    Returns:
+        Dict[str, int]: upserted（書き込み件数）, unchanged（変更なし）, deleted（削除件数）, failed（失敗件数）
+    
+    Raises:
+        Exception: 既存行の読み込み、またはupsertに失敗した場合
+    """
+    chunk_size = chunk_size or int(get_optional_config("SEARCH_RESULTS_UPSERT_CHUNK_SIZE", "500"))
+    max_workers = max_workers or int(get_optional_config("SEARCH_RESULTS_UPSERT_WORKERS", "4"))
+    
+    # 同じキーの行は後のものを優先して1行にまとめる
+    new_rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in rows:
+        row = dict(row, task_id=task_id)
+        row['content_hash'] = compute_row_hash(row)
+        new_rows[(row['platform'], row['item_id'])] = row
+    
+    existing = _fetch_existing_rows(client, task_id)
+    
+    changed = [row for key, row in new_rows.items()
+               if existing.get(key, {}).get('content_hash') != row['content_hash']]
+    unchanged_keys = [key for key, row in new_rows.items()
+                      if existing.get(key, {}).get('content_hash') == row['content_hash']]
+    unchanged = len(unchanged_keys)
+    
+    result = bulk_upsert_data(
+        SEARCH_RESULTS_TABLE, changed, SEARCH_RESULTS_CONFLICT_COLUMNS,
+        chunk_size=chunk_size, max_workers=max_workers, client=client
+    )
+    if result['status'] != 'success':
+        raise Exception(result['message'])
+    
+    # 内容が変わらない行も、初回の有効期限で削除されないよう期限を延長
+    expires_at = unchanged_expiry(new_rows[key] for key in unchanged_keys)
+    if expires_at:
+        row_ids = [existing[key]['id'] for key in unchanged_keys if existing[key].get('id')]
+        _refresh_expiry(client, row_ids, expires_at, chunk_size)
+    
+    # 今回の結果に含まれなくなった行を削除
+    stale_ids = [row['id'] for key, row in existing.items() if key not in new_rows and row.get('id')]
+    deleted = _delete_rows(client, stale_ids, chunk_size) if stale_ids else 0
+    
+    stats = {'upserted': result['count'], 'unchanged': unchanged, 'deleted': deleted, 'failed': result['failed']}
+    logger.info(f"Saved search results for task {task_id}: {stats}")
+    return stats
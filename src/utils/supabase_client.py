@@ -2,16 +2,101 @@
 Supabaseクライアントユーティリティ
 
 Supabaseとの接続を管理し、データベース操作を行うためのユーティリティ関数を提供します。
+
+PostgRESTへのHTTP接続はプロセス内で共有するコネクションプール（keep-alive）を使用します。
+クライアントを作り直しても接続プールは維持されるため、再接続が集中することはありません。
+失敗したリクエストはエラーの種類で分類し、一時的なエラーだけをジッター付きの指数バックオフで再試行します。
+クライアントを作り直すのは認証エラーと接続エラーの場合だけです。
 """
 
 import os
-from typing import Dict, List, Any, Optional
+import time
+import socket
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Optional, Tuple
 from supabase import create_client, Client
-from .config import get_config
-from tenacity import retry, stop_after_attempt, wait_exponential
+from .config import get_config, get_optional_config
+from .id_filter import SeenIdFilter
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+try:
+    import httpx
+except ImportError:  # postgrestの既定のHTTPクライアントを使用する
+    httpx = None
+
+logger = logging.getLogger(__name__)
 
 # グローバルクライアントインスタンス
 _supabase_client: Optional[Client] = None
+_client_lock = threading.Lock()
+_last_reset_at = 0.0
+
+# 共有HTTPトランスポート（コネクションプール）
+_http_transport = None
+_transport_lock = threading.Lock()
+
+# エラーの分類
+ERROR_AUTH = 'auth'              # 認証エラー（クライアントを作り直して再試行）
+ERROR_CONNECTION = 'connection'  # 接続エラー（クライアントを作り直して再試行）
+ERROR_TRANSIENT = 'transient'    # 一時的なエラー（そのまま再試行）
+ERROR_FATAL = 'fatal'            # 再試行しても成功しないエラー
+
+# 再試行するHTTPステータス
+_TRANSIENT_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# 再試行するPostgreSQLのエラーコード（直列化失敗、デッドロック、文のタイムアウト、接続数超過など）
+_TRANSIENT_PG_CODES = frozenset({'40001', '40P01', '55P03', '57014', '53300', '57P01', '08000', '08003', '08006'})
+
+# 認証エラーを表すPostgRESTのエラーコード（JWTの期限切れなど）
+_AUTH_ERROR_CODES = frozenset({'PGRST300', 'PGRST301', 'PGRST302', '28000', '28P01'})
+
+# 再試行の設定
+SUPABASE_RETRY_ATTEMPTS = int(get_optional_config("SUPABASE_RETRY_ATTEMPTS", "4"))
+SUPABASE_RETRY_MAX_WAIT = float(get_optional_config("SUPABASE_RETRY_MAX_WAIT", "10"))
+
+
+def _get_http_transport():
+    """
+    PostgREST用の共有HTTPトランスポートを取得します（httpxがない場合はNone）。
+    SUPABASE_POOL_MAX_CONNECTIONS / SUPABASE_POOL_MAX_KEEPALIVE / SUPABASE_POOL_KEEPALIVE_EXPIRY で調整できます。
+    """
+    global _http_transport
+    if httpx is None:
+        return None
+    if _http_transport is None:
+        with _transport_lock:
+            if _http_transport is None:
+                limits = httpx.Limits(
+                    max_connections=int(get_optional_config("SUPABASE_POOL_MAX_CONNECTIONS", "20")),
+                    max_keepalive_connections=int(get_optional_config("SUPABASE_POOL_MAX_KEEPALIVE", "10")),
+                    keepalive_expiry=float(get_optional_config("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+                )
+                _http_transport = httpx.HTTPTransport(limits=limits)
+    return _http_transport
+
+
+def _use_pooled_transport(client: Client) -> None:
+    """クライアントのPostgRESTセッションを共有トランスポートを使うセッションに置き換える"""
+    transport = _get_http_transport()
+    if transport is None:
+        return
+    
+    try:
+        postgrest = client.postgrest
+        session = postgrest.session
+        postgrest.session = httpx.Client(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=float(get_optional_config("SUPABASE_HTTP_TIMEOUT", "30")),
+            transport=transport
+        )
+        # 置き換え前のセッションは共有トランスポートを持たないので閉じてよい
+        session.close()
+    except Exception as e:
+        logger.warning(f"Failed to attach pooled HTTP transport to Supabase client: {e}")
+
 
 def get_supabase_client() -> Client:
     """
@@ -26,39 +111,158 @@ def get_supabase_client() -> Client:
     global _supabase_client
     
     if _supabase_client is None:
-        supabase_url = get_config("SUPABASE_URL")
-        supabase_key = get_config("SUPABASE_SERVICE_KEY") or get_config("SUPABASE_ANON_KEY")
-        
-        if not supabase_url or not supabase_key:
-            raise ValueError("Supabase接続情報が設定されていません。.envファイルを確認してください。")
-        
-        _supabase_client = create_client(
-            supabase_url, 
-            supabase_key,
-            options={
-                'schema': 'public',
-                'headers': {'x-my-custom-header': 'buy_records'},
-                'autoRefreshToken': True,
-                'persistSession': True,
-                'detectSessionInUrl': False
-            }
-        )
+        with _client_lock:
+            if _supabase_client is None:
+                supabase_url = get_config("SUPABASE_URL")
+                supabase_key = get_config("SUPABASE_SERVICE_KEY") or get_config("SUPABASE_ANON_KEY")
+                
+                if not supabase_url or not supabase_key:
+                    raise ValueError("Supabase接続情報が設定されていません。.envファイルを確認してください。")
+                
+                client = create_client(
+                    supabase_url, 
+                    supabase_key,
+                    options={
+                        'schema': 'public',
+                        'headers': {'x-my-custom-header': 'buy_records'},
+                        'autoRefreshToken': True,
+                        'persistSession': True,
+                        'detectSessionInUrl': False
+                    }
+                )
+                _use_pooled_transport(client)
+                _supabase_client = client
     
     return _supabase_client
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10)
+
+def reset_supabase_client(force: bool = False) -> bool:
+    """
+    共有クライアントを破棄し、次回の取得時に作り直します（接続プールは維持）。
+    多数のスレッドが同時に失敗した場合に作り直しが集中しないよう、
+    SUPABASE_RESET_COOLDOWN 秒以内の再リセットは行いません。
+    
+    Args:
+        force: Trueの場合、クールダウン中でもリセット
+    
+    Returns:
+        bool: リセットした場合True
+    """
+    global _supabase_client, _last_reset_at
+    cooldown = float(get_optional_config("SUPABASE_RESET_COOLDOWN", "5"))
+    with _client_lock:
+        now = time.monotonic()
+        if not force and now - _last_reset_at < cooldown:
+            return False
+        _supabase_client = None
+        _last_reset_at = now
+    logger.info("Reset Supabase client")
+    return True
+
+
+def _error_status_and_code(error: BaseException) -> Tuple[Optional[int], Optional[str]]:
+    """例外からHTTPステータスとエラーコードを取り出す"""
+    status = getattr(error, 'status_code', None)
+    response = getattr(error, 'response', None)
+    if status is None and response is not None:
+        status = getattr(response, 'status_code', None)
+    
+    code = getattr(error, 'code', None)
+    if code is None and error.args and isinstance(error.args[0], dict):
+        # postgrest.APIError は辞書を引数に持つ
+        code = error.args[0].get('code')
+    
+    try:
+        status = int(status) if status is not None else None
+    except (TypeError, ValueError):
+        status = None
+    # postgrestはHTTPステータスを code に入れることがある
+    if status is None and code is not None and str(code).isdigit() and len(str(code)) == 3:
+        status = int(code)
+    return status, str(code) if code is not None else None
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Supabaseへのリクエストで発生した例外を分類します。
+    
+    Args:
+        error: 例外
+    
+    Returns:
+        str: ERROR_AUTH / ERROR_CONNECTION / ERROR_TRANSIENT / ERROR_FATAL
+    """
+    if httpx is not None:
+        if isinstance(error, (httpx.ConnectError, httpx.RemoteProtocolError,
+                              httpx.ReadError, httpx.WriteError, httpx.CloseError)):
+            return ERROR_CONNECTION
+        if isinstance(error, httpx.TimeoutException):
+            # 接続の確立に失敗した場合は接続エラー、それ以外は混雑による一時的なエラー
+            return ERROR_CONNECTION if isinstance(error, httpx.ConnectTimeout) else ERROR_TRANSIENT
+    if isinstance(error, (ConnectionError, socket.gaierror)):
+        return ERROR_CONNECTION
+    if isinstance(error, (TimeoutError, socket.timeout)):
+        return ERROR_TRANSIENT
+    
+    status, code = _error_status_and_code(error)
+    if status in (401, 403) or code in _AUTH_ERROR_CODES:
+        return ERROR_AUTH
+    if status in _TRANSIENT_STATUS_CODES or code in _TRANSIENT_PG_CODES:
+        return ERROR_TRANSIENT
+    
+    message = str(error).lower()
+    if 'jwt expired' in message or 'invalid jwt' in message:
+        return ERROR_AUTH
+    return ERROR_FATAL
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """再試行で成功する可能性がある例外かどうか"""
+    return classify_error(error) != ERROR_FATAL
+
+
+def _before_retry(retry_state) -> None:
+    """再試行の前に、認証エラー・接続エラーの場合だけクライアントを作り直す"""
+    error = retry_state.outcome.exception()
+    kind = classify_error(error)
+    if kind in (ERROR_AUTH, ERROR_CONNECTION):
+        reset_supabase_client()
+    logger.warning(f"Supabase request failed ({kind}), retrying "
+                   f"(attempt {retry_state.attempt_number}/{SUPABASE_RETRY_ATTEMPTS}): {error}")
+
+
+_retry_policy = retry(
+    retry=retry_if_exception(is_retryable_error),
+    stop=stop_after_attempt(SUPABASE_RETRY_ATTEMPTS),
+    wait=wait_random_exponential(multiplier=0.5, max=SUPABASE_RETRY_MAX_WAIT),
+    before_sleep=_before_retry,
+    reraise=True
 )
+
+
+@_retry_policy
 def execute_with_retry(func, *args, **kwargs):
-    """リトライ機能付きの実行関数"""
-    try:
-        return func(*args, **kwargs)
-    except Exception as e:
-        # 接続エラーの場合、クライアントをリセット
-        global _supabase_client
-        _supabase_client = None
-        raise e
+    """
+    リトライ機能付きの実行関数
+    一時的なエラー・接続エラー・認証エラーだけを再試行し、それ以外のエラーはそのまま送出します。
+    """
+    return func(*args, **kwargs)
+
+
+@_retry_policy
+def execute_with_client(build_request: Callable[[Client], Any]) -> Any:
+    """
+    共有クライアントを渡してリクエストを実行します（再試行のたびに最新のクライアントを取得）。
+    認証エラーや接続エラーでクライアントを作り直した場合も、再試行は新しいクライアントで行われます。
+    
+    Args:
+        build_request: クライアントを受け取り、リクエストを実行して結果を返す関数
+    
+    Returns:
+        Any: リクエストの結果
+    """
+    return build_request(get_supabase_client())
+
 
 def check_connection() -> bool:
     """データベース接続の健全性をチェック"""
@@ -70,9 +274,9 @@ def check_connection() -> bool:
         return hasattr(result, 'data')
     except Exception as e:
         print(f"Connection check failed: {str(e)}")
-        # 接続をリセット
-        global _supabase_client
-        _supabase_client = None
+        # 認証エラー・接続エラーの場合だけ接続をリセット
+        if classify_error(e) in (ERROR_AUTH, ERROR_CONNECTION):
+            reset_supabase_client(force=True)
         return False
 
 def insert_data(table_name: str, data: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -134,45 +338,103 @@ def upsert_data(table_name: str, data: List[Dict[str, Any]], on_conflict: str) -
             "message": f"データ挿入または更新エラー: {str(e)}"
         }
 
-def get_existing_ids(table_name: str, id_column: str, search_term_column: Optional[str] = None, search_term: Optional[str] = None) -> List[str]:
+def bulk_upsert_data(table_name: str, data: List[Dict[str, Any]], on_conflict: str,
+                     chunk_size: int = 500, max_workers: int = 4,
+                     ignore_duplicates: bool = False, client: Optional[Client] = None) -> Dict[str, Any]:
     """
-    既存のIDリストを取得します。
+    大量のデータをチャンクに分け、並列にSupabaseテーブルへ挿入または更新します。
     
     Args:
         table_name: テーブル名
-        id_column: ID列名
-        search_term_column: 検索キーワード列名（省略可）
-        search_term: 検索キーワード（省略可）
+        data: 挿入または更新するデータのリスト
+        on_conflict: 競合判定に使用するカラム名（カンマ区切り）
+        chunk_size: 1リクエストあたりの件数
+        max_workers: 同時に送信するリクエスト数
+        ignore_duplicates: Trueの場合、競合した行は更新せずにスキップ（ON CONFLICT DO NOTHING）
+        client: 使用するSupabaseクライアント（省略時は共有クライアント）
         
     Returns:
-        List[str]: 既存のIDリスト
+        Dict[str, Any]: 挿入または更新結果（失敗したチャンクの件数と、書き込まれた行 rows を含む）
     """
-    try:
-        client = get_supabase_client()
-        query = client.table(table_name).select(id_column)
-        
-        if search_term_column and search_term:
-            query = query.eq(search_term_column, search_term)
-            
-        result = query.execute()
-        return [item[id_column] for item in result.data]
-    except Exception as e:
-        print(f"既存ID取得エラー: {str(e)}")
-        return []
+    if not data:
+        return {"count": 0, "failed": 0, "rows": [], "status": "success", "message": "データがありません"}
+    
+    chunks = [data[start:start + chunk_size] for start in range(0, len(data), chunk_size)]
+    written_rows: List[Dict[str, Any]] = []
+    
+    def upsert_chunk(chunk: List[Dict[str, Any]]) -> Tuple[int, Optional[str]]:
+        try:
+            request = lambda target: target.table(table_name).upsert(
+                chunk, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates
+            ).execute()
+            # クライアントの指定がない場合は、再試行のたびに共有クライアントを取得する
+            result = execute_with_retry(request, client) if client is not None else execute_with_client(request)
+            # 重複をスキップした場合は実際に挿入された行だけが返る
+            if result.data is None:
+                return len(chunk), None
+            written_rows.extend(result.data)
+            return len(result.data), None
+        except Exception as e:
+            return 0, str(e)
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        outcomes = list(executor.map(upsert_chunk, chunks))
+    
+    errors = [error for _, error in outcomes]
+    failed = sum(len(chunk) for chunk, error in zip(chunks, errors) if error)
+    count = sum(written for written, _ in outcomes)
+    if failed:
+        first_error = next(error for error in errors if error)
+        return {
+            "count": count,
+            "failed": failed,
+            "rows": written_rows,
+            "status": "error",
+            "message": f"{len(chunks)}チャンク中{sum(1 for error in errors if error)}チャンクの書き込みに失敗しました: {first_error}"
+        }
+    return {
+        "count": count,
+        "failed": 0,
+        "rows": written_rows,
+        "status": "success",
+        "message": f"{count}件のデータを{len(chunks)}チャンクで挿入または更新しました"
+    }
 
-def filter_new_items(data: List[Dict[str, Any]], existing_ids: List[str], id_key: str = "item_id") -> List[Dict[str, Any]]:
+def insert_new_items(table_name: str, data: List[Dict[str, Any]], id_column: str = "item_id",
+                     seen_ids: Optional[SeenIdFilter] = None, chunk_size: int = 500,
+                     max_workers: int = 4) -> Dict[str, Any]:
     """
-    新しいアイテムのみをフィルタリングします。
+    既存のIDと重複しないアイテムだけを挿入します（ON CONFLICT DO NOTHING）。
+    重複の判定はデータベース側で行うため、処理量はテーブルの件数ではなくバッチの件数に比例します。
     
     Args:
-        data: フィルタリングするデータのリスト
-        existing_ids: 既存のIDリスト
-        id_key: データ内のID項目のキー名
+        table_name: テーブル名
+        data: 挿入するデータのリスト
+        id_column: 一意制約のあるID列名
+        seen_ids: このプロセスで送信済みのIDフィルタ（指定した場合は送信前に除外し、送信後に登録）
+        chunk_size: 1リクエストあたりの件数
+        max_workers: 同時に送信するリクエスト数
         
     Returns:
-        List[Dict[str, Any]]: 新しいアイテムのリスト
+        Dict[str, Any]: 挿入結果（count は実際に挿入された件数、skipped は送信前に除外した件数、
+                        inserted_ids は実際に挿入されたアイテムのID）
     """
-    return [item for item in data if item.get(id_key) not in existing_ids]
+    if seen_ids is not None:
+        candidates = seen_ids.filter_unseen(data, id_column)
+    else:
+        candidates = list({str(item[id_column]): item for item in data if item.get(id_column) is not None}.values())
+    skipped = len(data) - len(candidates)
+    
+    result = bulk_upsert_data(
+        table_name, candidates, id_column,
+        chunk_size=chunk_size, max_workers=max_workers, ignore_duplicates=True
+    )
+    result["skipped"] = skipped
+    result["inserted_ids"] = [str(row[id_column]) for row in result.pop("rows") if row.get(id_column) is not None]
+    
+    if seen_ids is not None and result["status"] == "success":
+        seen_ids.add_many(item[id_column] for item in candidates)
+    return result
 
 def create_table_if_not_exists(sql_file_path: str) -> bool:
     """
@@ -0,0 +1,397 @@
+"""
+オフライン用語辞書（日本語→英語）
+ブランド名やカテゴリ名などの定型的な用語をトライ木で最長一致検索し、API呼び出しなしで翻訳します。
+辞書にない部分（残り）だけを翻訳APIに回せるよう、未翻訳の日本語部分も返します。
+辞書は翻訳キャッシュの履歴から構築できます。
+"""
+
+import os
+import re
+import json
+import threading
+import logging
+import unicodedata
+from typing import Dict, List, Optional, Tuple, Iterable
+
+from .config import get_optional_config
+
+logger = logging.getLogger(__name__)
+
+# トライ木で用語の終端を表すキー
+_TERMINAL = '\0'
+
+# ひらがな、カタカナ、漢字の連続部分
+_JAPANESE_RUN_PATTERN = re.compile(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF]+')
+
+
+def _script(char: str) -> str:
+    """文字の種類（hiragana, katakana, kanji, space, other）を返す"""
+    if char.isspace():
+        return 'space'
+    if '\u3040' <= char <= '\u309F':
+        return 'hiragana'
+    if '\u30A0' <= char <= '\u30FF':
+        return 'katakana'
+    if '\u4E00' <= char <= '\u9FAF':
+        return 'kanji'
+    return 'other'
+
+
+def _is_boundary(text: str, index: int) -> bool:
+    """indexの位置が語の境界（文字列の端、空白、文字の種類が変わる位置）かどうか"""
+    if index <= 0 or index >= len(text):
+        return True
+    before, after = _script(text[index - 1]), _script(text[index])
+    return before != after or before == 'space'
+
+# 組み込みの用語（ブランド名・カテゴリ名）
+BUILTIN_TERMS = {
+    # カテゴリ
+    '緑茶': 'green tea',
+    '紅茶': 'black tea',
+    'お茶': 'tea',
+    'ティー': 'tea',
+    'コーヒー': 'coffee',
+    'ジュース': 'juice',
+    'ウォーター': 'water',
+    'ソーダ': 'soda',
+    'コーラ': 'cola',
+    '炭酸水': 'sparkling water',
+    'ビール': 'beer',
+    '日本酒': 'sake',
+    'スナック': 'snack',
+    'お菓子': 'snacks',
+    'クッキー': 'cookie',
+    'ゲーム': 'game',
+    'プレステ': 'PlayStation',
+    'ブルーレイ': 'Blu-ray',
+    'アルバム': 'album',
+    '初回限定盤': 'limited first edition',
+    '限定盤': 'limited edition',
+    '通常盤': 'regular edition',
+    'レコード': 'record',
+    'フィギュア': 'figure',
+    'ぬいぐるみ': 'plush',
+    'カード': 'card',
+    '新品': 'new',
+    '中古': 'used',
+    '未開封': 'sealed',
+    # ブランド・メーカー
+    '任天堂': 'Nintendo',
+    'ニンテンドー': 'Nintendo',
+    'スイッチ': 'Switch',
+    'ソニー': 'Sony',
+    'プレイステーション': 'PlayStation',
+    'パナソニック': 'Panasonic',
+    'シャープ': 'Sharp',
+    'キヤノン': 'Canon',
+    'ニコン': 'Nikon',
+    'バンダイ': 'Bandai',
+    'タカラトミー': 'Takara Tomy',
+    'ポケモン': 'Pokemon',
+    'ポケットモンスター': 'Pokemon',
+    'サントリー': 'Suntory',
+    'キリン': 'Kirin',
+    'アサヒ': 'Asahi',
+    'サッポロ': 'Sapporo',
+    '伊藤園': 'Ito En',
+    '明治': 'Meiji',
+    '森永': 'Morinaga',
+    'カルビー': 'Calbee',
+}
+
+
+class TermDictionary:
+    """トライ木による日本語→英語の用語辞書"""
+    
+    def __init__(self, terms: Optional[Dict[str, str]] = None):
+        """
+        初期化
+        
+        Args:
+            terms: 日本語の用語 -> 英語訳
+        """
+        self._root: Dict[str, dict] = {}
+        self._size = 0
+        if terms:
+            self.update(terms)
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """照合用にテキストを正規化する（全角/半角の統一）"""
+        return unicodedata.normalize('NFKC', text or '')
+    
+    def add(self, term: str, translation: str) -> None:
+        """
+        用語を追加します（既存の用語は上書き）。
+        
+        Args:
+            term: 日本語の用語
+            translation: 英語訳
+        """
+        term = self._normalize(term).strip()
+        if not term or not translation:
+            return
+        
+        node = self._root
+        for char in term:
+            node = node.setdefault(char, {})
+        if _TERMINAL not in node:
+            self._size += 1
+        node[_TERMINAL] = translation.strip()
+    
+    def update(self, terms: Dict[str, str]) -> None:
+        """
+        複数の用語を追加します。
+        
+        Args:
+            terms: 日本語の用語 -> 英語訳
+        """
+        for term, translation in terms.items():
+            self.add(term, translation)
+    
+    def _matches(self, text: str, start: int) -> List[Tuple[int, str]]:
+        """start位置から始まる用語を長い順に探す（終了位置と英語訳を返す）"""
+        node = self._root
+        matches = []
+        for index in range(start, len(text)):
+            node = node.get(text[index])
+            if node is None:
+                break
+            if _TERMINAL in node:
+                matches.append((index + 1, node[_TERMINAL]))
+        return matches[::-1]
+    
+    def _match_to_boundary(self, text: str, start: int,
+                           memo: Dict[int, Optional[List[Tuple[int, int, str]]]]) -> Optional[List[Tuple[int, int, str]]]:
+        """
+        start位置から語の境界までを用語だけで埋める分割を探す（長い用語を優先）。
+        「コーラルピンク」の「コーラ」のように語の途中で終わる一致は、続きも用語で埋まる場合
+        （「ポケモンカード」など）にだけ採用する。
+        """
+        if start in memo:
+            return memo[start]
+        
+        memo[start] = None
+        for end, translation in self._matches(text, start):
+            if _is_boundary(text, end):
+                memo[start] = [(start, end, translation)]
+                break
+            rest = self._match_to_boundary(text, end, memo)
+            if rest:
+                memo[start] = [(start, end, translation)] + rest
+                break
+        return memo[start]
+    
+    def segment(self, text: str) -> List[Tuple[str, Optional[str]]]:
+        """
+        テキストを辞書の用語で分割します（左から最長一致）。
+        用語は語の境界（空白、文字の種類が変わる位置）から境界までを埋める場合だけ採用し、
+        語の一部だけに一致する部分は辞書にない日本語として残します。
+        
+        Args:
+            text: 対象テキスト
+        
+        Returns:
+            List[Tuple[str, Optional[str]]]: (元のテキスト, 英語訳) のリスト。
+                英数字などの日本語以外の部分はそのまま、辞書にない日本語部分の英語訳はNone
+        """
+        text = self._normalize(text)
+        segments: List[Tuple[str, Optional[str]]] = []
+        buffer: List[str] = []
+        
+        def flush():
+            if not buffer:
+                return
+            chunk = ''.join(buffer)
+            buffer.clear()
+            position = 0
+            for run in _JAPANESE_RUN_PATTERN.finditer(chunk):
+                if run.start() > position:
+                    segments.append((chunk[position:run.start()], chunk[position:run.start()]))
+                segments.append((run.group(), None))
+                position = run.end()
+            if position < len(chunk):
+                segments.append((chunk[position:], chunk[position:]))
+        
+        memo: Dict[int, Optional[List[Tuple[int, int, str]]]] = {}
+        index = 0
+        while index < len(text):
+            matches = self._match_to_boundary(text, index, memo)
+            if matches:
+                flush()
+                for start, end, translation in matches:
+                    segments.append((text[start:end], translation))
+                index = matches[-1][1]
+            else:
+                # 次の語の境界までを辞書にない部分として扱う
+                end = index + 1
+                while not _is_boundary(text, end):
+                    end += 1
+                buffer.extend(text[index:end])
+                index = end
+        flush()
+        
+        return segments
+    
+    @staticmethod
+    def join_segments(segments: Iterable[Tuple[str, Optional[str]]]) -> str:
+        """
+        分割結果を英語訳で連結します（英語訳がない部分は元のテキストを使用）。
+        
+        Args:
+            segments: segment() の結果
+        
+        Returns:
+            str: 連結したテキスト
+        """
+        joined = ' '.join(translation if translation is not None else source for source, translation in segments)
+        return re.sub(r'\s+', ' ', joined).strip()
+    
+    def translate_fully(self, text: str) -> Optional[str]:
+        """
+        辞書だけでテキスト全体を翻訳します。
+        
+        Args:
+            text: 対象テキスト
+        
+        Returns:
+            Optional[str]: 英語訳（辞書にない日本語部分が残る場合はNone）
+        """
+        segments = self.segment(text)
+        if not any(source != translation for source, translation in segments):
+            # 辞書の用語を含まない場合は翻訳したことにならない
+            return None
+        if any(translation is None for _, translation in segments):
+            return None
+        return self.join_segments(segments)
+    
+    def remainder(self, text: str) -> List[str]:
+        """
+        辞書で翻訳できない日本語部分を返します。
+        
+        Args:
+            text: 対象テキスト
+        
+        Returns:
+            List[str]: 翻訳APIに回す必要がある日本語部分
+        """
+        return [source for source, translation in self.segment(text) if translation is None]
+    
+    def partial_segments(self, text: str) -> Optional[List[Tuple[str, Optional[str]]]]:
+        """
+        辞書の用語と辞書にない日本語部分の両方を含む場合に分割結果を返します。
+        辞書にない部分（英語訳がNoneの部分）だけを翻訳APIに回し、join_segments で組み合わせるために使用します。
+        
+        Args:
+            text: 対象テキスト
+        
+        Returns:
+            Optional[List[Tuple[str, Optional[str]]]]: segment() の結果（辞書の用語を含まない、
+                または辞書だけで翻訳できる場合はNone）
+        """
+        segments = self.segment(text)
+        if not any(translation is None for _, translation in segments):
+            return None
+        if not any(translation not in (None, source) for source, translation in segments):
+            # 辞書の用語を含まない場合は全体を翻訳した方が自然な訳になる
+            return None
+        return segments
+    
+    def to_dict(self) -> Dict[str, str]:
+        """
+        登録済みの用語を辞書形式で返します。
+        
+        Returns:
+            Dict[str, str]: 日本語の用語 -> 英語訳
+        """
+        terms: Dict[str, str] = {}
+        stack = [(self._root, '')]
+        while stack:
+            node, prefix = stack.pop()
+            for char, child in node.items():
+                if char == _TERMINAL:
+                    terms[prefix] = child
+                else:
+                    stack.append((child, prefix + char))
+        return terms
+    
+    def save(self, path: str) -> None:
+        """
+        用語をJSONファイルに保存します。
+        
+        Args:
+            path: 保存先のパス
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(self.to_dict().items())), f, ensure_ascii=False, indent=2)
+    
+    @classmethod
+    def load(cls, path: str) -> 'TermDictionary':
+        """
+        JSONファイルから用語を読み込みます。
+        
+        Args:
+            path: 読み込むパス
+        
+        Returns:
+            TermDictionary: 用語辞書
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+
+def build_terms_from_cache(cache, target_language: str = 'en', max_length: int = 12) -> Dict[str, str]:
+    """
+    翻訳キャッシュの履歴から用語を抽出します。
+    空白を含まない短い日本語（ブランド名やコンポーネント単位の翻訳）だけを対象にします。
+    
+    Args:
+        cache: 翻訳キャッシュ（TranslationCache）
+        target_language: 翻訳先言語コード
+        max_length: 用語とみなす最大文字数
+    
+    Returns:
+        Dict[str, str]: 日本語の用語 -> 英語訳
+    """
+    terms: Dict[str, str] = {}
+    for source_text, translated_text in cache.iter_entries(target_language):
+        if len(source_text) > max_length or ' ' in source_text:
+            continue
+        if not _JAPANESE_RUN_PATTERN.fullmatch(source_text):
+            continue
+        if _JAPANESE_RUN_PATTERN.search(translated_text):
+            continue
+        terms[source_text] = translated_text
+    return terms
+
+
+# シングルトンインスタンス
+_term_dictionary: Optional[TermDictionary] = None
+_dictionary_lock = threading.Lock()
+
+
+def get_term_dictionary() -> TermDictionary:
+    """
+    共有の用語辞書を取得します（組み込みの用語 + TERM_DICTIONARY_FILE の用語）。
+    
+    Returns:
+        TermDictionary: 用語辞書
+    """
+    global _term_dictionary
+    if _term_dictionary is None:
+        with _dictionary_lock:
+            if _term_dictionary is None:
+                dictionary = TermDictionary(BUILTIN_TERMS)
+                path = get_optional_config("TERM_DICTIONARY_FILE", "term_dictionary.json")
+                if os.path.exists(path):
+                    try:
+                        dictionary.update(TermDictionary.load(path).to_dict())
+                        logger.info(f"用語辞書を読み込みました: {path} ({len(dictionary)}語)")
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"用語辞書の読み込みに失敗しました: {e}")
+                _term_dictionary = dictionary
+    return _term_dictionary
@@ -0,0 +1,368 @@
+"""
+永続翻訳キャッシュ
+翻訳結果をSQLiteファイルに保存し、プロセスやスクリプトをまたいで共有します。
+キーは正規化したテキストと翻訳先言語の組で、翻訳できなかったテキストも一定期間記録します（ネガティブキャッシュ）。
+エントリ数には上限があり、超えた場合は最後に使われた日時が古いものから削除します。
+キャッシュヒット時の使用日時とヒット数の更新はメモリにためて、まとめて書き込みます。
+"""
+
+import os
+import re
+import time
+import atexit
+import sqlite3
+import threading
+import logging
+import unicodedata
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from .config import get_optional_config
+
+logger = logging.getLogger(__name__)
+
+# lookup の結果でキャッシュに存在しないことを表す値
+MISS = object()
+
+# 相対パスで指定されたキャッシュファイルの基準ディレクトリ（実行時のカレントディレクトリに依存させない）
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def normalize_cache_text(text: str) -> str:
+    """
+    キャッシュキー用にテキストを正規化します（全角/半角の統一と空白の整理）。
+    
+    Args:
+        text: 対象テキスト
+    
+    Returns:
+        str: 正規化されたテキスト
+    """
+    if not text:
+        return ""
+    normalized = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', ' ', normalized).strip()
+
+
+class TranslationCache:
+    """SQLiteによる永続翻訳キャッシュ"""
+    
+    def __init__(self, path: str, max_entries: int = 100000, negative_ttl_seconds: float = 86400.0,
+                 usage_batch_size: int = 100, usage_flush_seconds: float = 60.0):
+        """
+        初期化
+        
+        Args:
+            path: SQLiteファイルのパス（相対パスはプロジェクトのルートディレクトリを基準にする）
+            max_entries: 保持するエントリ数の上限
+            negative_ttl_seconds: 翻訳できなかった結果を保持する秒数
+            usage_batch_size: 使用日時とヒット数の更新をまとめて書き込むエントリ数
+            usage_flush_seconds: 使用日時とヒット数の更新を書き込むまで待つ最大秒数
+        """
+        self.path = path if os.path.isabs(path) else os.path.join(_PROJECT_ROOT, path)
+        self.max_entries = max_entries
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.usage_batch_size = usage_batch_size
+        self.usage_flush_seconds = usage_flush_seconds
+        
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._initialized = False
+        self._pending_usage: Dict[Tuple[str, str], int] = {}  # (正規化テキスト, 言語) -> 未反映のヒット数
+        self._usage_flushed_at = time.monotonic()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """スレッドごとの接続を取得（初回はテーブルを作成）"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            if not self._initialized:
+                connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS translations (
+                        source_text TEXT NOT NULL,
+                        target_language TEXT NOT NULL,
+                        translated_text TEXT,
+                        provider TEXT,
+                        created_at REAL NOT NULL,
+                        last_used_at REAL NOT NULL,
+                        hit_count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (source_text, target_language)
+                    )
+                    """
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used_at)"
+                )
+                self._initialized = True
+            self._local.connection = connection
+        return connection
+    
+    def lookup(self, text: str, target_language: str = 'en') -> Any:
+        """
+        翻訳結果をキャッシュから取得します。
+        
+        Args:
+            text: 翻訳元テキスト
+            target_language: 翻訳先言語コード
+        
+        Returns:
+            Any: 翻訳結果。翻訳できなかったことが記録されている場合はNone、
+                 キャッシュに存在しない場合は MISS
+        """
+        return self.lookup_many([text], target_language).get(normalize_cache_text(text), MISS)
+    
+    def lookup_many(self, texts: Iterable[str], target_language: str = 'en') -> Dict[str, Optional[str]]:
+        """
+        複数テキストの翻訳結果をまとめて取得します。
+        
+        Args:
+            texts: 翻訳元テキストのリスト
+            target_language: 翻訳先言語コード
+        
+        Returns:
+            Dict[str, Optional[str]]: 正規化テキスト -> 翻訳結果（ネガティブキャッシュはNone）。
+                                      キャッシュに存在しないテキストは含まれない
+        """
+        keys = list(dict.fromkeys(normalize_cache_text(text) for text in texts if text))
+        if not keys:
+            return {}
+        
+        now = time.time()
+        found: Dict[str, Optional[str]] = {}
+        try:
+            connection = self._connect()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"SELECT source_text, translated_text, created_at FROM translations "
+                    f"WHERE target_language = ? AND source_text IN ({placeholders})",
+                    [target_language, *chunk]
+                ).fetchall()
+                for source_text, translated_text, created_at in rows:
+                    # 期限切れのネガティブキャッシュは未登録として扱う
+                    if translated_text is None and now - created_at > self.negative_ttl_seconds:
+                        continue
+                    found[source_text] = translated_text
+        except sqlite3.Error as e:
+            logger.warning(f"翻訳キャッシュの読み込みエラー: {e}")
+            found = {}
+        
+        with self._stats_lock:
+            negative = sum(1 for value in found.values() if value is None)
+            self._hits += len(found) - negative
+            self._negative_hits += negative
+            self._misses += len(keys) - len(found)
+            
+            # ヒットのたびにUPDATEしないよう、使用状況はまとめて書き込む
+            for key in found:
+                usage_key = (key, target_language)
+                self._pending_usage[usage_key] = self._pending_usage.get(usage_key, 0) + 1
+            should_flush = bool(self._pending_usage) and (
+                len(self._pending_usage) >= self.usage_batch_size
+                or time.monotonic() - self._usage_flushed_at >= self.usage_flush_seconds
+            )
+        if should_flush:
+            self.flush_usage()
+        return found
+    
+    def flush_usage(self) -> None:
+        """ためておいたキャッシュヒットの使用日時とヒット数をまとめて書き込みます。"""
+        with self._stats_lock:
+            pending = self._pending_usage
+            self._pending_usage = {}
+            self._usage_flushed_at = time.monotonic()
+        if not pending:
+            return
+        
+        now = time.time()
+        try:
+            self._connect().executemany(
+                "UPDATE translations SET last_used_at = ?, hit_count = hit_count + ? "
+                "WHERE source_text = ? AND target_language = ?",
+                [(now, hits, source_text, target_language) for (source_text, target_language), hits in pending.items()]
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"翻訳キャッシュの使用状況の書き込みエラー: {e}")
+    
+    def store(self, text: str, translated_text: Optional[str], target_language: str = 'en',
+              provider: str = '') -> None:
+        """
+        翻訳結果をキャッシュに保存します。
+        
+        Args:
+            text: 翻訳元テキスト
+            translated_text: 翻訳結果（翻訳できなかった場合はNone）
+            target_language: 翻訳先言語コード
+            provider: 翻訳に使用したサービス名
+        """
+        self.store_many({text: translated_text}, target_language, provider)
+    
+    def store_negative(self, text: str, target_language: str = 'en', provider: str = '') -> None:
+        """
+        翻訳できなかったことをキャッシュに記録します。
+        
+        Args:
+            text: 翻訳元テキスト
+            target_language: 翻訳先言語コード
+            provider: 翻訳に使用したサービス名
+        """
+        self.store(text, None, target_language, provider)
+    
+    def store_many(self, translations: Dict[str, Optional[str]], target_language: str = 'en',
+                   provider: str = '') -> None:
+        """
+        複数の翻訳結果をまとめて保存します。
+        
+        Args:
+            translations: 翻訳元テキスト -> 翻訳結果（翻訳できなかった場合はNone）
+            target_language: 翻訳先言語コード
+            provider: 翻訳に使用したサービス名
+        """
+        now = time.time()
+        rows = [
+            (normalize_cache_text(text), target_language, translated, provider, now, now)
+            for text, translated in translations.items() if text
+        ]
+        if not rows:
+            return
+        
+        try:
+            connection = self._connect()
+            connection.executemany(
+                """
+                INSERT INTO translations (source_text, target_language, translated_text, provider, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source_text, target_language) DO UPDATE SET
+                    translated_text = excluded.translated_text,
+                    provider = excluded.provider,
+                    created_at = excluded.created_at,
+                    last_used_at = excluded.last_used_at
+                """,
+                rows
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"翻訳キャッシュの書き込みエラー: {e}")
+            return
+        
+        with self._stats_lock:
+            self._writes += len(rows)
+            should_evict = self._writes >= 100
+            if should_evict:
+                self._writes = 0
+        if should_evict:
+            self._evict()
+    
+    def _evict(self) -> None:
+        """上限を超えたエントリを最終使用日時の古い順に削除する"""
+        # 最近使われたエントリを削除しないよう、先に使用日時を反映する
+        self.flush_usage()
+        try:
+            connection = self._connect()
+            count = connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            if count <= self.max_entries:
+                return
+            # 削除を頻発させないよう上限の9割まで減らす
+            excess = count - int(self.max_entries * 0.9)
+            connection.execute(
+                "DELETE FROM translations WHERE rowid IN "
+                "(SELECT rowid FROM translations ORDER BY last_used_at ASC LIMIT ?)",
+                (excess,)
+            )
+            logger.info(f"翻訳キャッシュから{excess}件の古いエントリを削除しました")
+        except sqlite3.Error as e:
+            logger.warning(f"翻訳キャッシュの整理エラー: {e}")
+    
+    def iter_entries(self, target_language: str = 'en') -> Iterable[Tuple[str, str]]:
+        """
+        保存済みの翻訳結果（ネガティブキャッシュを除く）を順に返します。
+        
+        Args:
+            target_language: 翻訳先言語コード
+        
+        Yields:
+            Tuple[str, str]: 翻訳元テキストと翻訳結果
+        """
+        try:
+            cursor = self._connect().execute(
+                "SELECT source_text, translated_text FROM translations "
+                "WHERE target_language = ? AND translated_text IS NOT NULL",
+                (target_language,)
+            )
+            for row in cursor:
+                yield row[0], row[1]
+        except sqlite3.Error as e:
+            logger.warning(f"翻訳キャッシュの読み込みエラー: {e}")
+    
+    def clear(self) -> None:
+        """キャッシュをすべて削除します。"""
+        try:
+            self._connect().execute("DELETE FROM translations")
+        except sqlite3.Error as e:
+            logger.warning(f"翻訳キャッシュの削除エラー: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        キャッシュの統計情報を取得します。
+        
+        Returns:
+            Dict[str, Any]: エントリ数、ヒット率（このプロセスでの集計）など
+        """
+        try:
+            entries, negative_entries = self._connect().execute(
+                "SELECT COUNT(*), SUM(CASE WHEN translated_text IS NULL THEN 1 ELSE 0 END) FROM translations"
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"翻訳キャッシュの統計取得エラー: {e}")
+            entries, negative_entries = 0, 0
+        
+        with self._stats_lock:
+            lookups = self._hits + self._negative_hits + self._misses
+            return {
+                'path': self.path,
+                'entries': entries or 0,
+                'negative_entries': negative_entries or 0,
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'negative_hits': self._negative_hits,
+                'misses': self._misses,
+                'hit_rate': round((self._hits + self._negative_hits) / lookups, 3) if lookups else 0.0
+            }
+
+
+# シングルトンインスタンス
+_translation_cache: Optional[TranslationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_translation_cache() -> TranslationCache:
+    """
+    共有の翻訳キャッシュを取得します。
+    TRANSLATION_CACHE_FILE（相対パスはプロジェクトのルートディレクトリ基準）/ TRANSLATION_CACHE_MAX_ENTRIES /
+    TRANSLATION_CACHE_NEGATIVE_TTL_HOURS / TRANSLATION_CACHE_USAGE_BATCH_SIZE で調整できます。
+    
+    Returns:
+        TranslationCache: 翻訳キャッシュ
+    """
+    global _translation_cache
+    if _translation_cache is None:
+        with _cache_lock:
+            if _translation_cache is None:
+                _translation_cache = TranslationCache(
+                    get_optional_config("TRANSLATION_CACHE_FILE", "translation_cache.sqlite3"),
+                    max_entries=int(get_optional_config("TRANSLATION_CACHE_MAX_ENTRIES", "100000")),
+                    negative_ttl_seconds=float(get_optional_config("TRANSLATION_CACHE_NEGATIVE_TTL_HOURS", "24")) * 3600,
+                    usage_batch_size=int(get_optional_config("TRANSLATION_CACHE_USAGE_BATCH_SIZE", "100")),
+                )
+                # 終了時に未反映の使用状況を書き込む
+                atexit.register(_translation_cache.flush_usage)
+    return _translation_cache
@@ -8,10 +8,13 @@ import json
 import re
 import logging
 import time
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple, Union
 from google.cloud import translate_v2 as translate
 from google.oauth2 import service_account
 
+from .translation_cache import get_translation_cache, normalize_cache_text, MISS
+from .term_dictionary import get_term_dictionary
+
 # ログ設定
 logger = logging.getLogger(__name__)
 
@@ -21,7 +24,8 @@ class GoogleTranslator:
     def __init__(self):
         """翻訳クラスを初期化"""
         self.client = None
-        self.translation_cache = {}  # 翻訳結果キャッシュ
+        self.translation_cache = get_translation_cache()  # 翻訳結果キャッシュ（プロセス間で共有）
+        self.term_dictionary = get_term_dictionary()  # オフライン用語辞書
         self._initialize_client()
     
     def _initialize_client(self):
@@ -87,11 +91,19 @@ class GoogleTranslator:
         if not product_name:
             return ""
         
-        # キャッシュをチェック
-        cache_key = f"{product_name}_{target_language}"
-        if cache_key in self.translation_cache:
+        # キャッシュをチェック（翻訳できなかった記録がある場合は元の商品名を返す）
+        cached = self.translation_cache.lookup(product_name, target_language)
+        if cached is not MISS:
             logger.debug(f"キャッシュから翻訳結果を取得: {product_name}")
-            return self.translation_cache[cache_key]
+            return cached if cached is not None else product_name
+        
+        # 用語辞書だけで翻訳できる場合はAPIを呼ばない
+        if target_language == 'en':
+            offline_translation = self.term_dictionary.translate_fully(self._clean_product_name(product_name))
+            if offline_translation:
+                self.translation_cache.store(product_name, offline_translation, target_language, provider='dictionary')
+                logger.debug(f"用語辞書で翻訳: '{product_name}' -> '{offline_translation}'")
+                return offline_translation
         
         # クライアントが初期化されていない場合は元のテキストを返す
         if not self.client:
@@ -107,20 +119,32 @@ class GoogleTranslator:
                 logger.debug(f"日本語テキストではありません: {cleaned_name}")
                 return cleaned_name
             
+            # 辞書にない部分だけをAPIで翻訳して組み合わせる
+            if target_language == 'en':
+                spliced_translation = self._translate_with_dictionary(cleaned_name, target_language)
+                if spliced_translation:
+                    self.translation_cache.store(product_name, spliced_translation, target_language, provider='dictionary+google')
+                    logger.debug(f"用語辞書と部分翻訳で翻訳: '{cleaned_name}' -> '{spliced_translation}'")
+                    return spliced_translation
+            
             # リトライ機能付きで翻訳実行
             translated_text = self._translate_with_retry(cleaned_name, target_language)
             
             # 翻訳品質をチェック
             if self._is_translation_valid(cleaned_name, translated_text):
                 # キャッシュに保存
-                self.translation_cache[cache_key] = translated_text
+                self.translation_cache.store(product_name, translated_text, target_language, provider='google')
                 logger.debug(f"翻訳完了: '{cleaned_name}' -> '{translated_text}'")
                 return translated_text
             else:
                 logger.warning(f"翻訳品質が低いため、代替翻訳を試行: {translated_text}")
                 # 代替翻訳を試行
                 alternative_translation = self._get_alternative_translation(cleaned_name)
-                self.translation_cache[cache_key] = alternative_translation
+                if alternative_translation == cleaned_name:
+                    # 代替翻訳も失敗した場合は一定期間再翻訳しない
+                    self.translation_cache.store_negative(product_name, target_language, provider='google')
+                    return product_name
+                self.translation_cache.store(product_name, alternative_translation, target_language, provider='google')
                 return alternative_translation
             
         except Exception as e:
@@ -128,17 +152,170 @@ class GoogleTranslator:
             # エラー時は元のテキストを返す
             return product_name
     
-    def _translate_with_retry(self, text: str, target_language: str, max_retries: int = 3) -> str:
+    def translate_batch(self, texts: List[str], target_language: str = 'en') -> Dict[str, Optional[str]]:
+        """
+        複数のテキストをまとめて翻訳します。
+        キャッシュにないテキストだけを1回のAPIリクエスト（最大128件ずつ）で翻訳し、結果をキャッシュに保存します。
+        用語辞書の用語を含むテキストは、辞書にない部分だけを翻訳して辞書の訳と組み合わせます。
+        
+        Args:
+            texts: 翻訳対象のテキストのリスト
+            target_language: 翻訳先言語コード（デフォルト: 'en'）
+            
+        Returns:
+            Dict[str, Optional[str]]: 元のテキスト -> 翻訳結果
+                                      （日本語でない場合はクリーニング後のテキスト、翻訳できなかった場合はNone）
+        """
+        results: Dict[str, Optional[str]] = {}
+        pending: Dict[str, str] = {}  # 元のテキスト -> クリーニング後のテキスト
+        
+        for text in dict.fromkeys(t for t in texts if t):
+            cleaned = self._clean_product_name(text)
+            if not self.is_japanese_text(cleaned):
+                results[text] = cleaned
+            else:
+                pending[text] = cleaned
+        
+        if not pending:
+            return results
+        
+        # キャッシュ済みのテキストを除外
+        cached = self.translation_cache.lookup_many(pending.keys(), target_language)
+        for text in list(pending):
+            key = normalize_cache_text(text)
+            if key in cached:
+                results[text] = cached[key]
+                del pending[text]
+        
+        if not pending:
+            return results
+        
+        # 用語辞書だけで翻訳できるテキストを除外
+        if target_language == 'en':
+            offline_translations: Dict[str, Optional[str]] = {}
+            for text in list(pending):
+                offline_translation = self.term_dictionary.translate_fully(pending[text])
+                if offline_translation:
+                    offline_translations[text] = offline_translation
+                    results[text] = offline_translation
+                    del pending[text]
+            if offline_translations:
+                self.translation_cache.store_many(offline_translations, target_language, provider='dictionary')
+        
+        if not pending:
+            return results
+        
+        if not self.client:
+            logger.warning("Translation APIクライアントが利用できません。元のテキストを返します。")
+            results.update({text: None for text in pending})
+            return results
+        
+        # 辞書の用語を含むテキストは、辞書にない日本語部分だけを翻訳して辞書の訳と組み合わせる
+        spliced: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+        if target_language == 'en':
+            for text, cleaned in pending.items():
+                segments = self.term_dictionary.partial_segments(cleaned)
+                if segments is not None:
+                    spliced[text] = segments
+        
+        units = [cleaned for text, cleaned in pending.items() if text not in spliced]
+        for segments in spliced.values():
+            units.extend(source for source, translation in segments if translation is None)
+        translations = self._translate_units(units, target_language)
+        
+        # 残りの部分を翻訳できなかったテキストは全体を翻訳する
+        fallback = [
+            text for text, segments in spliced.items()
+            if any(translation is None and source not in translations for source, translation in segments)
+        ]
+        if fallback:
+            translations.update(self._translate_units([pending[text] for text in fallback], target_language))
+            for text in fallback:
+                del spliced[text]
+        
+        translated_texts: Dict[str, Optional[str]] = {}
+        spliced_texts: Dict[str, Optional[str]] = {}
+        for text, cleaned in pending.items():
+            if text in spliced:
+                spliced_texts[text] = results[text] = self.term_dictionary.join_segments(
+                    (source, translation if translation is not None else translations[source])
+                    for source, translation in spliced[text]
+                )
+                continue
+            results[text] = translations.get(cleaned)
+            if results[text] is not None:
+                translated_texts[text] = results[text]
+        
+        if translated_texts:
+            self.translation_cache.store_many(translated_texts, target_language, provider='google')
+        if spliced_texts:
+            self.translation_cache.store_many(spliced_texts, target_language, provider='dictionary+google')
+        logger.debug(f"一括翻訳: {len(pending)}件（用語辞書との組み合わせ{len(spliced_texts)}件）を翻訳しました")
+        return results
+    
+    def _translate_units(self, units: List[str], target_language: str) -> Dict[str, str]:
+        """
+        テキストをAPIで翻訳します（重複を除き、最大128件ずつ1回のリクエストで翻訳）。
+        
+        Args:
+            units: クリーニング済みのテキスト（または辞書にない日本語部分）のリスト
+            target_language: 翻訳先言語コード
+            
+        Returns:
+            Dict[str, str]: テキスト -> 翻訳結果（失敗した、または品質チェックを通らなかったテキストは含まない）
+        """
+        units = list(dict.fromkeys(units))
+        translations: Dict[str, str] = {}
+        for start in range(0, len(units), 128):
+            chunk = units[start:start + 128]
+            try:
+                translated_chunk = self._translate_with_retry(chunk, target_language)
+            except Exception as e:
+                logger.error(f"一括翻訳エラー: {e}")
+                continue
+            
+            for unit, translated in zip(chunk, translated_chunk):
+                if self._is_translation_valid(unit, translated):
+                    translations[unit] = translated
+        return translations
+    
+    def _translate_with_dictionary(self, cleaned_name: str, target_language: str) -> Optional[str]:
+        """
+        用語辞書で翻訳できない日本語部分だけをAPIで翻訳し、辞書の訳と組み合わせます。
+        
+        Args:
+            cleaned_name: クリーニング済みの商品名
+            target_language: 翻訳先言語コード
+            
+        Returns:
+            Optional[str]: 翻訳結果（辞書の用語を含まない、または残りの部分を翻訳できなかった場合はNone）
+        """
+        segments = self.term_dictionary.partial_segments(cleaned_name)
+        if segments is None:
+            return None
+        
+        remainder = [source for source, translation in segments if translation is None]
+        translations = self._translate_units(remainder, target_language)
+        if any(source not in translations for source in remainder):
+            return None
+        
+        return self.term_dictionary.join_segments(
+            (source, translation if translation is not None else translations[source])
+            for source, translation in segments
+        )
+    
+    def _translate_with_retry(self, text: Union[str, List[str]], target_language: str,
+                              max_retries: int = 3) -> Union[str, List[str]]:
         """
         リトライ機能付きで翻訳を実行します。
         
         Args:
-            text: 翻訳対象テキスト
+            text: 翻訳対象テキスト（リストの場合は1回のリクエストでまとめて翻訳）
             target_language: 翻訳先言語
             max_retries: 最大リトライ回数
             
         Returns:
-            str: 翻訳結果
+            Union[str, List[str]]: 翻訳結果（リストを渡した場合は同じ順序のリスト）
         """
         for attempt in range(max_retries):
             try:
@@ -147,6 +324,8 @@ class GoogleTranslator:
                     target_language=target_language,
                     source_language='ja'
                 )
+                if isinstance(result, list):
+                    return [item['translatedText'] for item in result]
                 return result['translatedText']
                 
             except Exception as e:
@@ -280,35 +459,36 @@ class GoogleTranslator:
         queries = []
         
         try:
-            # 1. 完全翻訳
-            full_translation = self.translate_product_name(product_name)
+            # 完全翻訳・コンポーネント・ブランド名の翻訳を1回のリクエストでまとめて取得
+            components = self._extract_product_components(product_name)
+            brand_name = self._extract_brand_name(product_name)
+            segments = [product_name] + [c for c in components if self.is_japanese_text(c)]
+            if brand_name:
+                segments.append(brand_name)
+            translations = self.translate_batch(segments)
+            
+            # 1. 完全翻訳（品質が低い場合はコンポーネント別翻訳で代替）
+            full_translation = translations.get(product_name)
+            if full_translation is None:
+                full_translation = self._join_component_translations(components, translations)
+                if full_translation and self.client:
+                    self.translation_cache.store(product_name, full_translation, provider='google')
             if full_translation and full_translation != product_name:
                 queries.append(full_translation)
             
             # 2. コンポーネント別翻訳
-            components = self._extract_product_components(product_name)
             if len(components) > 1:
-                translated_components = []
-                for component in components:
-                    if self.is_japanese_text(component):
-                        translated = self.translate_product_name(component)
-                        if translated and translated != component:
-                            translated_components.append(translated)
-                    else:
-                        translated_components.append(component)
-                
-                if translated_components:
-                    component_query = ' '.join(translated_components)
-                    if component_query not in queries:
-                        queries.append(component_query)
+                component_query = self._join_component_translations(components, translations)
+                if component_query and component_query not in queries:
+                    queries.append(component_query)
             
             # 3. ブランド名重視クエリ
-            brand_query = self._generate_brand_focused_query(product_name)
+            brand_query = self._generate_brand_focused_query(product_name, translations)
             if brand_query and brand_query not in queries:
                 queries.append(brand_query)
             
             # 4. 簡略化クエリ
-            simplified_query = self._generate_simplified_query(product_name)
+            simplified_query = self._generate_simplified_query(product_name, translations)
             if simplified_query and simplified_query not in queries:
                 queries.append(simplified_query)
             
@@ -330,25 +510,52 @@ class GoogleTranslator:
             basic_translation = self.translate_product_name(product_name)
             return [basic_translation] if basic_translation else [product_name]
     
-    def _generate_brand_focused_query(self, product_name: str) -> Optional[str]:
+    def _join_component_translations(self, components: List[str],
+                                     translations: Dict[str, Optional[str]]) -> Optional[str]:
+        """
+        コンポーネントの翻訳結果を連結します（日本語でないコンポーネントはそのまま使用）。
+        
+        Args:
+            components: 商品名のコンポーネント
+            translations: 一括翻訳の結果
+            
+        Returns:
+            Optional[str]: 連結したクエリ（翻訳できたコンポーネントがない場合はNone）
+        """
+        translated_components = []
+        for component in components:
+            if self.is_japanese_text(component):
+                translated = translations.get(component)
+                if translated and translated != component:
+                    translated_components.append(translated)
+            else:
+                translated_components.append(component)
+        
+        return ' '.join(translated_components) if translated_components else None
+    
+    def _extract_brand_name(self, product_name: str) -> Optional[str]:
+        """最も長いカタカナ部分をブランド名として抽出"""
+        katakana_parts = re.findall(r'[\u30A0-\u30FF]+', product_name)
+        return max(katakana_parts, key=len) if katakana_parts else None
+    
+    def _generate_brand_focused_query(self, product_name: str,
+                                      translations: Optional[Dict[str, Optional[str]]] = None) -> Optional[str]:
         """
         ブランド名重視のクエリを生成します。
         
         Args:
             product_name: 商品名
+            translations: 一括翻訳の結果（含まれていない場合は個別に翻訳）
             
         Returns:
             Optional[str]: ブランド重視クエリ
         """
         try:
-            # カタカナ部分（ブランド名の可能性）を抽出
-            katakana_pattern = re.compile(r'[\u30A0-\u30FF]+')
-            katakana_parts = katakana_pattern.findall(product_name)
-            
-            if katakana_parts:
-                # 最も長いカタカナ部分をブランド名とみなす
-                brand_name = max(katakana_parts, key=len)
-                brand_translated = self.translate_product_name(brand_name)
+            # 最も長いカタカナ部分（ブランド名の可能性）を抽出
+            brand_name = self._extract_brand_name(product_name)
+            
+            if brand_name:
+                brand_translated = self._lookup_translation(brand_name, translations)
                 
                 # 商品カテゴリを推定
                 category = self._guess_product_category(product_name)
@@ -364,12 +571,20 @@ class GoogleTranslator:
             logger.error(f"ブランド重視クエリ生成エラー: {e}")
             return None
     
-    def _generate_simplified_query(self, product_name: str) -> Optional[str]:
+    def _lookup_translation(self, text: str, translations: Optional[Dict[str, Optional[str]]]) -> str:
+        """一括翻訳の結果から翻訳を取得（含まれていない場合は個別に翻訳）"""
+        if translations and text in translations:
+            return translations[text] or text
+        return self.translate_product_name(text)
+    
+    def _generate_simplified_query(self, product_name: str,
+                                   translations: Optional[Dict[str, Optional[str]]] = None) -> Optional[str]:
         """
         簡略化クエリを生成します。
         
         Args:
             product_name: 商品名
+            translations: 一括翻訳の結果（含まれていない場合は個別に翻訳）
             
         Returns:
             Optional[str]: 簡略化クエリ
@@ -385,7 +600,7 @@ class GoogleTranslator:
             if components:
                 first_component = components[0]
                 if self.is_japanese_text(first_component):
-                    return self.translate_product_name(first_component)
+                    return self._lookup_translation(first_component, translations)
                 else:
                     return first_component
             
@@ -519,3 +734,21 @@ def translate_for_platform(product_name: str, platform: str) -> str:
         str: 翻訳された商品名
     """
     return translator.get_search_query_for_platform(product_name, platform)
+
+def translate_batch_for_platform(product_names: List[str], platform: str) -> Dict[str, str]:
+    """
+    複数の商品名をまとめてプラットフォーム用の検索クエリに変換する便利関数
+    （英語のプラットフォームでは一括翻訳を使い、1件ずつAPIを呼ばない）
+    
+    Args:
+        product_names: 商品名のリスト
+        platform: プラットフォーム名
+        
+    Returns:
+        Dict[str, str]: 商品名 -> 検索クエリ（翻訳できなかった場合は元の商品名）
+    """
+    if platform not in ['ebay', 'discogs']:
+        return {name: name for name in product_names}
+    
+    translations = translator.translate_batch(product_names)
+    return {name: translations.get(name) or name for name in product_names}